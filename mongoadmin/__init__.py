@@ -1,6 +1,7 @@
 from .options import *
 
 from mongoadmin.sites import site
+from mongoadmin import checks
 
 from django.conf import settings
 
@@ -58,9 +58,9 @@ def _delete_selected(modeladmin, request, queryset):
             for obj in queryset:
                 obj_display = force_unicode(obj)
                 modeladmin.log_deletion(request, obj, obj_display)
-                # call the objects delete method to ensure signals are
-                # processed.
-                obj.delete()
+                # call the objects delete method (through the admin, which
+                # also removes thumbnails) to ensure signals are processed.
+                modeladmin.delete_model(request, obj)
             # This is what you get if you have to monkey patch every object in a changelist
             # No queryset object, I can tell ya. So we get a new one and delete that. 
             #pk_list = [o.pk for o in queryset]
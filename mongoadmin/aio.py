@@ -0,0 +1,390 @@
+"""
+An asyncio code path for the admin's MongoDB queries, built on motor.
+
+Requires Python >= 3.5 and motor. The queries of a mongoengine queryset
+(filter, ordering, projection, skip, limit, maxTimeMS) are translated to a
+motor cursor, so admins can count, fetch pages and objects and run the
+delete action from a coroutine without holding a thread while MongoDB
+works::
+
+    from mongoadmin.aio import AsyncDocumentAdminMixin
+
+    class ArticleAdmin(AsyncDocumentAdminMixin, DocumentAdmin):
+        ...
+
+    cl = await model_admin.achangelist(request)
+    obj = await model_admin.aget_object(request, object_id)
+
+The mixin also routes the changelist URL to ``achangelist_view``. Django
+versions without async views call it through ``sync_view``, which runs the
+coroutine on an event loop in a background thread while the request thread
+waits, so the counts and the page are still fetched concurrently.
+
+The motor client of a mongoengine alias is created with the connection
+settings of the alias (hosts, credentials, replica set, TLS options), or
+with the URI set for the alias in ``MONGOADMIN_ASYNC_CLIENTS``
+(``{'default': 'mongodb://...'}``).
+"""
+import asyncio
+import threading
+from functools import partial, update_wrapper, wraps
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.utils.encoding import force_text
+
+from mongoengine import connection, signals
+from mongoengine.connection import get_connection, DEFAULT_CONNECTION_NAME
+from mongoengine.fields import FileField
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+from mongoadmin import instrumentation
+from mongoadmin.views import DocumentChangeList, ExecutionTimeout
+
+_clients = {}
+_loop = None
+_loop_lock = threading.Lock()
+# mongoengine's names of client options that pymongo calls differently
+SETTING_NAMES = {
+    'authentication_source': 'authSource',
+    'authentication_mechanism': 'authMechanism',
+}
+
+
+def connection_kwargs(alias=DEFAULT_CONNECTION_NAME):
+    """
+    Returns the keyword arguments for a client with the same settings as
+    the mongoengine connection ``alias``.
+    """
+    # raises ConnectionFailure for aliases that aren't registered
+    get_connection(alias)
+    kwargs = {}
+    for name, value in connection._connection_settings[alias].items():
+        if name in ('name', 'is_mock') or value is None:
+            continue
+        kwargs[SETTING_NAMES.get(name, name)] = value
+    return kwargs
+
+
+def get_client(alias=DEFAULT_CONNECTION_NAME):
+    """
+    Returns the motor client for the mongoengine connection ``alias``. Motor
+    clients are bound to the event loop they are used on, so every loop
+    gets its own client.
+    """
+    if AsyncIOMotorClient is None:
+        raise RuntimeError('The async admin requires motor.')
+    key = alias, asyncio.get_event_loop()
+    if key not in _clients:
+        uri = getattr(settings, 'MONGOADMIN_ASYNC_CLIENTS', {}).get(alias)
+        if uri is None:
+            _clients[key] = AsyncIOMotorClient(**connection_kwargs(alias))
+        else:
+            _clients[key] = AsyncIOMotorClient(uri)
+    return _clients[key]
+
+
+def get_loop():
+    """
+    Returns the event loop ``run_sync`` runs coroutines on. It is started in
+    a daemon thread on first use.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='mongoadmin-aio')
+                thread.daemon = True
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coroutine):
+    """
+    Runs ``coroutine`` on the loop of ``get_loop`` and returns its result,
+    for code that doesn't run in an event loop itself.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
+
+
+def sync_view(view):
+    """
+    Returns a plain view function for the coroutine view ``view``.
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        return run_sync(view(request, *args, **kwargs))
+    return inner
+
+
+def in_executor(func, *args, **kwargs):
+    """
+    Runs the blocking ``func`` in the default executor of the running loop,
+    with the commands recorded for the caller.
+    """
+    loop = asyncio.get_event_loop()
+    return loop.run_in_executor(None, instrumentation.bind(partial(func, *args, **kwargs)))
+
+
+def get_collection(document, read_preference=None):
+    """
+    Returns the motor collection of ``document``.
+    """
+    db = document._get_db()
+    alias = document._meta.get('db_alias', DEFAULT_CONNECTION_NAME)
+    collection = get_client(alias)[db.name][document._get_collection_name()]
+    if read_preference is not None:
+        collection = collection.with_options(read_preference=read_preference)
+    return collection
+
+
+def _collection(queryset):
+    return get_collection(queryset._document, getattr(queryset, '_read_preference', None))
+
+
+def _max_time(queryset):
+    return getattr(queryset, '_max_time_ms', None)
+
+
+async def count(queryset):
+    """
+    Counts the documents matched by ``queryset``.
+    """
+    options = {}
+    if _max_time(queryset):
+        options['maxTimeMS'] = _max_time(queryset)
+    return await _collection(queryset).count_documents(queryset._query, **options)
+
+
+async def fetch(queryset, skip=None, limit=None):
+    """
+    Returns a list of the documents matched by ``queryset``. ``skip`` and
+    ``limit`` default to those of the queryset.
+    """
+    document = queryset._document
+    projection = queryset._loaded_fields.as_dict() or None
+    cursor = _collection(queryset).find(queryset._query, projection)
+    if queryset._ordering:
+        cursor = cursor.sort(queryset._ordering)
+    skip = queryset._skip if skip is None else skip
+    limit = queryset._limit if limit is None else limit
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    if _max_time(queryset):
+        cursor = cursor.max_time_ms(_max_time(queryset))
+    return [document._from_son(son, only_fields=list(projection or ()))
+            for son in await cursor.to_list(length=limit or None)]
+
+
+async def get(queryset):
+    """
+    Returns the first document matched by ``queryset`` or None.
+    """
+    documents = await fetch(queryset, limit=1)
+    return documents[0] if documents else None
+
+
+async def delete(queryset):
+    """
+    Deletes the documents matched by ``queryset`` and returns their number.
+    Documents with delete rules or signal receivers are deleted by
+    mongoengine in a thread, so the rules and signals still apply. Like
+    ``QuerySet.delete`` this doesn't go through ``DocumentAdmin.delete_model``,
+    use ``AsyncDocumentAdminMixin.adelete_selected`` for that.
+    """
+    document = queryset._document
+    if (document._meta.get('delete_rules') or
+            signals.pre_delete.has_receivers_for(document) or
+            signals.post_delete.has_receivers_for(document)):
+        return await in_executor(queryset.delete)
+    result = await _collection(queryset).delete_many(queryset._query)
+    return result.deleted_count
+
+
+class AsyncDocumentChangeList(DocumentChangeList):
+    """
+    A DocumentChangeList that doesn't query the database when it is
+    created. ``await cl.aget_results(request)`` sends the counts and the page
+    fetch concurrently and fills in the results.
+    """
+    def __init__(self, *args, **kwargs):
+        self._prefetched = None
+        super(AsyncDocumentChangeList, self).__init__(*args, **kwargs)
+
+    def get_results(self, request):
+        if self._prefetched is not None:
+            super(AsyncDocumentChangeList, self).get_results(request)
+
+    def prefetch_page(self):
+        # aget_results always fetches the page
+        return not self.show_all
+
+    def run_queries(self, queries):
+        return dict((name, self._prefetched[name]) for name in queries)
+
+    def load_results(self, result_list):
+        # fetched by aget_results without blocking the event loop
+        return result_list
+
+    async def _run(self, coroutine):
+        try:
+            return await coroutine
+        except ExecutionTimeout as e:
+            return e
+
+    async def aget_results(self, request):
+        count_budget, fetch_budget = self.get_time_budgets()
+        queryset = self.read_queryset(self.queryset)
+        queries = {
+            'count': count(self.with_time_budget(queryset, count_budget)),
+            'page': fetch(self.with_time_budget(queryset, fetch_budget),
+                          skip=self.page_num * self.list_per_page,
+                          limit=self.list_per_page + 1),
+        }
+        if self.get_filters_params():
+            queries['full_count'] = count(self.with_time_budget(
+                self.read_queryset(self.root_queryset), count_budget))
+        names = list(queries)
+        results = await asyncio.gather(*[self._run(queries[name]) for name in names])
+        self._prefetched = dict(zip(names, results))
+        self.get_results(request)
+        if not isinstance(self.result_list, list):
+            # show all
+            result_list = await self._run(fetch(self.result_list))
+            if isinstance(result_list, ExecutionTimeout):
+                self.results_unavailable = True
+                result_list = []
+            self.result_list = result_list
+
+
+class AsyncDocumentAdminMixin(object):
+    """
+    Adds coroutine versions of the queries of a DocumentAdmin and routes the
+    changelist to ``achangelist_view``.
+    """
+    # route the changelist URL to achangelist_view
+    async_views = True
+
+    def get_urls(self):
+        from django.conf.urls import url
+
+        urlpatterns = super(AsyncDocumentAdminMixin, self).get_urls()
+        if not self.async_views:
+            return urlpatterns
+
+        view = sync_view(self.achangelist_view)
+
+        def wrapper(*args, **kwargs):
+            return self.admin_site.admin_view(view)(*args, **kwargs)
+        update_wrapper(wrapper, view)
+
+        name = '%s_%s_changelist' % (self.model._meta.app_label, self.model._meta.model_name)
+        for i, pattern in enumerate(urlpatterns):
+            if getattr(pattern, 'name', None) == name:
+                urlpatterns[i] = url(pattern.regex.pattern, wrapper, name=name)
+        return urlpatterns
+
+    def get_async_changelist(self, request, **kwargs):
+        return AsyncDocumentChangeList
+
+    def get_changelist(self, request, **kwargs):
+        changelist = getattr(request, '_async_changelist', None)
+        if changelist is not None:
+            # the changelist achangelist_view has already fetched
+            return lambda *args, **kwargs: changelist
+        return super(AsyncDocumentAdminMixin, self).get_changelist(request, **kwargs)
+
+    def build_async_changelist(self, request):
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+        list_display = self.get_list_display(request)
+        list_display_links = self.get_list_display_links(request, list_display)
+        cl_class = self.get_async_changelist(request)
+        return cl_class(request, self.model, list_display, list_display_links,
+                        self.list_filter, self.date_hierarchy, self.search_fields,
+                        self.list_select_related, self.list_per_page,
+                        self.list_max_show_all, self.list_editable, self)
+
+    async def achangelist(self, request):
+        """
+        Returns a changelist with its results fetched. The permission checks
+        and the queryset (filters, search and schema lookups) use blocking
+        queries, so the changelist is built in the executor.
+        """
+        cl = await in_executor(self.build_async_changelist, request)
+        await cl.aget_results(request)
+        return cl
+
+    async def achangelist_view(self, request, extra_context=None):
+        """
+        The changelist view. The counts and the page are fetched with motor,
+        the rest of the view (actions, list_editable, rendering) is the
+        synchronous changelist_view run in the executor.
+        """
+        if request.method == 'GET':
+            try:
+                request._async_changelist = await self.achangelist(request)
+            except IncorrectLookupParameters:
+                # changelist_view redirects
+                pass
+        try:
+            return await in_executor(self.changelist_view, request, extra_context)
+        finally:
+            request._async_changelist = None
+
+    async def aget_object(self, request, object_id):
+        """
+        Returns the object with the primary key ``object_id`` or None if it
+        doesn't exist or its primary key is invalid.
+        """
+        queryset = self.apply_read_preference(request, self.get_queryset(request), 'change')
+        try:
+            queryset = queryset.filter(pk=object_id)
+        except Exception:
+            return None
+        return await get(queryset)
+
+    async def acount(self, request):
+        return await count(self.get_queryset(request))
+
+    async def adelete_selected(self, request, queryset):
+        """
+        Deletes the objects of ``queryset`` like the delete_selected action
+        after the confirmation and returns their number.
+        """
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+        objects = await fetch(queryset)
+        bulk = self.can_bulk_delete()
+
+        def delete_objects():
+            for obj in objects:
+                self.log_deletion(request, obj, force_text(obj))
+                if not bulk:
+                    self.delete_model(request, obj)
+        await in_executor(delete_objects)
+        if not bulk:
+            return len(objects)
+        return await delete(queryset.filter(pk__in=[obj.pk for obj in objects]))
+
+    def can_bulk_delete(self):
+        """
+        Returns whether adelete_selected may delete the objects with one
+        query instead of calling delete_model for every object. That's only
+        the case if delete_model isn't overridden and the document has no
+        file fields, as deleting a document deletes its files (and the admin
+        the thumbnails of its images).
+        """
+        from mongoadmin.options import DocumentAdmin
+        if type(self).delete_model is not DocumentAdmin.delete_model:
+            return False
+        return not any(isinstance(field, FileField) for field in self.model._fields.values())
@@ -23,6 +23,7 @@ from mongoengine.django.mongo_auth.models import MongoUser
 from mongoadmin import site, DocumentAdmin
 
 from .forms import UserCreationForm, UserChangeForm
+from .importer import UserImporter
 
 class MongoUserAdmin(DocumentAdmin):
     add_form_template = 'admin/auth/user/add_form.html'
@@ -48,6 +49,20 @@ class MongoUserAdmin(DocumentAdmin):
     ordering = ('username',)
     filter_horizontal = ()
     
+    # Number of processes that hash the passwords of imported users. The
+    # default hashes them in the process handling the request.
+    import_hash_processes = None
+
+    def import_rows(self, request, rows):
+        """
+        Imports users with the UserImporter, which hashes the passwords and
+        reports usernames that already exist.
+        """
+        importer = UserImporter(self.model, batch_size=self.import_batch_size,
+                                max_errors=self.import_max_errors,
+                                processes=self.import_hash_processes)
+        return importer.run(rows)
+
     def get_user_or_404(self, request, id):
         qs = self.queryset(request)
         try:
@@ -0,0 +1,197 @@
+"""
+A permission backend for mongoengine users.
+
+mongoengine's backend resolves a permission by dereferencing the user's
+permissions and their content types one at a time. This backend loads the
+whole permission set of a user with one query, keeps it on the user object
+for the rest of the request and in the cache (``MONGOADMIN_PERMISSION_CACHE``,
+default ``'default'``) for later requests. Saving or deleting a user drops
+that user's cached set, changing a permission or group invalidates all sets
+by bumping a version number::
+
+    AUTHENTICATION_BACKENDS = ('mongoadmin.auth.backends.MongoPermissionBackend',)
+
+The invalidation needs mongoengine's signals and thus blinker. Without it
+the cached sets are only kept for ``NO_SIGNALS_CACHE_TIMEOUT`` seconds
+unless ``MONGOADMIN_PERMISSION_CACHE_TIMEOUT`` is set.
+"""
+import warnings
+
+from bson import DBRef
+
+from django.conf import settings
+
+from mongoengine import signals
+from mongoengine.django.auth import MongoEngineBackend, Permission, User, ContentType
+try:
+    from mongoengine.django.auth import Group
+except ImportError:
+    Group = None
+
+# without a relational database this installs the caching content type
+# manager on mongoengine's ContentType
+import mongoadmin.contenttypes.models
+
+CACHE_KEY_PREFIX = 'mongoadmin:perms:'
+VERSION_KEY = CACHE_KEY_PREFIX + 'version'
+CACHE_TIMEOUT = 300
+NO_SIGNALS_CACHE_TIMEOUT = 10
+
+
+def _get_cache():
+    from django.core.cache import get_cache
+    return get_cache(getattr(settings, 'MONGOADMIN_PERMISSION_CACHE', 'default'))
+
+
+def _ref_id(value):
+    if isinstance(value, DBRef):
+        return value.id
+    return getattr(value, 'pk', value)
+
+
+def _raw_ids(document, name):
+    """
+    Returns the ids of the references in the list field ``name`` without
+    dereferencing them.
+    """
+    return [_ref_id(v) for v in document._data.get(name) or []]
+
+
+def cache_timeout():
+    """
+    Returns the number of seconds permission sets are cached.
+    """
+    default = CACHE_TIMEOUT if signals.signals_available else NO_SIGNALS_CACHE_TIMEOUT
+    return getattr(settings, 'MONGOADMIN_PERMISSION_CACHE_TIMEOUT', default)
+
+
+def get_version():
+    cache = _get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add doesn't overwrite a version another process has set meanwhile
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_all(sender=None, **kwargs):
+    cache = _get_cache()
+    cache.add(VERSION_KEY, 1, None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # evicted between add and incr
+        cache.add(VERSION_KEY, 2, None)
+
+
+def invalidate_user(sender=None, document=None, **kwargs):
+    if document is not None and document.pk is not None:
+        _get_cache().delete(user_cache_key(document))
+
+
+def user_cache_key(user, version=None):
+    if version is None:
+        version = get_version()
+    return '%s%s:%s' % (CACHE_KEY_PREFIX, version, user.pk)
+
+
+def load_permissions(permission_ids):
+    """
+    Returns a dict mapping ``permission_ids`` to the ``app_label.codename``
+    strings of the permissions. The content types come from the content
+    type cache.
+    """
+    if not permission_ids:
+        return {}
+    get_content_type = getattr(ContentType.objects, 'get_for_id', None)
+    if get_content_type is None:
+        get_content_type = lambda pk: ContentType.objects.get(pk=pk)
+    content_types = {}
+    permissions = {}
+    raw = Permission._get_collection().find({'_id': {'$in': list(permission_ids)}},
+                                            {'content_type': 1, 'codename': 1})
+    for perm in raw:
+        ct_id = _ref_id(perm.get('content_type'))
+        if ct_id not in content_types:
+            try:
+                content_types[ct_id] = get_content_type(ct_id)
+            except ContentType.DoesNotExist:
+                content_types[ct_id] = None
+        ct = content_types[ct_id]
+        if ct is not None:
+            permissions[perm['_id']] = '%s.%s' % (ct.app_label, perm['codename'])
+    return permissions
+
+
+class MongoPermissionBackend(MongoEngineBackend):
+    """
+    Authenticates like mongoengine's backend and resolves permissions from
+    a cached set.
+    """
+    def _group_permission_ids(self, user_obj):
+        group_ids = _raw_ids(user_obj, 'groups') if 'groups' in user_obj._fields else []
+        if not group_ids or Group is None:
+            return set()
+        ids = set()
+        for group in Group._get_collection().find({'_id': {'$in': group_ids}},
+                                                  {'permissions': 1}):
+            ids.update(_ref_id(p) for p in group.get('permissions') or [])
+        return ids
+
+    def _load(self, user_obj):
+        """
+        Returns a ``(user permissions, group permissions)`` tuple of sets.
+        """
+        cache = _get_cache()
+        key = user_cache_key(user_obj)
+        cached = cache.get(key)
+        if cached is None:
+            group_ids = self._group_permission_ids(user_obj)
+            user_ids = set(_raw_ids(user_obj, 'user_permissions'))
+            # the user and group permissions are read with one query
+            names = load_permissions(user_ids | group_ids)
+            group_permissions = set(names[pk] for pk in group_ids if pk in names)
+            cached = (set(names.values()), group_permissions)
+            cache.set(key, cached, cache_timeout())
+        return cached
+
+    def _cached(self, user_obj):
+        if not hasattr(user_obj, '_mongo_perm_cache'):
+            user_obj._mongo_perm_cache = self._load(user_obj)
+        return user_obj._mongo_perm_cache
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or obj is not None:
+            return set()
+        return self._cached(user_obj)[1]
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or obj is not None:
+            return set()
+        return self._cached(user_obj)[0]
+
+    def has_perm(self, user_obj, perm, obj=None):
+        if not user_obj.is_active:
+            return False
+        return perm in self.get_all_permissions(user_obj, obj)
+
+    def has_module_perms(self, user_obj, app_label):
+        if not user_obj.is_active:
+            return False
+        prefix = app_label + '.'
+        return any(perm.startswith(prefix) for perm in self.get_all_permissions(user_obj))
+
+
+if not signals.signals_available:
+    warnings.warn('blinker is not installed, so changed users, groups and permissions '
+                  'are only noticed once the cached permission sets expire '
+                  '(MONGOADMIN_PERMISSION_CACHE_TIMEOUT).')
+else:
+    signals.post_save.connect(invalidate_user, sender=User)
+    signals.post_delete.connect(invalidate_user, sender=User)
+    signals.post_save.connect(invalidate_all, sender=Permission)
+    signals.post_delete.connect(invalidate_all, sender=Permission)
+    if Group is not None:
+        signals.post_save.connect(invalidate_all, sender=Group)
+        signals.post_delete.connect(invalidate_all, sender=Group)
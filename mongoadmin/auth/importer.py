@@ -0,0 +1,147 @@
+"""
+Bulk import of mongoengine users.
+
+Rows are validated with a form that doesn't query the database, the
+passwords of a batch are hashed in a process pool and the batch is written
+with one unordered insert. Instead of looking up every username before the
+insert, the unique index on the username rejects duplicates, which are
+reported per row.
+"""
+import multiprocessing
+
+from django import forms
+from django.contrib.auth.hashers import make_password
+from django.utils.translation import ugettext, ugettext_lazy as _
+
+from mongoengine.django.auth import User
+
+from pymongo.errors import OperationFailure
+
+from mongoadmin.importer import DocumentImporter, ImportFailed
+
+DUPLICATE_KEY_ERROR = 11000
+BOOLEAN_VALUES = {
+    '1': True, 'true': True, 'yes': True, 'on': True,
+    '0': False, 'false': False, 'no': False, 'off': False,
+}
+
+
+class BooleanValueField(forms.TypedChoiceField):
+    """
+    A boolean column, which accepts 1/0, true/false, yes/no and on/off in
+    any case. Empty values are None.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('choices', [(value, value) for value in BOOLEAN_VALUES])
+        kwargs.setdefault('coerce', BOOLEAN_VALUES.__getitem__)
+        kwargs.setdefault('empty_value', None)
+        super(BooleanValueField, self).__init__(**kwargs)
+
+    def to_python(self, value):
+        return super(BooleanValueField, self).to_python(value).strip().lower()
+
+
+class UserImportForm(forms.Form):
+    """
+    Validates one row of a user import. Rows without a password get an
+    unusable password.
+    """
+    username = forms.RegexField(max_length=30, regex=r'^[\w.@+-]+$',
+        error_messages={
+            'invalid': _("This value may contain only letters, numbers and "
+                         "@/./+/-/_ characters.")})
+    password = forms.CharField(required=False)
+    email = forms.EmailField(required=False)
+    first_name = forms.CharField(max_length=30, required=False)
+    last_name = forms.CharField(max_length=30, required=False)
+    is_active = BooleanValueField(required=False)
+    is_staff = BooleanValueField(required=False)
+
+
+def _hash(password):
+    return make_password(password or None)
+
+
+class UserImporter(DocumentImporter):
+    """
+    Imports users in batches of ``batch_size``, hashing the passwords with
+    ``processes`` processes (in this process if None or 1).
+    """
+    def __init__(self, model=User, form_class=UserImportForm, batch_size=1000,
+                 max_errors=100, processes=None):
+        super(UserImporter, self).__init__(model, form_class, batch_size=batch_size,
+                                           max_errors=max_errors)
+        self.processes = processes
+        self.pool = None
+        self.duplicates = 0
+
+    def ensure_unique_index(self):
+        """
+        Creates the unique index on the username if it doesn't exist yet.
+        Raises ImportFailed if it can't be created, e.g. because existing
+        users share a username.
+        """
+        db_field = self.model._fields['username'].db_field
+        collection = self.model._get_collection()
+        for index in collection.index_information().values():
+            if index.get('unique') and [key for key, direction in index['key']] == [db_field]:
+                return
+        try:
+            collection.create_index([(db_field, 1)], unique=True)
+        except OperationFailure as e:
+            raise ImportFailed(ugettext(
+                "The unique index on the usernames can't be created, so "
+                "duplicates can't be detected: %s") % e)
+
+    def build_document(self, row):
+        """
+        Returns a ``(son, errors)`` tuple, where the son still has the raw
+        password. It's hashed when the batch is written.
+        """
+        form = self.form_class(data=self.form_data(row))
+        if not form.is_valid():
+            errors = []
+            for field, field_errors in form.errors.items():
+                for error in field_errors:
+                    errors.append('%s: %s' % (field, error))
+            return None, errors
+        data = dict((k, v) for k, v in form.cleaned_data.items() if v is not None)
+        password = data.pop('password', '')
+        son = self.model(**data).to_mongo()
+        if '_id' in son and son['_id'] is None:
+            del son['_id']
+        son[self.model._fields['password'].db_field] = password
+        return son, None
+
+    def hash_passwords(self, passwords):
+        if self.processes is None or self.processes <= 1:
+            return [_hash(p) for p in passwords]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes)
+        chunksize = max(1, len(passwords) // (self.processes * 4))
+        return self.pool.map(_hash, passwords, chunksize)
+
+    def run(self, rows):
+        self.ensure_unique_index()
+        try:
+            return super(UserImporter, self).run(rows)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+
+    def write(self, batch):
+        db_field = self.model._fields['password'].db_field
+        hashes = self.hash_passwords([op[1][db_field] for row_number, op in batch])
+        for (row_number, op), password in zip(batch, hashes):
+            op[1][db_field] = password
+        super(UserImporter, self).write(batch)
+
+    def write_error(self, row_number, error):
+        if error.get('code') == DUPLICATE_KEY_ERROR:
+            self.duplicates += 1
+            self.result.add_error(row_number, [
+                ugettext("A user with that username already exists.")])
+        else:
+            super(UserImporter, self).write_error(row_number, error)
@@ -0,0 +1,319 @@
+"""
+Benchmarks for the hot paths of the admin.
+
+Generates synthetic collections of configurable size and shape (wide
+documents, nested embedded lists and references), then times the changelist
+results, the result list rendering, form and formset construction, the
+delete action and the raw id widget. Runs against any mongoengine
+connection, including mongomock as in-process stand-in for mongod. The
+result is a dict that can be dumped as JSON to compare releases.
+"""
+import datetime
+import gc
+import platform
+import random
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python < 3.4, memory is not measured
+    tracemalloc = None
+
+import django
+import mongoengine
+from mongoengine import fields
+from mongoengine.document import Document, EmbeddedDocument
+
+from django.test.client import RequestFactory
+
+from mongodbforms import init_document_options
+
+from mongoadmin.options import DocumentAdmin
+from mongoadmin.sites import MongoAdminSite
+from mongoadmin.widgets import ReferenceRawIdWidget
+
+COLLECTION_PREFIX = 'mongoadmin_bench_'
+
+
+class BenchmarkUser(object):
+    """
+    A user with all permissions, so the benchmark doesn't need any auth
+    backend or database.
+    """
+    pk = 1
+    id = 1
+    is_active = True
+    is_staff = True
+    is_superuser = True
+
+    def is_authenticated(self):
+        return True
+
+    def has_perm(self, perm, obj=None):
+        return True
+
+    def has_perms(self, perms, obj=None):
+        return True
+
+    def has_module_perms(self, app_label):
+        return True
+
+
+class Shape(object):
+    """
+    The shape of the generated documents.
+    """
+    def __init__(self, width=20, depth=2, list_length=5, alias='default'):
+        self.width = width
+        self.depth = depth
+        self.list_length = list_length
+        self.alias = alias
+
+
+def make_documents(shape):
+    """
+    Returns a ``(document, referenced document)`` tuple of new document
+    classes. The document has ``width`` scalar fields, a reference and a list
+    of embedded documents nested ``depth`` levels deep.
+    """
+    suffix = 'w%dd%d' % (shape.width, shape.depth)
+
+    target = type('BenchTarget' + suffix, (Document,), {
+        '__module__': __name__,
+        'name': fields.StringField(max_length=100),
+        'meta': {'collection': COLLECTION_PREFIX + 'target_' + suffix,
+                 'db_alias': shape.alias},
+    })
+
+    embedded = None
+    for level in reversed(range(shape.depth)):
+        attrs = {
+            '__module__': __name__,
+            'label': fields.StringField(max_length=100),
+            'value': fields.IntField(),
+        }
+        if embedded is not None:
+            attrs['children'] = fields.ListField(fields.EmbeddedDocumentField(embedded))
+        embedded = type('BenchEmbedded%s_%d' % (suffix, level), (EmbeddedDocument,), attrs)
+
+    attrs = {
+        '__module__': __name__,
+        'created': fields.DateTimeField(),
+        'target': fields.ReferenceField(target),
+        'meta': {'collection': COLLECTION_PREFIX + 'document_' + suffix,
+                 'db_alias': shape.alias},
+    }
+    for i in range(shape.width):
+        if i % 2:
+            attrs['field_%d' % i] = fields.IntField()
+        else:
+            attrs['field_%d' % i] = fields.StringField(max_length=100)
+    if embedded is not None:
+        attrs['items'] = fields.ListField(fields.EmbeddedDocumentField(embedded))
+    document = type('BenchDocument' + suffix, (Document,), attrs)
+
+    init_document_options(document)
+    init_document_options(target)
+    return document, target
+
+
+def _make_items(embedded, shape, level):
+    items = []
+    for i in range(shape.list_length):
+        attrs = {'label': 'item %d' % i, 'value': i}
+        if 'children' in embedded._fields and level + 1 < shape.depth:
+            child = embedded._fields['children'].field.document_type
+            attrs['children'] = _make_items(child, shape, level + 1)
+        items.append(embedded(**attrs))
+    return items
+
+
+def populate(document, target, shape, count, batch_size=1000):
+    """
+    Replaces the contents of the collections with ``count`` documents
+    referencing ``count / 10`` targets.
+    """
+    document.drop_collection()
+    target.drop_collection()
+
+    targets = [target(name='target %d' % i) for i in range(max(1, count // 10))]
+    target.objects.insert(targets)
+
+    embedded = None
+    if 'items' in document._fields:
+        embedded = document._fields['items'].field.document_type
+
+    batch = []
+    now = datetime.datetime.utcnow()
+    for i in range(count):
+        attrs = {'created': now - datetime.timedelta(minutes=i),
+                 'target': random.choice(targets)}
+        for j in range(shape.width):
+            attrs['field_%d' % j] = i * j if j % 2 else 'value %d-%d' % (i, j)
+        if embedded is not None:
+            attrs['items'] = _make_items(embedded, shape, 0)
+        batch.append(document(**attrs))
+        if len(batch) >= batch_size:
+            document.objects.insert(batch, load_bulk=False)
+            batch = []
+    if batch:
+        document.objects.insert(batch, load_bulk=False)
+
+
+def make_admin(document, list_per_page=100):
+    site = MongoAdminSite(name='mongoadmin_bench')
+    displayed = [name for name in document._fields_ordered
+                 if name.startswith('field_')][:5]
+    admin_class = type('BenchAdmin', (DocumentAdmin,), {
+        'list_display': tuple(displayed) + ('target', 'created'),
+        'raw_id_fields': ('target',),
+        'list_per_page': list_per_page,
+        'list_max_show_all': list_per_page * 10,
+        'message_user': lambda self, request, message, *args, **kwargs: None,
+        'log_deletion': lambda self, request, object, object_repr: None,
+    })
+    site.register(document, admin_class)
+    return site._registry[document]
+
+
+def _request(method='get', path='/', data=None):
+    request = getattr(RequestFactory(), method)(path, data or {})
+    request.user = BenchmarkUser()
+    return request
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    if not samples:
+        return None
+    index = int(round(p / 100.0 * (len(samples) - 1)))
+    return samples[index]
+
+
+def measure(func, repeat):
+    """
+    Calls ``func`` ``repeat`` times and returns latency percentiles in
+    milliseconds and the peak of allocated memory in bytes. If ``func``
+    returns a number, it is used as the duration of the call in seconds
+    instead of the measured one (to exclude setup work).
+
+    Tracing allocations slows every call down, so the calls are timed
+    without it and the peak memory is measured in one more call.
+    """
+    samples = []
+    for i in range(repeat):
+        gc.collect()
+        start = time.time()
+        elapsed = func()
+        if elapsed is None:
+            elapsed = time.time() - start
+        samples.append(elapsed * 1000)
+
+    peak = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        'samples': len(samples),
+        'min_ms': min(samples),
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': max(samples),
+        'mean_ms': sum(samples) / len(samples),
+        'peak_memory_bytes': peak,
+    }
+
+
+def run(shape, count=10000, repeat=20, delete_batch=20):
+    """
+    Generates the collections, runs all benchmarks and returns the results.
+    """
+    from mongoadmin.actions import _delete_selected
+    from mongoadmin.templatetags.documenttags import document_result_list
+
+    document, target = make_documents(shape)
+    populate(document, target, shape, count)
+    model_admin = make_admin(document)
+
+    def changelist(request):
+        cl_class = model_admin.get_changelist(request)
+        return cl_class(request, document, model_admin.list_display,
+                        model_admin.list_display_links, model_admin.list_filter,
+                        model_admin.date_hierarchy, model_admin.search_fields,
+                        model_admin.list_select_related, model_admin.list_per_page,
+                        model_admin.list_max_show_all, model_admin.list_editable,
+                        model_admin)
+
+    request = _request()
+    cl = changelist(request)
+    cl.formset = None
+    obj = document.objects.first()
+    widget = ReferenceRawIdWidget(document._fields['target'].rel, model_admin.admin_site)
+    target_ids = list(target.objects.scalar('pk')[:50])
+
+    def get_results():
+        cl.get_results(request)
+        list(cl.result_list)
+
+    def render_results():
+        cl.result_list = list(cl.result_list)
+        document_result_list(cl)
+
+    def get_form():
+        form_class = model_admin.get_form(request, obj)
+        form_class(instance=obj)
+
+    def get_formsets():
+        for inline in model_admin.get_inline_instances(request, obj):
+            formset_class = inline.get_formset(request, obj)
+            formset_class(instance=obj)
+
+    def delete_selected():
+        victims = [document(field_0='delete me') for i in range(delete_batch)]
+        ids = [v.pk for v in document.objects.insert(victims)]
+        post = _request('post', data={'post': 'yes'})
+        start = time.time()
+        _delete_selected(model_admin, post, document.objects(pk__in=ids))
+        return time.time() - start
+
+    def render_widget():
+        for pk in target_ids:
+            widget.render('target', pk)
+
+    results = {
+        'changelist.get_results': measure(get_results, repeat),
+        'document_result_list': measure(render_results, repeat),
+        'get_form': measure(get_form, repeat),
+        'get_formset': measure(get_formsets, repeat),
+        'delete_selected': measure(delete_selected, repeat),
+        'ReferenceRawIdWidget.render': measure(render_widget, repeat),
+    }
+
+    document.drop_collection()
+    target.drop_collection()
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'mongoengine': getattr(mongoengine, '__version__', None) or
+                           '.'.join(str(v) for v in getattr(mongoengine, 'VERSION', ())),
+        },
+        'config': {
+            'documents': count,
+            'width': shape.width,
+            'depth': shape.depth,
+            'list_length': shape.list_length,
+            'repeat': repeat,
+            'delete_batch': delete_batch,
+            'widget_renders': len(target_ids),
+        },
+        'results': results,
+    }
@@ -0,0 +1,199 @@
+"""
+Offline validation of the registered document admins.
+
+MongoAdminSite.register() doesn't validate admin classes because the
+validation code is slow to import and run. The functions here run the
+validators from mongoadmin.validation once for every registered document
+admin, either from the ``validate_mongoadmin`` management command or as a
+Django system check. Results are cached by a hash of the admin's
+configuration, so unchanged admins are not validated again.
+"""
+import hashlib
+import inspect
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from mongoengine.base import TopLevelDocumentMetaclass
+
+CACHE_KEY_PREFIX = 'mongoadmin:validation:'
+
+
+class ValidatorResult(object):
+    def __init__(self, name, error, duration):
+        self.name = name
+        self.error = error
+        self.duration = duration
+
+
+class AdminValidation(object):
+    """
+    The results of all validators for one admin class.
+    """
+    def __init__(self, admin_class, model, results, cached=False):
+        self.admin_class = admin_class
+        self.model = model
+        self.results = results
+        self.cached = cached
+
+    @property
+    def errors(self):
+        return [r.error for r in self.results if r.error is not None]
+
+    @property
+    def duration(self):
+        return sum(r.duration for r in self.results)
+
+
+def registered_admin_classes(admin_site):
+    """
+    Returns ``(model, admin_class)`` tuples for all documents registered with
+    ``admin_site``. Admins pending on a lazy site are not instantiated, but
+    the options of their documents are initialized, as the validators need
+    them.
+    """
+    from mongodbforms import init_document_options
+    from mongoadmin.sites import PendingAdmin
+
+    admins = []
+    for model, admin in dict.items(admin_site._registry):
+        if not isinstance(model, TopLevelDocumentMetaclass):
+            continue
+        if isinstance(admin, PendingAdmin):
+            init_document_options(model)
+            admins.append((model, admin.admin_class))
+        else:
+            admins.append((model, admin.__class__))
+    return admins
+
+
+def _stable_repr(value):
+    # reprs of functions and classes contain memory addresses which differ
+    # between processes, so they are replaced by their dotted path.
+    if isinstance(value, (list, tuple)):
+        return '(%s)' % ', '.join(_stable_repr(v) for v in value)
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join('%s: %s' % (_stable_repr(k), _stable_repr(v))
+                                  for k, v in sorted(value.items(), key=lambda i: repr(i[0])))
+    if inspect.isclass(value) or inspect.isfunction(value) or inspect.ismethod(value):
+        return '%s.%s' % (getattr(value, '__module__', ''), getattr(value, '__name__', ''))
+    return repr(value)
+
+
+# field attributes the validators look at
+FIELD_ATTRIBUTES = (
+    'db_field', 'required', 'unique', 'unique_with', 'primary_key', 'choices',
+    'null', 'max_length', 'min_length', 'max_value', 'min_value', 'regex',
+    'verbose_name', 'help_text', 'document_type_obj', 'dbref', 'editable',
+    'blank', 'collection_name', 'size', 'thumbnail_size',
+)
+
+
+def _field_repr(field):
+    attributes = []
+    for name in FIELD_ATTRIBUTES:
+        if name in field.__dict__:
+            attributes.append('%s=%s' % (name, _stable_repr(field.__dict__[name])))
+    # the inner field of list and dict fields
+    inner = field.__dict__.get('field')
+    if inner is not None:
+        attributes.append('field=%s' % _field_repr(inner))
+    return '%s(%s)' % (field.__class__.__name__, ', '.join(attributes))
+
+
+def config_hash(admin_class, model):
+    """
+    Returns a hash of the admin options of ``admin_class`` and the fields of
+    ``model``, including the field attributes the validators check.
+    """
+    parts = ['%s.%s' % (model.__module__, model.__name__)]
+    for name in sorted(model._fields):
+        parts.append('%s=%s' % (name, _field_repr(model._fields[name])))
+    for name in dir(admin_class):
+        if name.startswith('_'):
+            continue
+        value = getattr(admin_class, name)
+        if inspect.ismethod(value) or inspect.isfunction(value) or isinstance(value, property):
+            continue
+        parts.append('%s=%s' % (name, _stable_repr(value)))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _get_cache():
+    from django.core.cache import get_cache
+    return get_cache(getattr(settings, 'MONGOADMIN_VALIDATION_CACHE', 'default'))
+
+
+def validate_admin(admin_class, model, use_cache=True):
+    """
+    Runs every validator on ``admin_class`` and returns an AdminValidation.
+    """
+    from mongoadmin.validation import DocumentAdminValidator
+
+    key = CACHE_KEY_PREFIX + config_hash(admin_class, model)
+    if use_cache:
+        cached = _get_cache().get(key)
+        if cached is not None:
+            return AdminValidation(admin_class, model,
+                                   [ValidatorResult(*r) for r in cached], cached=True)
+
+    validator = DocumentAdminValidator()
+    results = []
+    for name in sorted(dir(validator)):
+        if not name.startswith('validate_'):
+            continue
+        start = time.time()
+        error = None
+        try:
+            getattr(validator, name)(admin_class, model)
+        except ImproperlyConfigured as e:
+            error = str(e)
+        results.append(ValidatorResult(name, error, time.time() - start))
+
+    _get_cache().set(key, [(r.name, r.error, r.duration) for r in results],
+                     getattr(settings, 'MONGOADMIN_VALIDATION_CACHE_TIMEOUT', 60 * 60 * 24))
+    return AdminValidation(admin_class, model, results)
+
+
+def validate_site(admin_site=None, use_cache=True, processes=4):
+    """
+    Validates all document admins registered with ``admin_site`` using a pool
+    of ``processes`` threads. Returns a list of AdminValidation objects.
+    """
+    if admin_site is None:
+        from mongoadmin.sites import site as admin_site
+
+    admins = registered_admin_classes(admin_site)
+    if processes <= 1 or len(admins) <= 1:
+        return [validate_admin(a, m, use_cache) for m, a in admins]
+
+    pool = ThreadPool(min(processes, len(admins)))
+    try:
+        return pool.map(lambda ma: validate_admin(ma[1], ma[0], use_cache), admins)
+    finally:
+        pool.close()
+
+
+def check_document_admins(app_configs=None, **kwargs):
+    """
+    Django system check running the validators on all document admins.
+    """
+    from django.core import checks
+
+    errors = []
+    for validation in validate_site():
+        for error in validation.errors:
+            errors.append(checks.Error(error, hint=None, obj=validation.admin_class,
+                                       id='mongoadmin.E001'))
+    return errors
+
+try:
+    from django.core.checks import register as register_check
+except ImportError:
+    # Django < 1.7 has no system check framework, the management
+    # command has to be used.
+    pass
+else:
+    register_check('admin')(check_document_admins)
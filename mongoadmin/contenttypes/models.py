@@ -5,6 +5,7 @@ if has_rel_db():
 else:
     from django.contrib.contenttypes.models import ContentTypeManager as DjangoContentTypeManager
     
+    from mongoengine import signals
     from mongoengine.queryset import QuerySet
     from mongoengine.django.auth import ContentType
     
@@ -13,12 +14,63 @@ else:
     
     
     class ContentTypeManager(DjangoContentTypeManager):
+        # Cache shared by all instances, keyed by the string of the id and
+        # by (app_label, model). Content types are created once and hardly
+        # ever change, so they are kept until clear_cache() is called.
+        _documents_cache = {}
+
         def get_query_set(self):
             """Returns a new QuerySet object.  Subclasses can override this method
             to easily customize the behavior of the Manager.
             """
             return QuerySet(self.model, self.model._get_collection())
-            
+
+        def _add_to_cache(self, using, ct):
+            self._documents_cache[str(ct.id)] = ct
+            self._documents_cache[(ct.app_label, ct.model)] = ct
+
+        def get_for_model(self, model, for_concrete_model=True):
+            """
+            Returns the ContentType for the model or document ``model``,
+            creating it if it doesn't exist.
+            """
+            opts = model._meta
+            if for_concrete_model and getattr(opts, 'concrete_model', None) is not None:
+                opts = opts.concrete_model._meta
+            key = (opts.app_label, opts.model_name)
+            ct = self._documents_cache.get(key)
+            if ct is None:
+                ct, created = self.get_or_create(app_label=opts.app_label, model=opts.model_name,
+                                                 defaults={'name': opts.verbose_name_raw})
+                self._add_to_cache(None, ct)
+            return ct
+
+        def get_for_models(self, *models, **kwargs):
+            for_concrete_models = kwargs.pop('for_concrete_models', True)
+            return dict((model, self.get_for_model(model, for_concrete_models))
+                        for model in models)
+
+        def get_for_id(self, id):
+            """
+            Returns the ContentType with the primary key ``id``.
+            """
+            ct = self._documents_cache.get(str(id))
+            if ct is None:
+                ct = self.get(pk=id)
+                self._add_to_cache(None, ct)
+            return ct
+
+        def preload(self):
+            """
+            Loads all content types into the cache with one query.
+            """
+            for ct in self.get_query_set():
+                self._add_to_cache(None, ct)
+
+        def clear_cache(self):
+            self._documents_cache.clear()
+            super(ContentTypeManager, self).clear_cache()
+
         def contribute_to_class(self, model, name):
             init_document_options(model)
             super(ContentTypeManager, self).contribute_to_class(model, name)
@@ -40,6 +92,13 @@ else:
     
     manager = ContentTypeManager()
     manager.contribute_to_class(ContentType, 'objects')
+
+    def invalidate_cache(sender, **kwargs):
+        ContentType.objects.clear_cache()
+
+    if signals.signals_available:
+        signals.post_save.connect(invalidate_cache, sender=ContentType)
+        signals.post_delete.connect(invalidate_cache, sender=ContentType)
     
     try:
         from grappelli.templatetags import grp_tags
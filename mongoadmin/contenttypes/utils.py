@@ -1,39 +1,95 @@
-import sys
+import threading
 
 from django.conf import settings
 from django.db.models import get_model
+try:
+    from django.test.signals import setting_changed
+except ImportError:
+    setting_changed = None
 
 from mongoengine.base.common import _document_registry
 
 # if there is a relational db and we can load a content type
 # object from it, we simply export Django's stuff and are done.
-# Otherwise we roll our own (mostly) compatible version 
+# Otherwise we roll our own (mostly) compatible version
 # using mongoengine.
 
+_has_rel_db = None
+
 def has_rel_db():
-    if not getattr(settings, 'MONGOADMIN_CHECK_CONTENTTYPE', True):
-        return True
-    
-    engine = settings.DATABASES.get('default', {}).get('ENGINE', 'django.db.backends.dummy')
-    if engine.endswith('dummy'):
-        return False
-    return True
-    
-def get_model_or_document(app_label, model):
-    if has_rel_db():
-        return get_model(app_label, model, only_installed=False)
-    else:
+    global _has_rel_db
+    if _has_rel_db is None:
+        if not getattr(settings, 'MONGOADMIN_CHECK_CONTENTTYPE', True):
+            _has_rel_db = True
+        else:
+            engine = settings.DATABASES.get('default', {}).get('ENGINE', 'django.db.backends.dummy')
+            _has_rel_db = not engine.endswith('dummy')
+    return _has_rel_db
+
+def _reset_has_rel_db(setting, **kwargs):
+    global _has_rel_db
+    if setting in ('DATABASES', 'MONGOADMIN_CHECK_CONTENTTYPE'):
+        _has_rel_db = None
+
+if setting_changed is not None:
+    setting_changed.connect(_reset_has_rel_db)
+
+
+class DocumentIndex(object):
+    """
+    Maps the lower case ``(app_label, model)`` pairs of the content types to
+    the names in mongoengine's document registry. The registry only grows,
+    so the index is rebuilt whenever its size changed. The index holds names
+    rather than classes, so redefined documents are found as well.
+    """
+    def __init__(self):
+        self.size = -1
+        self.by_model = {}
+        self.by_label = {}
+        self.lock = threading.Lock()
+
+    def app_label(self, document):
+        parts = document.__module__.split('.')
+        if len(parts) < 2:
+            return None
+        return parts[-2].lower()
+
+    def build(self):
+        by_model = {}
+        by_label = {}
+        for name, document in list(_document_registry.items()):
+            model = name.lower()
+            by_model.setdefault(model, []).append(name)
+            by_label.setdefault((self.app_label(document), model), name)
+        return by_model, by_label
+
+    def update(self):
+        if self.size != len(_document_registry):
+            with self.lock:
+                size = len(_document_registry)
+                if self.size != size:
+                    self.by_model, self.by_label = self.build()
+                    self.size = size
+
+    def get(self, app_label, model):
+        self.update()
         # mongoengine's document registry is case sensitive
         # while all models are stored in lowercase in the
-        # content types. So we can't use get_document.
+        # content types.
         model = str(model).lower()
-        possible_docs = [v for k, v in _document_registry.items() if k.lower() == model]
-        if len(possible_docs) == 1:
-            return possible_docs[0]
-        if len(possible_docs) > 1:
-            for doc in possible_docs:
-                module = sys.modules[doc.__module__]
-                doc_app_label = module.__name__.split('.')[-2]
-                if doc_app_label.lower() == app_label.lower():
-                    return doc
-        return None
\ No newline at end of file
+        names = self.by_model.get(model)
+        if not names:
+            return None
+        if len(names) == 1:
+            return _document_registry.get(names[0])
+        name = self.by_label.get((str(app_label).lower(), model))
+        if name is None:
+            return None
+        return _document_registry.get(name)
+
+document_index = DocumentIndex()
+
+def get_model_or_document(app_label, model):
+    if has_rel_db():
+        return get_model(app_label, model, only_installed=False)
+    return document_index.get(app_label, model)
@@ -12,7 +12,7 @@ def shortcut(request, content_type_id, object_id):
     """
     # Look up the object, making sure it's got a get_absolute_url() function.
     try:
-        content_type = ContentType.objects.get(pk=content_type_id)
+        content_type = ContentType.objects.get_for_id(content_type_id)
     except (ContentType.DoesNotExist, ValueError):
         raise http.Http404(_("Content type %(ct_id)s object %(obj_id)s doesn't exist") %
                            {'ct_id': content_type_id, 'obj_id': object_id})
@@ -0,0 +1,281 @@
+"""
+Streaming access to the GridFS files of FileFields and ImageFields.
+
+Downloads are sent chunk by chunk and support single byte ranges and
+conditional requests (``ETag``/``Last-Modified``). Uploads for FileFields
+are written to GridFS chunk by chunk while the request body is read, so
+neither needs the whole file in memory.
+
+Only images and PDFs are ever shown inline, in a sandbox; every other
+type is sent as an attachment, so an uploaded HTML or SVG file can't run
+scripts with the admin's origin.
+"""
+import calendar
+import mimetypes
+import re
+
+import gridfs
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import (http_date, parse_http_date_safe, quote_etag, parse_etags,
+                               same_origin)
+
+from mongoengine.connection import get_db
+from mongoengine.fields import FileField, ImageField
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# content types browsers render without running scripts
+INLINE_CONTENT_TYPES = frozenset([
+    'application/pdf',
+    'image/bmp',
+    'image/gif',
+    'image/jpeg',
+    'image/png',
+    'image/webp',
+])
+
+
+def stream_fields(model):
+    """
+    Returns the top level FileFields of ``model`` whose uploads can be
+    streamed to GridFS. ImageFields are excluded, because mongoengine has
+    to read the whole image to validate and resize it.
+    """
+    return dict((name, field) for name, field in model._fields.items()
+                if isinstance(field, FileField) and not isinstance(field, ImageField))
+
+
+def get_fs(field):
+    return gridfs.GridFS(get_db(field.db_alias), field.collection_name)
+
+
+class GridFSUploadedFile(UploadedFile):
+    """
+    A file that was streamed into GridFS during the upload. Reading it reads
+    back from GridFS.
+    """
+    def __init__(self, fs, grid_id, name, content_type, size, charset=None):
+        self.fs = fs
+        self.grid_id = grid_id
+        self.saved = False
+        self._grid_out = None
+        super(GridFSUploadedFile, self).__init__(None, name, content_type, size, charset)
+
+    def _get_file(self):
+        if self._grid_out is None:
+            self._grid_out = self.fs.get(self.grid_id)
+        return self._grid_out
+
+    def _set_file(self, value):
+        self._grid_out = value
+
+    file = property(_get_file, _set_file)
+
+    def open(self, mode=None):
+        self.file.seek(0)
+
+    def close(self):
+        pass
+
+    def delete(self):
+        self.fs.delete(self.grid_id)
+
+
+class GridFSFormMixin(object):
+    """
+    A mixin for document forms that keeps the files streamed into GridFS
+    out of ``construct_instance``, which would copy them into new GridFS
+    files (and delete the previous files) while the form is validated. They
+    are collected in ``streamed_uploads`` instead, for
+    ``DocumentAdmin.save_form`` to attach them. The ids of the images that
+    uploads replace are collected in ``replaced_images`` as ``(field,
+    grid_id)`` tuples, so their thumbnails can be deleted.
+    """
+    def _post_clean(self):
+        self.streamed_uploads = {}
+        self.replaced_images = []
+        for name, value in list(self.cleaned_data.items()):
+            if isinstance(value, GridFSUploadedFile):
+                self.streamed_uploads[name] = self.cleaned_data.pop(name)
+                continue
+            field = self.instance._fields.get(name)
+            if isinstance(field, ImageField) and isinstance(value, UploadedFile):
+                grid_id = getattr(self.instance._data.get(name), 'grid_id', None)
+                if grid_id is not None:
+                    self.replaced_images.append((field, grid_id))
+        super(GridFSFormMixin, self)._post_clean()
+
+
+def csrf_precheck(request):
+    """
+    Runs the parts of the CSRF check that don't read the request body: the
+    CSRF cookie must be set, the ``Referer`` of HTTPS requests must be the
+    site and an ``X-CSRFToken`` header must match the cookie. The token of
+    the form can only be checked once the body was read.
+    """
+    if getattr(request, '_dont_enforce_csrf_checks', False):
+        return True
+    if request.is_secure():
+        referer = request.META.get('HTTP_REFERER')
+        if referer is None or not same_origin(referer, 'https://%s/' % request.get_host()):
+            return False
+    cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not cookie:
+        return False
+    header = request.META.get('HTTP_X_CSRFTOKEN')
+    if header is not None:
+        return constant_time_compare(header, cookie)
+    return True
+
+
+class GridFSUploadHandler(FileUploadHandler):
+    """
+    Writes the uploads for the streamable FileFields of ``model`` to GridFS
+    as the chunks arrive. Uploads for other fields are left to the next
+    upload handler.
+    """
+    def __init__(self, model, request=None):
+        super(GridFSUploadHandler, self).__init__(request)
+        self.fields = stream_fields(model)
+        self.fs = None
+        self.grid_in = None
+        self.uploads = []
+
+    def new_file(self, field_name, file_name, content_type, content_length, *args, **kwargs):
+        super(GridFSUploadHandler, self).new_file(field_name, file_name, content_type,
+                                                  content_length, *args, **kwargs)
+        self.grid_in = None
+        field = self.fields.get(field_name)
+        if field is not None:
+            self.fs = get_fs(field)
+            self.grid_in = self.fs.new_file(filename=file_name, content_type=content_type)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.grid_in is None:
+            return raw_data
+        self.grid_in.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.grid_in is None:
+            return None
+        self.grid_in.close()
+        upload = GridFSUploadedFile(self.fs, self.grid_in._id, self.file_name,
+                                    self.content_type, file_size, self.charset)
+        self.uploads.append(upload)
+        self.grid_in = None
+        return upload
+
+    def upload_interrupted(self):
+        if self.grid_in is not None:
+            self.grid_in.abort()
+            self.grid_in = None
+
+
+def _etag(grid_out):
+    # GridFS files are never changed, a new version gets a new id
+    return str(grid_out._id)
+
+
+def _stream(grid_out, start, length, chunk_size):
+    grid_out.seek(start)
+    while length > 0:
+        data = grid_out.read(min(chunk_size, length))
+        if not data:
+            break
+        length -= len(data)
+        yield data
+
+
+def parse_range(header, size):
+    """
+    Returns the ``(start, end)`` byte positions (inclusive) of a single
+    range ``Range`` header, None if the header can't be used and False if
+    the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # the last bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _protect(response, inline=False):
+    response['X-Content-Type-Options'] = 'nosniff'
+    if inline:
+        response['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+def serve_file(request, grid_out, attachment=True):
+    """
+    Returns a response that streams ``grid_out``, a GridOut, honoring range
+    and conditional request headers. ``attachment=False`` only shows files
+    of the ``INLINE_CONTENT_TYPES`` inline.
+    """
+    etag = quote_etag(_etag(grid_out))
+    last_modified = None
+    if grid_out.upload_date is not None:
+        last_modified = http_date(calendar.timegm(grid_out.upload_date.utctimetuple()))
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        if etag.strip('"') in parse_etags(if_none_match) or if_none_match.strip() == '*':
+            return _protect(HttpResponseNotModified())
+    elif last_modified is not None:
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_modified_since is not None and \
+                if_modified_since >= parse_http_date_safe(last_modified):
+            return _protect(HttpResponseNotModified())
+
+    size = grid_out.length
+    content_type = grid_out.content_type or \
+        mimetypes.guess_type(grid_out.filename or '')[0] or 'application/octet-stream'
+    inline = not attachment and \
+        content_type.split(';')[0].strip().lower() in INLINE_CONTENT_TYPES
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range not in (etag, last_modified):
+        # the file changed, send all of it
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%d' % size
+        return _protect(response)
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    response = StreamingHttpResponse(_stream(grid_out, start, length, grid_out.chunk_size),
+                                     content_type=content_type,
+                                     status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = last_modified
+    disposition = 'inline' if inline else 'attachment'
+    if grid_out.filename:
+        disposition += '; filename="%s"' % grid_out.filename.replace('"', '')
+    response['Content-Disposition'] = disposition
+    return _protect(response, inline)
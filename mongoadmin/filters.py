@@ -0,0 +1,273 @@
+"""
+List filters for document fields.
+
+Django's related field filter lists every document of the referenced
+collection. ReferenceFieldListFilter only lists the references that occur
+in the changelist: at most ``max_scanned`` documents are grouped on the
+server with a capped ``$group``, and the labels are read with one ``$in``
+query. If there are more than ``max_choices`` references, or not all
+documents were grouped, the filter also offers a search over the referenced
+documents. DocumentChangeList uses the filter for the ReferenceFields in
+``list_filter``.
+"""
+from bson import DBRef
+
+from django.contrib.admin import FieldListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.core.urlresolvers import reverse, NoReverseMatch
+from django.utils import six
+from django.utils.translation import ugettext_lazy as _
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from mongoengine.errors import ValidationError as MongoValidationError
+from mongoengine.fields import ReferenceField
+
+try:
+    from pymongo.errors import ExecutionTimeout
+except ImportError:
+    # pymongo < 2.7 can't set time limits
+    class ExecutionTimeout(Exception):
+        pass
+
+# the number of batches of documents matching a search for references that
+# are checked for being referenced
+MAX_SEARCH_BATCHES = 10
+
+
+def reference_id(value):
+    if isinstance(value, DBRef):
+        return value.id
+    return getattr(value, 'pk', value)
+
+
+def parse_id(document, value):
+    """
+    Returns ``value`` converted to the type of the ids of ``document``.
+    Raises a ValidationError for values that aren't valid ids.
+    """
+    return document._fields[document._meta['id_field']].to_mongo(value)
+
+
+def referenced_ids(queryset, field_path, limit, max_time_ms=None, max_scanned=None):
+    """
+    Returns up to ``limit`` distinct ids referenced by ``field_path`` in the
+    documents of ``queryset``, including None if some documents have no
+    reference, and whether the ids are complete. Only the first
+    ``max_scanned`` documents are grouped, if given; ``max_time_ms`` bounds
+    the aggregation (ExecutionTimeout is raised).
+    """
+    document = queryset._document
+    db_path = document._translate_field_name(field_path.replace('__', '.'))
+    options = {}
+    if max_time_ms:
+        options['maxTimeMS'] = max_time_ms
+    pipeline = []
+    if max_scanned:
+        pipeline.append({'$limit': max_scanned})
+    pipeline.append({'$group': {'_id': '$%s' % db_path, 'count': {'$sum': 1}}})
+    pipeline.append({'$limit': limit})
+    result = queryset.order_by().aggregate(*pipeline, **options)
+    if isinstance(result, dict):
+        # pymongo < 3
+        result = result.get('result', [])
+    result = list(result)
+    # the counts add up to the grouped documents if all groups were returned
+    complete = len(result) < limit and (
+        not max_scanned or sum(r['count'] for r in result) < max_scanned)
+    return [reference_id(r['_id']) for r in result], complete
+
+
+def reference_labels(document, ids):
+    """
+    Returns a dict of the labels of the ``document`` instances with ``ids``,
+    read with one query.
+    """
+    labels = dict((obj.pk, force_unicode(obj)) for obj in document.objects(pk__in=ids))
+    return dict((pk, labels.get(pk, force_unicode(pk))) for pk in ids)
+
+
+def search_references(model_admin, request, field_path, term, limit):
+    """
+    Returns ``(id, label)`` tuples of up to ``limit`` documents referenced
+    by ``field_path`` of the changelist of ``model_admin`` that match
+    ``term``. The referenced documents are searched with the search fields
+    of their admin or by id. The matches are checked in batches, until
+    ``limit`` referenced ones are found, ``MAX_SEARCH_BATCHES`` batches
+    were checked or a check exceeds the count time budget of the admin.
+    """
+    document = model_admin.model._fields[field_path].document_type
+    admin = model_admin.admin_site._registry.get(document)
+    if admin is not None and admin.search_fields:
+        candidates, use_distinct = admin.get_search_results(
+            request, admin.get_queryset(request), term)
+    else:
+        try:
+            candidates = document.objects(pk=parse_id(document, term))
+        except (MongoValidationError, ValidationError, ValueError):
+            return []
+    candidates = candidates.order_by('pk')
+    queryset = model_admin.get_queryset(request)
+    batch_size = limit * 5
+    results = []
+    last = None
+    for i in range(MAX_SEARCH_BATCHES):
+        batch = candidates if last is None else candidates.filter(pk__gt=last)
+        batch = [(obj.pk, force_unicode(obj)) for obj in batch.limit(batch_size)]
+        if not batch:
+            break
+        last = batch[-1][0]
+        try:
+            present = set(referenced_ids(
+                queryset.filter(**{'%s__in' % field_path: [pk for pk, label in batch]}),
+                field_path, limit, model_admin.count_max_time_ms)[0])
+        except ExecutionTimeout:
+            break
+        results.extend((pk, label) for pk, label in batch if pk in present)
+        if len(results) >= limit or len(batch) < batch_size:
+            break
+    return results[:limit]
+
+
+def parse_isnull(value):
+    # like Django's admin, 'False' and '0' aren't true
+    return value.lower() not in ('', 'false', '0')
+
+
+class ReferenceFieldListFilter(FieldListFilter):
+    """
+    Filters by the document a ReferenceField references, offering the
+    references of the documents the earlier filters of the changelist
+    match.
+    """
+    template = 'admin/mongo_reference_filter.html'
+    # the number of references that are listed before the filter switches
+    # to searching
+    max_choices = 30
+    # the number of documents whose references are grouped for the choices
+    max_scanned = 10000
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = field_path
+        self.lookup_kwarg_isnull = '%s__isnull' % field_path
+        self.lookup_val = request.GET.get(self.lookup_kwarg)
+        self.lookup_val_isnull = request.GET.get(self.lookup_kwarg_isnull)
+        self.isnull = None
+        if self.lookup_val_isnull is not None:
+            self.isnull = parse_isnull(self.lookup_val_isnull)
+        self.document = field.document_type
+        self.model_admin = model_admin
+        self.base_queryset = None
+        super(ReferenceFieldListFilter, self).__init__(
+            field, request, params, model, model_admin, field_path)
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg, self.lookup_kwarg_isnull]
+
+    def queryset(self, request, queryset):
+        # the choices are the references the earlier filters leave
+        self.base_queryset = queryset
+        if self.isnull is not None:
+            if self.isnull:
+                return queryset.filter(**{self.field_path: None})
+            queryset = queryset.filter(**{'%s__ne' % self.field_path: None})
+        if self.lookup_val:
+            try:
+                pk = parse_id(self.document, self.lookup_val)
+            except (MongoValidationError, ValidationError, ValueError) as e:
+                raise IncorrectLookupParameters(e)
+            return queryset.filter(**{self.field_path: pk})
+        return queryset
+
+    def get_lookup_choices(self, cl):
+        """
+        Returns the ``(id, label)`` choices, whether there are references
+        without a document and whether the choices are truncated. If the
+        references can't be grouped within the count time budget of the
+        admin, there are no choices and only the search is offered. If more
+        than ``max_scanned`` documents match, the choices are the references
+        of the first ones and the search is offered as well.
+        """
+        queryset = self.base_queryset if self.base_queryset is not None else cl.root_queryset
+        queryset = cl.read_queryset(queryset)
+        try:
+            ids, complete = referenced_ids(queryset, self.field_path, self.max_choices + 2,
+                                           self.model_admin.count_max_time_ms,
+                                           self.max_scanned)
+        except ExecutionTimeout:
+            ids = []
+            if self.lookup_val:
+                ids.append(parse_id(self.document, self.lookup_val))
+            labels = reference_labels(self.document, ids)
+            return [(pk, labels[pk]) for pk in ids], bool(self.isnull), True
+        has_none = None in ids
+        ids = [pk for pk in ids if pk is not None]
+        truncated = not complete or len(ids) > self.max_choices
+        ids = ids[:self.max_choices]
+        if self.lookup_val and self.lookup_val not in [force_unicode(pk) for pk in ids]:
+            # keep the selected reference visible
+            ids.append(parse_id(self.document, self.lookup_val))
+        labels = reference_labels(self.document, ids)
+        choices = sorted(((pk, labels[pk]) for pk in ids), key=lambda c: c[1].lower())
+        return choices, has_none, truncated
+
+    def search_url(self):
+        if '__' in self.field_path:
+            return None
+        opts = self.model_admin.model._meta
+        try:
+            return reverse('%s:%s_%s_reference_choices' % (
+                self.model_admin.admin_site.name, opts.app_label, opts.model_name),
+                args=(self.field_path,))
+        except NoReverseMatch:
+            return None
+
+    def choices(self, cl):
+        choices, has_none, truncated = self.get_lookup_choices(cl)
+        self.search_choices_url = self.search_url() if truncated else None
+        # the query string for a reference found by searching, the id
+        # replaces the placeholder
+        self.search_query_string = cl.get_query_string(
+            {self.lookup_kwarg: '__id__'}, [self.lookup_kwarg_isnull])
+        yield {
+            'selected': self.lookup_val is None and self.isnull is None,
+            'query_string': cl.get_query_string({},
+                [self.lookup_kwarg, self.lookup_kwarg_isnull]),
+            'display': _('All'),
+        }
+        for pk, label in choices:
+            yield {
+                'selected': self.lookup_val == force_unicode(pk),
+                'query_string': cl.get_query_string({
+                    self.lookup_kwarg: pk,
+                }, [self.lookup_kwarg_isnull]),
+                'display': label,
+            }
+        if has_none:
+            yield {
+                'selected': bool(self.isnull),
+                'query_string': cl.get_query_string({
+                    self.lookup_kwarg_isnull: 'True',
+                }, [self.lookup_kwarg]),
+                'display': _('None'),
+            }
+
+
+def reference_list_filter(model, list_filter):
+    """
+    Returns ``list_filter`` with the names of the ReferenceFields of
+    ``model`` paired with ReferenceFieldListFilter. Other items are kept.
+    """
+    result = []
+    for item in list_filter:
+        if isinstance(item, six.string_types) and \
+                isinstance(model._fields.get(item), ReferenceField):
+            item = (item, ReferenceFieldListFilter)
+        result.append(item)
+    return result
@@ -0,0 +1,254 @@
+"""
+Bulk import of CSV and JSON lines files into a document collection.
+
+Uploads are read row by row and validated with the admin's document form.
+Valid rows are buffered into batches which are written with a single
+unordered bulk write, so memory use only depends on the batch size and not
+on the size of the uploaded file.
+"""
+import csv
+import codecs
+import json
+
+from django import forms
+from django.utils import six
+from django.utils.datastructures import MultiValueDict
+from django.utils.translation import ugettext_lazy as _
+
+from pymongo.errors import BulkWriteError
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+
+def read_csv(f, encoding='utf-8-sig'):
+    """
+    Yields ``(data, error)`` tuples for every row of a CSV file. The first
+    row is used as header and names the document fields.
+    """
+    if six.PY3:
+        reader = csv.DictReader(codecs.iterdecode(f, encoding))
+        for row in reader:
+            yield row, None
+    else:
+        for row in csv.DictReader(f):
+            yield dict((k.decode(encoding), v.decode(encoding) if v is not None else v)
+                       for k, v in row.items() if k is not None), None
+
+
+def read_jsonl(f, encoding='utf-8'):
+    """
+    Yields ``(data, error)`` tuples for every line of a JSON lines file.
+    Blank lines are skipped, lines that are not a JSON object are reported
+    as errors but don't stop the import.
+    """
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line.decode(encoding))
+        except ValueError as e:
+            yield None, ['Invalid JSON: %s' % e]
+            continue
+        if not isinstance(data, dict):
+            yield None, ['Expected a JSON object, got %s.' % type(data).__name__]
+            continue
+        yield data, None
+
+
+READERS = {
+    FORMAT_CSV: read_csv,
+    FORMAT_JSONL: read_jsonl,
+}
+
+
+def bulk_write(collection, operations):
+    """
+    Writes ``operations`` with one unordered bulk request. Each operation is
+    either ``('insert', document)`` or ``('upsert', filter, document)``.
+
+    Returns the raw bulk api result (``nInserted``, ``nUpserted``, ...). Uses
+    ``bulk_write`` on pymongo 3 and the bulk builder on older versions.
+    """
+    if hasattr(collection, 'bulk_write'):
+        from pymongo import InsertOne, ReplaceOne
+        requests = []
+        for op in operations:
+            if op[0] == 'insert':
+                requests.append(InsertOne(op[1]))
+            else:
+                requests.append(ReplaceOne(op[1], op[2], upsert=True))
+        return collection.bulk_write(requests, ordered=False).bulk_api_result
+
+    bulk = collection.initialize_unordered_bulk_op()
+    for op in operations:
+        if op[0] == 'insert':
+            bulk.insert(op[1])
+        else:
+            bulk.find(op[1]).upsert().replace_one(op[2])
+    return bulk.execute()
+
+
+class ImportFailed(Exception):
+    """
+    Raised if an import can't be started. The message is shown on the
+    import form.
+    """
+
+
+class ImportResult(object):
+    """
+    Counters and per-row errors of an import. Only the first ``max_errors``
+    errors are kept, further errors are only counted.
+    """
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    @property
+    def errors_truncated(self):
+        return self.failed > len(self.errors)
+
+    def add_error(self, row_number, messages):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, messages))
+
+    def add_bulk_result(self, result):
+        self.inserted += result.get('nInserted', 0) + result.get('nUpserted', 0)
+        self.updated += result.get('nMatched', 0)
+
+
+class DocumentImporter(object):
+    """
+    Validates rows with ``form_class`` and writes them in batches of
+    ``batch_size`` documents.
+
+    If ``id_fields`` is given, rows are upserted using the values of those
+    fields as filter, otherwise they are inserted. Note that the documents
+    are written directly to the collection, so mongoengine's save signals
+    are not sent.
+    """
+    def __init__(self, model, form_class, batch_size=500, id_fields=None,
+                 max_errors=100):
+        self.model = model
+        self.form_class = form_class
+        self.batch_size = batch_size
+        self.id_fields = id_fields or ()
+        self.result = ImportResult(max_errors=max_errors)
+
+    def form_data(self, row):
+        data = MultiValueDict()
+        for key, value in row.items():
+            if key is None:
+                # surplus values of a csv row
+                continue
+            if isinstance(value, (list, tuple)):
+                data.setlist(key, list(value))
+            else:
+                data[key] = value
+        return data
+
+    def build_document(self, row):
+        """
+        Returns a ``(son, errors)`` tuple for a row. ``son`` is the document
+        as it will be written to the collection.
+        """
+        form = self.form_class(data=self.form_data(row))
+        if not form.is_valid():
+            errors = []
+            for field, field_errors in form.errors.items():
+                for error in field_errors:
+                    errors.append('%s: %s' % (field, error))
+            return None, errors
+        son = form.save(commit=False).to_mongo()
+        if '_id' in son and son['_id'] is None:
+            del son['_id']
+        return son, None
+
+    def operation(self, son):
+        if not self.id_fields:
+            return ('insert', son)
+        query = {}
+        for name in self.id_fields:
+            db_field = self.model._fields[name].db_field
+            if db_field not in son:
+                raise ValueError('Missing value for %s.' % name)
+            query[db_field] = son[db_field]
+        return ('upsert', query, son)
+
+    def run(self, rows):
+        """
+        Imports ``rows``, an iterable of ``(data, error)`` tuples as yielded
+        by the readers, and returns an ``ImportResult``.
+        """
+        batch = []
+        for row_number, (data, errors) in enumerate(rows, 1):
+            self.result.rows += 1
+            if errors is None:
+                son, errors = self.build_document(data)
+            if errors is None:
+                try:
+                    batch.append((row_number, self.operation(son)))
+                except ValueError as e:
+                    errors = [str(e)]
+            if errors is not None:
+                self.result.add_error(row_number, errors)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+        return self.result
+
+    def write(self, batch):
+        collection = self.model._get_collection()
+        try:
+            result = bulk_write(collection, [op for row_number, op in batch])
+        except BulkWriteError as e:
+            result = e.details
+            for error in result.get('writeErrors', []):
+                self.write_error(batch[error['index']][0], error)
+        self.result.add_bulk_result(result)
+
+    def write_error(self, row_number, error):
+        """
+        Records a write error of the server for row ``row_number``.
+        """
+        self.result.add_error(row_number, [error.get('errmsg', '')])
+
+
+class ImportForm(forms.Form):
+    import_file = forms.FileField(label=_('File'))
+    format = forms.ChoiceField(label=_('Format'), required=False, choices=(
+        ('', _('Detect from file name')),
+        (FORMAT_CSV, _('CSV with header row')),
+        (FORMAT_JSONL, _('JSON lines')),
+    ))
+
+    def clean(self):
+        cleaned_data = super(ImportForm, self).clean()
+        upload = cleaned_data.get('import_file')
+        if upload is not None and not cleaned_data.get('format'):
+            name = upload.name.lower()
+            if name.endswith('.csv'):
+                cleaned_data['format'] = FORMAT_CSV
+            elif name.endswith('.jsonl') or name.endswith('.json'):
+                cleaned_data['format'] = FORMAT_JSONL
+            else:
+                raise forms.ValidationError(
+                    _("Can't detect the format of %(name)s. Please choose one."),
+                    code='unknown_format', params={'name': upload.name})
+        return cleaned_data
+
+    def rows(self):
+        """
+        Returns an iterator over the rows of the uploaded file.
+        """
+        reader = READERS[self.cleaned_data['format']]
+        return reader(self.cleaned_data['import_file'])
@@ -0,0 +1,246 @@
+"""
+Checks whether the queries of a DocumentAdmin's changelist can use an index.
+
+For every registered admin the query shapes the changelist generates are
+collected (the default ordering with the appended pk, every list_filter,
+the search and the date_hierarchy), explained against the collection and
+reported if the winning plan scans the whole collection or sorts in memory.
+For those shapes an index is suggested in the format mongoengine expects in
+``meta['indexes']``, ordered equality fields first, then the sort fields
+and range fields last.
+"""
+import datetime
+
+from bson import SON
+from pymongo.errors import OperationFailure
+
+from mongoengine.base import TopLevelDocumentMetaclass
+from mongoengine.fields import EmbeddedDocumentField, ListField
+
+# time budget for explaining on servers that run the explained query
+EXPLAIN_MAX_TIME_MS = 5000
+
+
+class QueryShape(object):
+    def __init__(self, label, filter, sort, sort_names=(), equality=(), ranges=(),
+                 regex=False):
+        self.label = label
+        self.filter = filter
+        self.sort = sort
+        # (field name, direction) and (field name, db path) tuples used to
+        # build the index suggestion
+        self.sort_names = list(sort_names)
+        self.equality = list(equality)
+        self.ranges = list(ranges)
+        self.regex = regex
+
+
+class ShapeReport(object):
+    def __init__(self, shape, stages=(), error=None):
+        self.shape = shape
+        self.stages = set(stages)
+        self.error = error
+
+    @property
+    def collscan(self):
+        return 'COLLSCAN' in self.stages
+
+    @property
+    def in_memory_sort(self):
+        return 'SORT' in self.stages
+
+    @property
+    def ok(self):
+        return self.error is None and not (self.collscan or self.in_memory_sort)
+
+    @property
+    def note(self):
+        if self.shape.regex:
+            return ("Case insensitive regular expressions can't use index bounds, "
+                    "the index only helps with the sort.")
+        return None
+
+    @property
+    def suggestion(self):
+        """
+        Returns an index specification for ``meta['indexes']`` or None if
+        the query doesn't need an index.
+        """
+        if self.ok or self.error is not None:
+            return None
+        spec = []
+        seen = set()
+        for name, path in self.shape.equality:
+            if name not in seen:
+                spec.append('+' + name)
+                seen.add(name)
+        for name, direction in self.shape.sort_names:
+            if name not in seen:
+                spec.append(('-' if direction < 0 else '+') + name)
+                seen.add(name)
+        for name, path in self.shape.ranges:
+            if name not in seen:
+                spec.append('+' + name)
+                seen.add(name)
+        return spec or None
+
+
+def field_path(model, name):
+    """
+    Resolves a Django style lookup path (``field__subfield``) to a tuple of
+    the mongoengine field path (``field.subfield``) and the database path.
+    Returns ``(None, None)`` if the path doesn't point to a field.
+    """
+    if name == 'pk':
+        name = model._meta['id_field']
+    names = []
+    db_names = []
+    document = model
+    for part in name.split('__'):
+        if document is None:
+            return None, None
+        field = document._fields.get(part)
+        if field is None:
+            return None, None
+        names.append(part)
+        db_names.append(field.db_field)
+        if isinstance(field, ListField):
+            field = field.field
+        if isinstance(field, EmbeddedDocumentField):
+            document = field.document_type
+        else:
+            document = None
+    return '.'.join(names), '.'.join(db_names)
+
+
+def changelist_ordering(model_admin):
+    """
+    Returns the ordering of the changelist without any ordering selected in
+    the query string, i.e. like DocumentChangeList.get_ordering.
+    """
+    model = model_admin.model
+    ordering = list(model_admin.get_ordering(None) or model._meta.get('ordering') or [])
+    pk_name = model._meta['id_field']
+    if not (set(ordering) & set(['pk', '-pk', pk_name, '-' + pk_name])):
+        ordering.append('-pk')
+    return ordering
+
+
+def _list_filter_fields(model_admin):
+    for item in model_admin.list_filter:
+        if isinstance(item, (tuple, list)):
+            yield item[0]
+        elif not callable(item):
+            yield item
+
+
+def query_shapes(model_admin):
+    """
+    Returns the QueryShapes the changelist of ``model_admin`` generates.
+    """
+    model = model_admin.model
+
+    sort = []
+    sort_names = []
+    for name in changelist_ordering(model_admin):
+        direction = -1 if name.startswith('-') else 1
+        name, path = field_path(model, name.lstrip('-+'))
+        if path is not None:
+            sort.append((path, direction))
+            sort_names.append((name, direction))
+
+    shapes = [QueryShape('ordering', {}, sort, sort_names)]
+
+    for lookup in _list_filter_fields(model_admin):
+        name, path = field_path(model, lookup)
+        if path is not None:
+            shapes.append(QueryShape('list_filter %s' % lookup, {path: None}, sort,
+                                     sort_names, equality=[(name, path)]))
+
+    search = []
+    for lookup in model_admin.search_fields:
+        name, path = field_path(model, lookup.lstrip('^=@'))
+        if path is not None:
+            search.append({path: {'$regex': 'x', '$options': 'i'}})
+    if search:
+        shapes.append(QueryShape('search', {'$or': search}, sort, sort_names,
+                                 regex=True))
+
+    if model_admin.date_hierarchy:
+        name, path = field_path(model, model_admin.date_hierarchy)
+        if path is not None:
+            now = datetime.datetime.utcnow()
+            shapes.append(QueryShape('date_hierarchy %s' % model_admin.date_hierarchy,
+                                     {path: {'$gte': now - datetime.timedelta(days=31),
+                                             '$lt': now}},
+                                     sort, sort_names, ranges=[(name, path)]))
+    return shapes
+
+
+def plan_stages(plan):
+    """
+    Returns all stage names of an explain output. Also understands the
+    output of MongoDB < 3.0, where a collection scan is reported as
+    ``BasicCursor`` and an in memory sort as ``scanAndOrder``.
+    """
+    stages = set()
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.add(plan['stage'])
+        if str(plan.get('cursor', '')).startswith('BasicCursor'):
+            stages.add('COLLSCAN')
+        if plan.get('scanAndOrder'):
+            stages.add('SORT')
+        for key, value in plan.items():
+            if key in ('rejectedPlans', 'allPlans', 'allPlansExecution'):
+                continue
+            stages |= plan_stages(value)
+    elif isinstance(plan, (list, tuple)):
+        for value in plan:
+            stages |= plan_stages(value)
+    return stages
+
+
+def explain_shape(collection, shape):
+    """
+    Explains ``shape`` with the ``queryPlanner`` verbosity, which chooses a
+    plan without running the query. Servers without the explain command
+    (MongoDB < 3.0) always run it, so it's limited to one document and
+    EXPLAIN_MAX_TIME_MS there.
+    """
+    command = SON([('find', collection.name), ('filter', shape.filter), ('limit', 1)])
+    if shape.sort:
+        command['sort'] = SON(shape.sort)
+    try:
+        explain = collection.database.command('explain', command, verbosity='queryPlanner')
+    except OperationFailure:
+        cursor = collection.find(shape.filter).limit(1).max_time_ms(EXPLAIN_MAX_TIME_MS)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        try:
+            explain = cursor.explain()
+        except Exception as e:
+            return ShapeReport(shape, error=str(e))
+    except Exception as e:
+        return ShapeReport(shape, error=str(e))
+    return ShapeReport(shape, plan_stages(explain.get('queryPlanner', explain)))
+
+
+def advise(model_admin):
+    """
+    Returns a ShapeReport for every query shape of ``model_admin``.
+    """
+    collection = model_admin.model._get_collection()
+    return [explain_shape(collection, shape) for shape in query_shapes(model_admin)]
+
+
+def advise_site(admin_site):
+    """
+    Returns ``(model_admin, reports)`` tuples for all document admins of
+    ``admin_site``.
+    """
+    results = []
+    for model, model_admin in admin_site._registry.items():
+        if isinstance(model, TopLevelDocumentMetaclass):
+            results.append((model_admin, advise(model_admin)))
+    return sorted(results, key=lambda r: r[0].model.__name__)
@@ -0,0 +1,315 @@
+"""
+Records the MongoDB commands issued while handling a request.
+
+Built on pymongo's command monitoring (pymongo >= 3.1). The listener has to
+be registered before the connection is created, either by calling
+``install()`` in the settings before ``mongoengine.connect()`` or by passing
+it to the client::
+
+    from mongoadmin import instrumentation
+    connect('db', event_listeners=[instrumentation.listener])
+
+``QueryInstrumentationMiddleware`` then records every command of a request
+and attributes it to the admin view (``Document.changelist``), or to a
+narrower scope like an action or a widget label lookup, that was active
+when the command was sent.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.utils import six
+
+from bson import BSON
+
+try:
+    from pymongo import monitoring
+except ImportError:
+    # pymongo < 3.1 has no command monitoring
+    monitoring = None
+
+logger = logging.getLogger('mongoadmin.queries')
+
+_local = threading.local()
+
+
+class CommandRecord(object):
+    def __init__(self, label, collection, name):
+        self.label = label
+        self.collection = collection
+        self.name = name
+        self.duration = 0.0
+        self.documents = 0
+        self.bytes = 0
+        self.failed = False
+
+
+class QueryStats(object):
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.duration = 0.0
+        self.documents = 0
+        self.bytes = 0
+
+    def add(self, record):
+        self.count += 1
+        self.duration += record.duration
+        self.documents += record.documents
+        self.bytes += record.bytes
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+class QueryRecorder(object):
+    """
+    Collects the commands of one request. The size of the replies is only
+    measured with ``measure_bytes``, as it means encoding every reply to BSON
+    again.
+    """
+    def __init__(self, measure_bytes=False):
+        self.measure_bytes = measure_bytes
+        self.commands = []
+        self.view_label = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, request_id, label, collection, name):
+        record = CommandRecord(label or self.view_label, collection, name)
+        with self._lock:
+            self._pending[request_id] = record
+            self.commands.append(record)
+
+    def finished(self, request_id, duration, documents=0, bytes=0, failed=False):
+        with self._lock:
+            record = self._pending.pop(request_id, None)
+        if record is not None:
+            record.duration = duration
+            record.documents = documents
+            record.bytes = bytes
+            record.failed = failed
+
+    @property
+    def total(self):
+        stats = QueryStats(None)
+        for record in self.commands:
+            stats.add(record)
+        return stats
+
+    def by_label(self):
+        """
+        Returns a list of QueryStats, one for every label.
+        """
+        stats = {}
+        for record in self.commands:
+            if record.label not in stats:
+                stats[record.label] = QueryStats(record.label)
+            stats[record.label].add(record)
+        return sorted(stats.values(), key=lambda s: -s.duration)
+
+
+def _recorders():
+    stack = getattr(_local, 'recorders', None)
+    if stack is None:
+        stack = _local.recorders = []
+    return stack
+
+
+def current_recorder():
+    stack = _recorders()
+    if stack:
+        return stack[-1]
+    return None
+
+
+def current_label():
+    labels = getattr(_local, 'labels', None)
+    if labels:
+        return labels[-1]
+    return None
+
+
+def start_recording(measure_bytes=False):
+    """
+    Starts a QueryRecorder for the current thread and returns it. Recorders
+    can be nested, a command is recorded by all active recorders.
+    """
+    recorder = QueryRecorder(measure_bytes)
+    _recorders().append(recorder)
+    return recorder
+
+
+def stop_recording(recorder=None):
+    """
+    Stops ``recorder`` (or the innermost recorder) and returns it.
+    """
+    stack = _recorders()
+    if recorder is None:
+        return stack.pop() if stack else None
+    if recorder in stack:
+        stack.remove(recorder)
+    return recorder
+
+
+def set_view(model_admin, view):
+    """
+    Attributes all following commands of the request to ``view`` of
+    ``model_admin``. Commands issued while rendering the response are
+    attributed to the view as well.
+    """
+    for recorder in _recorders():
+        recorder.view_label = '%s.%s' % (model_admin.model.__name__, view)
+
+
+@contextmanager
+def instrument(label):
+    """
+    Attributes commands issued inside the block to ``label``.
+    """
+    labels = getattr(_local, 'labels', None)
+    if labels is None:
+        labels = _local.labels = []
+    labels.append(label)
+    try:
+        yield
+    finally:
+        labels.pop()
+
+
+def instrumented(label):
+    """
+    Decorator version of ``instrument``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with instrument(label):
+                return func(*args, **kwargs)
+        return inner
+    return decorator
+
+
+def bind(func):
+    """
+    Returns a wrapper for ``func`` that records the commands into the current
+    thread's recorder, even if it is called in another thread.
+    """
+    recorders = list(_recorders())
+    labels = list(getattr(_local, 'labels', None) or [])
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        previous = _recorders(), getattr(_local, 'labels', None)
+        _local.recorders, _local.labels = list(recorders), list(labels)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.recorders, _local.labels = previous
+    return inner
+
+
+def _reply_documents(reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    for key in ('values', 'result'):
+        if isinstance(reply.get(key), list):
+            return len(reply[key])
+    return 0
+
+
+if monitoring is not None:
+    class AdminCommandListener(monitoring.CommandListener):
+        """
+        Hands the command events of pymongo to the recorder of the thread the
+        command was sent from.
+        """
+        def started(self, event):
+            recorders = _recorders()
+            if recorders:
+                collection = event.command.get(event.command_name)
+                if not isinstance(collection, six.string_types):
+                    collection = None
+                for recorder in recorders:
+                    recorder.started((event.connection_id, event.request_id),
+                                     current_label(), collection, event.command_name)
+
+        def succeeded(self, event):
+            recorders = _recorders()
+            if recorders:
+                documents = _reply_documents(event.reply)
+                size = 0
+                if any(recorder.measure_bytes for recorder in recorders):
+                    size = len(BSON.encode(event.reply))
+                for recorder in recorders:
+                    recorder.finished((event.connection_id, event.request_id),
+                                      event.duration_micros / 1000000.0,
+                                      documents=documents,
+                                      bytes=size if recorder.measure_bytes else 0)
+
+        def failed(self, event):
+            for recorder in _recorders():
+                recorder.finished((event.connection_id, event.request_id),
+                                  event.duration_micros / 1000000.0, failed=True)
+
+    listener = AdminCommandListener()
+else:
+    listener = None
+
+_installed = False
+
+
+def install():
+    """
+    Registers the listener for all clients created afterwards.
+    """
+    global _installed
+    if monitoring is None:
+        raise RuntimeError('Query instrumentation requires pymongo >= 3.1.')
+    if not _installed:
+        monitoring.register(listener)
+        _installed = True
+
+
+class QueryInstrumentationMiddleware(object):
+    """
+    Records the MongoDB commands of every request, adds the totals as
+    ``X-Mongo-*`` response headers and logs requests that exceed
+    ``MONGOADMIN_QUERY_BUDGET``, a dict with the keys ``count`` and
+    ``time`` (in milliseconds).
+
+    The size of the replies is only measured (and sent as
+    ``X-Mongo-Bytes``) if ``MONGOADMIN_QUERY_BYTES`` is set, which defaults
+    to ``MONGOADMIN_QUERY_FOOTER``.
+    """
+    def process_request(self, request):
+        measure_bytes = getattr(settings, 'MONGOADMIN_QUERY_BYTES',
+                                getattr(settings, 'MONGOADMIN_QUERY_FOOTER', False))
+        request._mongo_recorder = start_recording(measure_bytes)
+
+    def process_response(self, request, response):
+        recorder = getattr(request, '_mongo_recorder', None)
+        if recorder is None:
+            return response
+        stop_recording(recorder)
+
+        total = recorder.total
+        response['X-Mongo-Commands'] = str(total.count)
+        response['X-Mongo-Time'] = '%.1f' % total.duration_ms
+        response['X-Mongo-Documents'] = str(total.documents)
+        if recorder.measure_bytes:
+            response['X-Mongo-Bytes'] = str(total.bytes)
+
+        budget = getattr(settings, 'MONGOADMIN_QUERY_BUDGET', None)
+        if budget and (total.count > budget.get('count', total.count) or
+                       total.duration_ms > budget.get('time', total.duration_ms)):
+            logger.warning('%s %s issued %d mongo commands in %.1fms: %s',
+                           request.method, request.path, total.count, total.duration_ms,
+                           ', '.join('%s %d/%.1fms' % (s.label, s.count, s.duration_ms)
+                                     for s in recorder.by_label()),
+                           extra={'request': request})
+        return response
@@ -0,0 +1,235 @@
+"""
+Live changelist updates from a change stream, sent as server-sent events.
+
+Inserts are filtered on the server with the query of the changelist,
+translated to the ``fullDocument`` of the change events where possible.
+Updated documents are read again by id with the changelist query from the
+primary (a secondary may not have applied the change yet), so rows that no
+longer match are removed. Change streams need a replica set (a
+single node one is enough), MongoDB 3.6 and pymongo 3.8.
+
+Every open stream holds a worker thread, so their number is capped per
+process (``MONGOADMIN_LIVE_MAX_STREAMS``) and per user
+(``DocumentAdmin.live_max_streams_per_user``).
+"""
+import collections
+import json
+import threading
+import time
+
+from bson import json_util
+
+from django.conf import settings
+from django.contrib.admin.util import quote
+from django.utils.translation import ugettext as _
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from pymongo import ReadPreference
+from pymongo.errors import PyMongoError, OperationFailure
+
+# the reconnection delay of the browser in milliseconds
+RETRY_MS = 3000
+# the reconnection delay when too many streams are open
+BUSY_RETRY_MS = 30000
+LOGICAL_OPERATORS = ('$and', '$or', '$nor')
+UPDATE_OPERATIONS = ('update', 'replace')
+
+
+def change_filter(query):
+    """
+    Returns ``query`` as a filter on the ``fullDocument`` of change events
+    or None if it uses operators that can't be translated (``$where``,
+    ``$text``, ...).
+    """
+    result = {}
+    for key, value in query.items():
+        if key in LOGICAL_OPERATORS:
+            clauses = [change_filter(clause) for clause in value]
+            if None in clauses:
+                return None
+            result[key] = clauses
+        elif key.startswith('$'):
+            return None
+        else:
+            result['fullDocument.%s' % key] = value
+    return result
+
+
+def change_pipeline(query):
+    """
+    Returns the change stream pipeline for a changelist query and whether
+    the inserts are filtered by it.
+    """
+    insert_filter = change_filter(query)
+    if insert_filter is None:
+        return [], False
+    insert_filter['operationType'] = 'insert'
+    return [{'$match': {'$or': [
+        insert_filter,
+        {'operationType': {'$in': list(UPDATE_OPERATIONS) + ['delete']}},
+    ]}}], True
+
+
+def parse_resume_token(value):
+    if not value:
+        return None
+    try:
+        return json_util.loads(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def event(name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+    lines.append('event: %s' % name)
+    lines.append('data: %s' % json.dumps(data))
+    return '\n'.join(lines) + '\n\n'
+
+
+def max_streams():
+    return getattr(settings, 'MONGOADMIN_LIVE_MAX_STREAMS', 50)
+
+
+class StreamSlots(object):
+    """
+    Counts the open streams of the process, in total and per user.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.users = collections.defaultdict(int)
+
+    def acquire(self, user_key, max_total, max_per_user):
+        """
+        Takes a slot for ``user_key`` and returns True, or returns False if
+        ``max_total`` or ``max_per_user`` (if not None) streams are open.
+        """
+        with self.lock:
+            if max_total is not None and self.total >= max_total:
+                return False
+            if max_per_user is not None and self.users[user_key] >= max_per_user:
+                return False
+            self.total += 1
+            self.users[user_key] += 1
+            return True
+
+    def release(self, user_key):
+        with self.lock:
+            self.total -= 1
+            self.users[user_key] -= 1
+            if self.users[user_key] <= 0:
+                del self.users[user_key]
+
+
+slots = StreamSlots()
+
+
+def busy_stream():
+    """
+    The stream sent when too many streams are open: the browser reconnects
+    after BUSY_RETRY_MS.
+    """
+    yield 'retry: %d\n\n' % BUSY_RETRY_MS
+
+
+class LiveChangeList(object):
+    """
+    Yields the events for the changes of the documents of ``cl``, a
+    changelist that doesn't fetch results (RowsChangeList), for at most
+    ``max_duration`` seconds. A comment is sent every ``heartbeat`` seconds
+    without changes, so closed connections are noticed. ``release`` is
+    called once when the stream ends or the response is closed.
+    """
+    def __init__(self, cl, resume_token=None, heartbeat=15, max_duration=300, release=None):
+        self.cl = cl
+        self.resume_token = resume_token
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.release = release
+
+    def close(self):
+        # StreamingHttpResponse closes its content, even if it was never read
+        release, self.release = self.release, None
+        if release is not None:
+            release()
+
+    def watch(self):
+        pipeline, self.inserts_filtered = change_pipeline(self.cl.queryset._query)
+        collection = self.cl.model._get_collection()
+        kwargs = {'max_await_time_ms': self.heartbeat * 1000}
+        if self.resume_token is not None:
+            try:
+                return collection.watch(pipeline, resume_after=self.resume_token, **kwargs)
+            except OperationFailure:
+                # the token is no longer in the oplog
+                pass
+        return collection.watch(pipeline, **kwargs)
+
+    def render_row(self, document):
+        from mongoadmin.templatetags.documenttags import result_rows
+        return self.cl._render_rows(result_rows(self.cl, [document]), 0)
+
+    def row_event(self, name, pk, document=None):
+        data = {'pk': force_unicode(pk), 'quoted_pk': quote(force_unicode(pk))}
+        if document is not None:
+            data['html'] = self.render_row(document)
+        return name, data
+
+    def change_event(self, change):
+        """
+        Returns ``(event name, data)`` for a change.
+        """
+        operation = change['operationType']
+        if operation == 'delete':
+            return self.row_event('delete', change['documentKey']['_id'])
+        if operation == 'insert' or operation in UPDATE_OPERATIONS:
+            pk = change['documentKey']['_id']
+            if operation == 'insert' and self.inserts_filtered:
+                document = self.cl.model._from_son(change['fullDocument'])
+            else:
+                document = self.cl.queryset.filter(pk=pk).read_preference(
+                    ReadPreference.PRIMARY).first()
+            if document is None:
+                # doesn't match the changelist (anymore)
+                return self.row_event('delete', pk)
+            return self.row_event(operation if operation == 'insert' else 'update',
+                                  pk, document)
+        # the collection was dropped or renamed
+        return 'reload', {}
+
+    def __iter__(self):
+        deadline = time.time() + self.max_duration
+        yield 'retry: %d\n\n' % RETRY_MS
+        try:
+            stream = self.watch()
+        except PyMongoError:
+            self.close()
+            yield event('unavailable', {'message': _("Live updates are not available.")})
+            return
+        try:
+            while time.time() < deadline:
+                change = stream.try_next()
+                if change is None:
+                    # moves the resume token of the browser forward without
+                    # an event (pymongo >= 3.9)
+                    token = getattr(stream, 'resume_token', None)
+                    if token is not None:
+                        yield 'id: %s\n\n' % json_util.dumps(token)
+                    else:
+                        yield ': keepalive\n\n'
+                    continue
+                name, data = self.change_event(change)
+                yield event(name, data, json_util.dumps(change['_id']))
+                if name == 'reload':
+                    return
+        except PyMongoError:
+            # the browser reconnects and resumes after the last event
+            pass
+        finally:
+            stream.close()
+            self.close()
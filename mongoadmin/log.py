@@ -0,0 +1,209 @@
+"""
+An admin action log stored in MongoDB.
+
+Used instead of Django's ``LogEntry`` if ``MONGOADMIN_ACTION_LOG`` is
+``'mongo'``, which is the default without a relational database. The
+entries are kept in a capped collection (``MONGOADMIN_LOG_MAX_SIZE`` bytes,
+default 50MB) or, if ``MONGOADMIN_LOG_TTL`` is set, in a normal collection
+where they expire after that many seconds. Entries logged while an admin
+view runs are written with one insert when the view returns.
+"""
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.admin.models import ADDITION, CHANGE, DELETION
+from django.contrib.admin.util import quote
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from mongoengine import Document, fields
+
+
+def _log_meta():
+    meta = {
+        'collection': getattr(settings, 'MONGOADMIN_LOG_COLLECTION', 'mongoadmin_log'),
+        'indexes': [
+            {'fields': ['user_id', '-action_time']},
+            {'fields': ['app_label', 'model', 'object_id', 'action_time']},
+        ],
+        'ordering': ['-action_time'],
+    }
+    ttl = getattr(settings, 'MONGOADMIN_LOG_TTL', None)
+    if ttl:
+        meta['indexes'].append({'fields': ['action_time'], 'expireAfterSeconds': ttl})
+    else:
+        meta['indexes'].append({'fields': ['-action_time']})
+        meta['max_size'] = getattr(settings, 'MONGOADMIN_LOG_MAX_SIZE', 50 * 2 ** 20)
+    return meta
+
+
+class LoggedContentType(object):
+    """
+    Stands in for the content type of a Django LogEntry in the templates.
+    """
+    def __init__(self, app_label, model, name):
+        self.app_label = app_label
+        self.model = model
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class LoggedUser(object):
+    """
+    Stands in for the user of a Django LogEntry in the templates.
+    """
+    def __init__(self, pk, username):
+        self.pk = pk
+        self.username = username
+
+    def get_username(self):
+        return self.username
+
+    def get_full_name(self):
+        return ''
+
+    def __str__(self):
+        return self.username
+
+
+class MongoLogEntry(Document):
+    action_time = fields.DateTimeField(default=datetime.datetime.now)
+    user_id = fields.StringField()
+    user_repr = fields.StringField()
+    app_label = fields.StringField()
+    model = fields.StringField()
+    model_name = fields.StringField()
+    object_id = fields.StringField()
+    object_repr = fields.StringField(max_length=200)
+    action_flag = fields.IntField()
+    change_message = fields.StringField()
+
+    meta = _log_meta()
+
+    def __unicode__(self):
+        return '%s %s' % (self.model_name, self.object_repr)
+
+    def is_addition(self):
+        return self.action_flag == ADDITION
+
+    def is_change(self):
+        return self.action_flag == CHANGE
+
+    def is_deletion(self):
+        return self.action_flag == DELETION
+
+    @property
+    def user(self):
+        return LoggedUser(self.user_id, self.user_repr)
+
+    @property
+    def content_type(self):
+        if not self.model:
+            return None
+        return LoggedContentType(self.app_label, self.model, self.model_name)
+
+    def get_edited_object(self):
+        from mongoadmin.contenttypes.utils import get_model_or_document
+        model = get_model_or_document(self.app_label, self.model)
+        return model.objects.get(pk=self.object_id)
+
+    def get_admin_url(self):
+        """
+        Returns the admin URL to edit the object represented by this log
+        entry. This is relative to the Django admin index page.
+        """
+        if self.model and self.object_id:
+            return "%s/%s/%s/" % (self.app_label, self.model, quote(self.object_id))
+        return None
+
+
+def use_mongo_log():
+    log = getattr(settings, 'MONGOADMIN_ACTION_LOG', None)
+    if log is None:
+        from mongoadmin.contenttypes.utils import has_rel_db
+        return not has_rel_db()
+    return log == 'mongo'
+
+
+_local = threading.local()
+
+
+def _pending():
+    return getattr(_local, 'pending', None)
+
+
+def flush():
+    """
+    Writes the entries logged in the current batch.
+    """
+    pending = _pending()
+    if pending:
+        _local.pending = []
+        MongoLogEntry.objects.insert(pending, load_bulk=False)
+
+
+@contextmanager
+def batched():
+    """
+    Collects the entries logged inside the block and writes them at the end
+    or every ``MONGOADMIN_LOG_BATCH_SIZE`` (default 500) entries. The entries
+    are also written if the block raises, as the changes they log may have
+    been saved already.
+    """
+    if _pending() is not None:
+        # already batching
+        yield
+        return
+    _local.pending = []
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        finally:
+            _local.pending = None
+
+
+def log_action(user, obj, action_flag, change_message='', object_repr=None):
+    opts = obj._meta
+    entry = MongoLogEntry(
+        user_id=force_unicode(user.pk),
+        user_repr=force_unicode(user)[:200],
+        app_label=opts.app_label,
+        model=opts.model_name,
+        model_name=force_unicode(opts.verbose_name),
+        object_id=force_unicode(obj.pk),
+        object_repr=force_unicode(obj if object_repr is None else object_repr)[:200],
+        action_flag=action_flag,
+        change_message=change_message,
+    )
+    pending = _pending()
+    if pending is None:
+        entry.save()
+    else:
+        pending.append(entry)
+        if len(pending) >= getattr(settings, 'MONGOADMIN_LOG_BATCH_SIZE', 500):
+            flush()
+    return entry
+
+
+def recent_actions(user_id=None, limit=10):
+    entries = MongoLogEntry.objects.all()
+    if user_id is not None:
+        entries = entries.filter(user_id=force_unicode(user_id))
+    return list(entries.order_by('-action_time').limit(int(limit)))
+
+
+def object_history(app_label, model, object_id):
+    """
+    Returns the entries of one object, oldest first.
+    """
+    return list(MongoLogEntry.objects.filter(
+        app_label=app_label, model=model, object_id=force_unicode(object_id),
+    ).order_by('action_time'))
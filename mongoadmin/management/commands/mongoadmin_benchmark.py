@@ -0,0 +1,52 @@
+import json
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from mongoadmin.benchmark import Shape, run
+
+
+class Command(NoArgsCommand):
+    help = ("Generates synthetic collections and times the admin's hot paths. "
+            "Prints the results as JSON.")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--documents', type='int', dest='documents', default=10000,
+                    help='Number of documents to generate. Defaults to 10000.'),
+        make_option('--width', type='int', dest='width', default=20,
+                    help='Number of scalar fields per document. Defaults to 20.'),
+        make_option('--depth', type='int', dest='depth', default=2,
+                    help='Nesting depth of the embedded lists. Defaults to 2.'),
+        make_option('--list-length', type='int', dest='list_length', default=5,
+                    help='Length of every embedded list. Defaults to 5.'),
+        make_option('--repeat', type='int', dest='repeat', default=20,
+                    help='How often every path is timed. Defaults to 20.'),
+        make_option('--alias', dest='alias', default='default',
+                    help='The mongoengine connection alias to use.'),
+        make_option('--mongomock', action='store_true', dest='mongomock', default=False,
+                    help='Run against an in-process mongomock database.'),
+        make_option('--output', dest='output', default=None,
+                    help='Write the JSON results to this file instead of stdout.'),
+    )
+
+    def handle_noargs(self, **options):
+        alias = options['alias']
+        if options['mongomock']:
+            try:
+                import mongomock
+            except ImportError:
+                raise CommandError('--mongomock requires the mongomock package.')
+            from mongoengine.connection import register_connection
+            alias = 'mongoadmin_bench'
+            register_connection(alias, 'mongoadmin_bench', host='mongomock://localhost')
+
+        shape = Shape(width=options['width'], depth=options['depth'],
+                      list_length=options['list_length'], alias=alias)
+        results = run(shape, count=options['documents'], repeat=options['repeat'])
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
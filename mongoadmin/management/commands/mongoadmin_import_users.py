@@ -0,0 +1,57 @@
+import multiprocessing
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mongoadmin.importer import READERS, FORMAT_CSV, FORMAT_JSONL, ImportFailed
+
+
+class Command(BaseCommand):
+    help = ("Imports mongoengine users from a CSV (with header row) or JSON lines "
+            "file with username, password, email, first_name, last_name, "
+            "is_active and is_staff columns.")
+    args = '<file>'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', choices=list(READERS), default=None,
+                    help='csv or jsonl. Detected from the file name by default.'),
+        make_option('--processes', type='int', dest='processes',
+                    default=multiprocessing.cpu_count(),
+                    help='Number of processes hashing passwords. Defaults to the '
+                         'number of CPUs.'),
+        make_option('--batch-size', type='int', dest='batch_size', default=1000,
+                    help='Number of users written with one insert. Defaults to 1000.'),
+        make_option('--max-errors', type='int', dest='max_errors', default=1000,
+                    help='Number of row errors to report. Defaults to 1000.'),
+    )
+
+    def handle(self, *args, **options):
+        from mongoadmin.auth.importer import UserImporter
+
+        if len(args) != 1:
+            raise CommandError('Pass the file to import.')
+        path = args[0]
+        format = options['format']
+        if format is None:
+            if path.lower().endswith('.csv'):
+                format = FORMAT_CSV
+            elif path.lower().endswith(('.jsonl', '.json')):
+                format = FORMAT_JSONL
+            else:
+                raise CommandError("Can't detect the format of %s, use --format." % path)
+
+        importer = UserImporter(batch_size=options['batch_size'],
+                                max_errors=options['max_errors'],
+                                processes=options['processes'])
+        with open(path, 'rb') as f:
+            try:
+                result = importer.run(READERS[format](f))
+            except ImportFailed as e:
+                raise CommandError(str(e))
+
+        for row_number, messages in result.errors:
+            self.stderr.write('Row %d: %s' % (row_number, ' '.join(messages)))
+        if result.errors_truncated:
+            self.stderr.write('%d more errors not shown.' % (result.failed - len(result.errors)))
+        self.stdout.write('%d rows: %d users created, %d duplicates, %d failed.' % (
+            result.rows, result.inserted, importer.duplicates, result.failed))
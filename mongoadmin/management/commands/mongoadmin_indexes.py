@@ -0,0 +1,42 @@
+from django.core.management.base import NoArgsCommand
+
+from mongoadmin.indexes import advise_site
+
+
+class Command(NoArgsCommand):
+    help = ("Explains the changelist queries of every registered DocumentAdmin "
+            "and suggests indexes for queries that scan the collection or sort "
+            "in memory.")
+
+    def handle_noargs(self, **options):
+        from django.contrib import admin
+        admin.autodiscover()
+
+        from mongoadmin.sites import site
+
+        verbosity = int(options.get('verbosity', 1))
+        for model_admin, reports in advise_site(site):
+            problems = [r for r in reports if not r.ok]
+            if not problems and verbosity < 2:
+                continue
+            self.stdout.write('%s (%s)' % (model_admin.model.__name__,
+                                           model_admin.model._get_collection_name()))
+            for report in reports:
+                if report.ok:
+                    if verbosity >= 2:
+                        self.stdout.write('    %-30s ok' % report.shape.label)
+                    continue
+                if report.error is not None:
+                    self.stdout.write('    %-30s explain failed: %s' % (report.shape.label,
+                                                                      report.error))
+                    continue
+                issues = []
+                if report.collscan:
+                    issues.append('COLLSCAN')
+                if report.in_memory_sort:
+                    issues.append('in-memory sort')
+                self.stdout.write('    %-30s %s' % (report.shape.label, ', '.join(issues)))
+                if report.suggestion:
+                    self.stdout.write('        suggested index: %r' % (report.suggestion,))
+                if report.note:
+                    self.stdout.write('        %s' % report.note)
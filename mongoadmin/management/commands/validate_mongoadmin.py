@@ -0,0 +1,41 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from mongoadmin.checks import validate_site
+
+
+class Command(NoArgsCommand):
+    help = "Runs the admin validators against every registered DocumentAdmin."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--no-cache', action='store_false', dest='use_cache', default=True,
+                    help='Validate all admins, even if a cached result exists.'),
+        make_option('--parallel', type='int', dest='parallel', default=4,
+                    help='Number of admins to validate at once. Defaults to 4.'),
+    )
+
+    def handle_noargs(self, **options):
+        # make sure all admin modules have been imported
+        from django.contrib import admin
+        admin.autodiscover()
+
+        verbosity = int(options.get('verbosity', 1))
+        validations = validate_site(use_cache=options['use_cache'],
+                                    processes=options['parallel'])
+        num_errors = 0
+        for validation in sorted(validations, key=lambda v: v.admin_class.__name__):
+            num_errors += len(validation.errors)
+            if verbosity >= 1:
+                self.stdout.write('%s (%s): %d errors in %.1fms%s' % (
+                    validation.admin_class.__name__, validation.model.__name__,
+                    len(validation.errors), validation.duration * 1000,
+                    ' (cached)' if validation.cached else ''))
+            for result in validation.results:
+                if verbosity >= 2:
+                    self.stdout.write('    %-40s %8.2fms' % (result.name, result.duration * 1000))
+                if result.error is not None:
+                    self.stderr.write('    %s' % result.error)
+
+        if num_errors:
+            raise CommandError('%d admin configuration errors found.' % num_errors)
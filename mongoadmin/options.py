@@ -1,16 +1,29 @@
 import collections
-from functools import partial
+import json
+from functools import partial, update_wrapper
 
 from django import forms
+from django.conf import settings
 from django.forms.models import modelform_defines_fields
-from django.contrib.admin.options import ModelAdmin, InlineModelAdmin, get_ul_class
+from django.contrib.admin.options import (ModelAdmin, InlineModelAdmin, get_ul_class,
+                                         IncorrectLookupParameters)
 from django.contrib.admin import widgets
-from django.contrib.admin.util import flatten_fieldsets
-from django.core.exceptions import FieldError, ValidationError
+from django.contrib.admin.util import flatten_fieldsets, unquote
+from django.core.exceptions import FieldError, ValidationError, PermissionDenied, NON_FIELD_ERRORS
 from django.forms.formsets import DELETION_FIELD_NAME
 from django.utils.translation import ugettext as _
 from django.contrib.admin.util import NestedObjects
-from django.utils.text import get_text_list
+from django.utils.text import capfirst, get_text_list
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, Http404
+from django.template.response import TemplateResponse
+from django.contrib import messages
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from bson import json_util
+from pymongo.errors import OperationFailure
 
 from mongoengine.fields import (DateTimeField, URLField, IntField, ListField, EmbeddedDocumentField,
                                 ReferenceField, StringField, FileField, ImageField)
@@ -18,8 +31,20 @@ from mongoengine.fields import (DateTimeField, URLField, IntField, ListField, Em
 from mongodbforms.documents import documentform_factory, embeddedformset_factory, DocumentForm, EmbeddedDocumentFormSet, EmbeddedDocumentForm
 from mongodbforms.util import load_field_generator, init_document_options
 
-from mongoadmin.util import RelationWrapper, is_django_user_model
-from mongoadmin.widgets import ReferenceRawIdWidget, MultiReferenceRawIdWidget
+from mongoadmin import instrumentation
+from mongoadmin import log as action_log
+from mongoadmin.importer import ImportForm, DocumentImporter, ImportFailed
+from mongoadmin.util import RelationWrapper, is_django_user_model, make_read_preference
+from mongoadmin.widgets import (ReferenceRawIdWidget, MultiReferenceRawIdWidget, GridFSFileWidget,
+                                GridFSImageWidget)
+from mongoadmin.files import GridFSUploadHandler, GridFSFormMixin, csrf_precheck, serve_file
+from mongoadmin.thumbnails import (allowed_sizes, get_thumbnail, parse_grid_id, delete_thumbnails,
+                                   delete_document_thumbnails)
+from mongoadmin.filters import ReferenceFieldListFilter, search_references
+from mongoadmin.raw import get_node, InvalidPath
+from mongoadmin.search import DocumentSearch
+from mongoadmin.schema import (get_schema, is_dynamic, dynamic_column, dynamic_list_filter,
+                               FILTER_TYPES)
 
 # Defaults for formfield_overrides. ModelAdmin subclasses can change this
 # by adding to ModelAdmin.formfield_overrides.
@@ -67,6 +92,34 @@ def formfield(field, form_class=None, **kwargs):
 
 
 class MongoFormFieldMixin(object):
+    # Read preferences for read-only traffic by view: 'changelist' (page
+    # fetch and counts), 'widget' (labels of raw id widgets) and 'raw' (the
+    # raw document view). Values are
+    # pymongo read preferences or mode names like 'secondaryPreferred'.
+    # Everything else, including the object of a change form, is read from
+    # the primary. Defaults to the MONGOADMIN_READ_PREFERENCES setting.
+    read_preferences = None
+    # Maximum replication lag in seconds for reads from secondaries.
+    max_staleness = None
+
+    def get_read_preference(self, request, view):
+        """
+        Returns the read preference for ``view`` or None to use the
+        connection's default.
+        """
+        preferences = self.read_preferences
+        if preferences is None:
+            preferences = getattr(settings, 'MONGOADMIN_READ_PREFERENCES', {})
+        max_staleness = self.max_staleness
+        if max_staleness is None:
+            max_staleness = getattr(settings, 'MONGOADMIN_MAX_STALENESS', None)
+        return make_read_preference(preferences.get(view), max_staleness)
+
+    def apply_read_preference(self, request, queryset, view):
+        read_preference = self.get_read_preference(request, view)
+        if read_preference is not None:
+            queryset = queryset.read_preference(read_preference)
+        return queryset
 
     def formfield_for_dbfield(self, db_field, **kwargs):
         """
@@ -104,9 +157,18 @@ class MongoFormFieldMixin(object):
                 return form_field
             elif db_field.name in self.raw_id_fields:
                 kwargs['widget'] = ReferenceRawIdWidget(
-                    db_field.rel, self.admin_site)
+                    db_field.rel, self.admin_site,
+                    read_preference=self.get_read_preference(request, 'widget'))
                 return self._get_formfield(db_field, **kwargs)
 
+        if isinstance(db_field, ImageField) and 'widget' not in kwargs:
+            kwargs['widget'] = GridFSImageWidget(self.admin_site)
+            return self._get_formfield(db_field, **kwargs)
+
+        if isinstance(db_field, FileField) and 'widget' not in kwargs:
+            kwargs['widget'] = GridFSFileWidget(self.admin_site)
+            return self._get_formfield(db_field, **kwargs)
+
         if isinstance(db_field, StringField):
             if db_field.max_length is None:
                 kwargs = dict(
@@ -164,8 +226,74 @@ class MongoFormFieldMixin(object):
 
 class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
     change_list_template = "admin/change_document_list.html"
+    import_template = None
+    scroll_template = None
+    raw_template = None
     form = DocumentForm
 
+    # Number of documents written per bulk request by the import view.
+    import_batch_size = 500
+    # If set, imported rows are upserted using these fields as filter.
+    import_id_fields = ()
+    # Maximum number of row errors that are shown after an import.
+    import_max_errors = 100
+
+    # Time budgets (maxTimeMS) for the changelist queries in milliseconds:
+    # the page fetch, the counts and both while a search is active. If a
+    # budget is exceeded the changelist is shown without a count or results
+    # and a message asks to narrow the query. None means no limit.
+    list_max_time_ms = None
+    count_max_time_ms = None
+    search_max_time_ms = None
+    # Search fields may go through ReferenceFields ('customer__email'). The
+    # referenced collection is searched first and the ids of at most
+    # search_reference_limit matches are applied to the changelist query;
+    # they're cached for search_reference_cache_timeout seconds. With a
+    # case sensitive search, '^' and '=' lookups can use indexes.
+    search_reference_limit = 1000
+    search_reference_cache_timeout = 60
+    search_case_sensitive = False
+    # Run the changelist counts and the page fetch concurrently on a small
+    # thread pool instead of one after another.
+    list_concurrent_queries = False
+
+    # The number of rows the JSON rows view returns per request and whether
+    # the changelist links to the scrolling table built on it.
+    list_rows_batch_size = 100
+    list_virtual_scroll = False
+
+    # Stream the rows of "show all" from the cursor in batches instead of
+    # loading all documents at once.
+    list_stream_show_all = True
+    list_stream_batch_size = 100
+
+    # Push inserted, changed and deleted rows to open changelists with
+    # server-sent events from a change stream (needs a replica set). Every
+    # connection takes a worker thread for at most live_max_duration
+    # seconds, then the browser reconnects and resumes. A user can keep at
+    # most live_max_streams_per_user streams open (None for no limit).
+    list_live = False
+    live_heartbeat = 15
+    live_max_duration = 300
+    live_max_streams_per_user = 3
+
+    # Write uploads for FileFields to GridFS while the request is read
+    # instead of buffering them first.
+    stream_uploads = True
+
+    # For DynamicDocuments: add the undeclared fields found in a sample of
+    # the collection as changelist columns, filters and read-only fields of
+    # the change form. Only the dynamic_fields_limit fields that occur in at
+    # least dynamic_fields_min_frequency of the sampled documents are added.
+    infer_dynamic_fields = False
+    dynamic_fields_sample_size = 1000
+    dynamic_fields_min_frequency = 0.1
+    dynamic_fields_limit = 10
+
+    # The number of array items or subdocument keys the raw document view
+    # loads at once.
+    raw_batch_size = 100
+
     _embedded_inlines = None
 
     def __init__(self, model, admin_site):
@@ -229,6 +357,152 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
 
         return inlines + emb_inlines
 
+    def get_urls(self):
+        from django.conf.urls import patterns, url
+
+        def wrap(view):
+            def wrapper(*args, **kwargs):
+                return self.admin_site.admin_view(view)(*args, **kwargs)
+            return update_wrapper(wrapper, view)
+
+        info = self.model._meta.app_label, self.model._meta.model_name
+
+        urlpatterns = patterns('',
+            url(r'^import/$', wrap(self.import_view), name='%s_%s_import' % info),
+            url(r'^rows/$', wrap(self.rows_view), name='%s_%s_rows' % info),
+            url(r'^scroll/$', wrap(self.scroll_view), name='%s_%s_scroll' % info),
+            url(r'^live/$', wrap(self.live_view), name='%s_%s_live' % info),
+            url(r'^reference_choices/(\w+)/$', wrap(self.reference_choices_view),
+                name='%s_%s_reference_choices' % info),
+            url(r'^(.+)/file/(\w+)/$', wrap(self.file_view), name='%s_%s_file' % info),
+            url(r'^(.+)/thumbnail/(\w+)/(\w+)/(\d+x\d+)/$', wrap(self.thumbnail_view),
+                name='%s_%s_thumbnail' % info),
+            url(r'^(.+)/raw/$', wrap(self.raw_view), name='%s_%s_raw' % info),
+            url(r'^(.+)/raw/node/$', wrap(self.raw_node_view), name='%s_%s_raw_node' % info),
+        )
+        urlpatterns += super(DocumentAdmin, self).get_urls()
+
+        # uploads are streamed to GridFS while the request body is read,
+        # so the upload handler has to be installed before anything reads
+        # request.POST
+        upload_views = {
+            '%s_%s_add' % info: self.has_add_permission,
+            '%s_%s_change' % info: self.has_change_permission,
+        }
+        for i, pattern in enumerate(urlpatterns):
+            has_permission = upload_views.get(getattr(pattern, 'name', None))
+            if has_permission is not None:
+                urlpatterns[i] = url(pattern.regex.pattern,
+                                     self.upload_view(pattern.callback, has_permission),
+                                     name=pattern.name)
+        return urlpatterns
+
+    def upload_view(self, view, has_permission):
+        """
+        Wraps ``view`` to stream the uploads of FileFields into GridFS if
+        ``has_permission(request)`` allows to use the view. The wrapper is
+        exempt from the CSRF middleware, as that reads the request body; the
+        parts of the check that don't need the body run before anything is
+        written and the admin view checks the token itself. Uploads that
+        aren't saved, e.g. because the token is wrong, are deleted again.
+        """
+        def wrapper(request, *args, **kwargs):
+            handler = None
+            # the permissions are checked before the upload is written, the
+            # admin view only checks them after reading the body
+            if (self.stream_uploads and request.method == 'POST' and
+                    csrf_precheck(request) and
+                    self.admin_site.has_permission(request) and has_permission(request)):
+                handler = GridFSUploadHandler(self.model, request)
+                request.upload_handlers.insert(0, handler)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                if handler is not None:
+                    # remove the files of forms that weren't saved
+                    for upload in handler.uploads:
+                        if not upload.saved:
+                            upload.delete()
+        wrapper = update_wrapper(wrapper, view)
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    def file_view(self, request, object_id, field_name):
+        "Streams the GridFS file of ``field_name``."
+        obj = self.get_object(request, object_id)
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        field = self.model._fields.get(field_name)
+        if obj is None or not isinstance(field, FileField):
+            raise Http404
+        instrumentation.set_view(self, 'file')
+        grid_out = getattr(obj, field_name).get()
+        if grid_out is None:
+            raise Http404
+        return serve_file(request, grid_out, attachment='inline' not in request.GET)
+
+    def thumbnail_view(self, request, object_id, field_name, grid_id, size):
+        """
+        Serves a thumbnail of the image in ``field_name``. The URL contains the
+        id of the image, so the thumbnail can be cached for a long time.
+        """
+        obj = self.get_object(request, object_id)
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+        field = self.model._fields.get(field_name)
+        if obj is None or not isinstance(field, ImageField) or size not in allowed_sizes():
+            raise Http404
+        instrumentation.set_view(self, 'thumbnail')
+        proxy = getattr(obj, field_name)
+        if proxy.grid_id is None or proxy.grid_id != parse_grid_id(grid_id):
+            raise Http404
+        grid_out = proxy.get()
+        if grid_out is None:
+            raise Http404
+        response = serve_file(request, get_thumbnail(field, grid_out, size), attachment=False)
+        response['Cache-Control'] = 'private, max-age=31536000'
+        return response
+
+    def save_form(self, request, form, change):
+        """
+        Given a ModelForm return an unsaved instance. Files that were streamed
+        to GridFS during the upload are attached to the instance instead of
+        being copied.
+        """
+        obj = super(DocumentAdmin, self).save_form(request, form, change)
+        form.replaced_files = []
+        for name, upload in getattr(form, 'streamed_uploads', {}).items():
+            field = self.model._fields[name]
+            previous = obj._data.get(name)
+            proxy = field.get_proxy_obj(key=name, instance=obj)
+            proxy.grid_id = upload.grid_id
+            setattr(obj, name, proxy)
+            if previous is not None and previous.grid_id:
+                form.replaced_files.append(previous)
+        return obj
+
+    def save_model(self, request, obj, form, change):
+        """
+        Given a model instance save it to the database. The files replaced
+        by streamed uploads and the thumbnails of replaced images are only
+        deleted once the instance is saved.
+        """
+        super(DocumentAdmin, self).save_model(request, obj, form, change)
+        for upload in getattr(form, 'streamed_uploads', {}).values():
+            upload.saved = True
+        for previous in getattr(form, 'replaced_files', ()):
+            previous.delete()
+        for field, grid_id in getattr(form, 'replaced_images', ()):
+            delete_thumbnails(field, grid_id)
+
+    def delete_model(self, request, obj):
+        """
+        Given a model instance delete it from the database, together with
+        the thumbnails of its images.
+        """
+        super(DocumentAdmin, self).delete_model(request, obj)
+        delete_document_thumbnails(obj)
+
     def get_queryset(self, request):
         """
         Returns a QuerySet of all model instances that can be edited by the
@@ -241,6 +515,66 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
             qs = qs.order_by(*ordering)
         return qs
 
+    def get_dynamic_fields(self, request):
+        """
+        Returns the inferred fields of a DynamicDocument that are shown in
+        the admin. The schema is cached, so this doesn't query the database
+        on most requests.
+        """
+        if not self.infer_dynamic_fields or not is_dynamic(self.model):
+            return []
+        schema = get_schema(self.model, self.dynamic_fields_sample_size)
+        return schema.common_fields(self.dynamic_fields_min_frequency,
+                                    self.dynamic_fields_limit)
+
+    def get_list_display(self, request):
+        list_display = list(super(DocumentAdmin, self).get_list_display(request))
+        for field in self.get_dynamic_fields(request):
+            if field.name not in list_display:
+                list_display.append(dynamic_column(field.name))
+        return list_display
+
+    def get_dynamic_list_filter(self, request):
+        """
+        Returns the list filters for the inferred fields with scalar values.
+        """
+        return [dynamic_list_filter(field) for field in self.get_dynamic_fields(request)
+                if field.values and field.type in FILTER_TYPES and
+                field.name not in self.list_filter]
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = list(super(DocumentAdmin, self).get_readonly_fields(request, obj))
+        if obj is not None:
+            for field in self.get_dynamic_fields(request):
+                readonly_fields.append(dynamic_column(field.name))
+        return readonly_fields
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Returns the queryset filtered by ``search_term`` and whether it has
+        to be made distinct, which documents never need.
+        """
+        def queryset_for(document):
+            return self.apply_read_preference(request, document.objects, 'changelist')
+
+        search = DocumentSearch(self.search_fields, queryset_for,
+                                limit=self.search_reference_limit,
+                                cache_timeout=self.search_reference_cache_timeout,
+                                case_sensitive=self.search_case_sensitive)
+        q = search.q(self.model, search_term) if search_term else None
+        if q is not None:
+            queryset = queryset.filter(q)
+        if search.truncated:
+            self.message_user(request, _(
+                "More than %(limit)d %(documents)s match the search, only the "
+                "first %(limit)d were searched for.") % {
+                'limit': self.search_reference_limit,
+                'documents': get_text_list([
+                    force_unicode(getattr(document._meta, 'verbose_name_plural', document.__name__))
+                    for document in search.truncated], _('and')),
+            }, messages.WARNING)
+        return queryset, False
+
     def get_changelist(self, request, **kwargs):
         """
         Returns the ChangeList class for use on the changelist page.
@@ -292,6 +626,12 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
         }
         defaults.update(kwargs)
 
+        form = defaults['form']
+        if not issubclass(form, GridFSFormMixin):
+            # keeps the streamed uploads for save_form
+            defaults['form'] = type(form)(form.__name__, (GridFSFormMixin, form),
+                                          {'__module__': form.__module__})
+
         if defaults['fields'] is None and not modelform_defines_fields(defaults['form']):
             defaults['fields'] = None
 
@@ -301,6 +641,332 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
             raise FieldError('%s. Check fields/fieldsets/exclude attributes of class %s.'
                              % (e, self.__class__.__name__))
 
+    def import_rows(self, request, rows):
+        """
+        Validates and writes ``rows`` to the collection. Returns an
+        ``ImportResult``.
+        """
+        importer = DocumentImporter(self.model, self.get_form(request),
+                                    batch_size=self.import_batch_size,
+                                    id_fields=self.import_id_fields,
+                                    max_errors=self.import_max_errors)
+        return importer.run(rows)
+
+    def import_view(self, request, extra_context=None):
+        "The 'import' admin view for this document."
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        instrumentation.set_view(self, 'import')
+        opts = self.model._meta
+        result = None
+        if request.method == 'POST':
+            form = ImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    result = self.import_rows(request, form.rows())
+                except ImportFailed as e:
+                    form._errors[NON_FIELD_ERRORS] = form.error_class([force_unicode(e)])
+                else:
+                    self.message_user(request, _("Imported %(inserted)d and updated %(updated)d "
+                                                 "of %(rows)d rows.") % {
+                        'inserted': result.inserted,
+                        'updated': result.updated,
+                        'rows': result.rows,
+                    })
+        else:
+            form = ImportForm()
+
+        context = {
+            'title': _('Import %s') % force_unicode(opts.verbose_name_plural),
+            'form': form,
+            'result': result,
+            'opts': opts,
+            'app_label': opts.app_label,
+            'has_change_permission': self.has_change_permission(request),
+        }
+        context.update(extra_context or {})
+        return TemplateResponse(request, self.import_template or [
+            "admin/%s/%s/import_form.html" % (opts.app_label, opts.model_name),
+            "admin/%s/import_form.html" % opts.app_label,
+            "admin/mongo_import_form.html"
+        ], context, current_app=self.admin_site.name)
+
+    def rows_view(self, request):
+        """
+        Returns a batch of changelist rows as JSON. The filters, search and
+        ordering are taken from the query string like on the changelist, the
+        ``cursor`` parameter continues after the previous batch.
+        """
+        from mongoadmin.rows import RowsChangeList, InvalidCursor, CURSOR_VAR
+
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        instrumentation.set_view(self, 'rows')
+        request.GET = request.GET.copy()
+        cursor = request.GET.pop(CURSOR_VAR, [None])[0]
+        list_display = self.get_list_display(request)
+        list_display_links = self.get_list_display_links(request, list_display)
+        try:
+            cl = RowsChangeList(request, self.model, list_display, list_display_links,
+                                self.list_filter, self.date_hierarchy, self.search_fields,
+                                self.list_select_related, self.list_per_page,
+                                self.list_max_show_all, self.list_editable, self)
+            rows, next_cursor = cl.get_rows(request, cursor, self.list_rows_batch_size)
+        except (IncorrectLookupParameters, InvalidCursor):
+            return HttpResponseBadRequest()
+
+        data = {
+            'columns': cl.get_columns(),
+            'rows': rows,
+            'next': next_cursor,
+        }
+        return HttpResponse(json.dumps(data), content_type='application/json')
+
+    def scroll_view(self, request, extra_context=None):
+        "A changelist table that loads the rows from rows_view while scrolling."
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        opts = self.model._meta
+        context = {
+            'title': _('Select %s to change') % force_unicode(opts.verbose_name),
+            'opts': opts,
+            'app_label': opts.app_label,
+            'query_string': request.GET.urlencode(),
+        }
+        context.update(extra_context or {})
+        return TemplateResponse(request, self.scroll_template or [
+            "admin/%s/%s/scroll.html" % (opts.app_label, opts.model_name),
+            "admin/%s/scroll.html" % opts.app_label,
+            "admin/mongo_change_list_scroll.html"
+        ], context, current_app=self.admin_site.name)
+
+    def reference_choices_view(self, request, field_name):
+        """
+        Returns the references of ``field_name`` whose documents match the
+        ``q`` parameter as JSON, for the search of ReferenceFieldListFilter.
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        filter_class = None
+        for item in self.list_filter:
+            if item == field_name:
+                filter_class = ReferenceFieldListFilter
+            elif isinstance(item, (list, tuple)) and item[0] == field_name:
+                filter_class = item[1]
+        if filter_class is None or not isinstance(self.model._fields.get(field_name),
+                                                  ReferenceField):
+            raise Http404
+
+        instrumentation.set_view(self, 'reference_choices')
+        term = request.GET.get('q', '').strip()
+        results = []
+        if term:
+            max_choices = getattr(filter_class, 'max_choices', ReferenceFieldListFilter.max_choices)
+            results = [{'id': force_unicode(pk), 'label': label} for pk, label in
+                       search_references(self, request, field_name, term, max_choices)]
+        return HttpResponse(json.dumps({'results': results}), content_type='application/json')
+
+    def live_view(self, request):
+        """
+        Streams the changes of the documents of the changelist with the
+        filters and search of the query string as server-sent events.
+        """
+        from mongoadmin import live
+        from mongoadmin.rows import RowsChangeList
+
+        if not self.list_live:
+            raise Http404
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        instrumentation.set_view(self, 'live')
+        list_display = self.get_list_display(request)
+        if self.get_actions(request):
+            list_display = ['action_checkbox'] + list(list_display)
+        list_display_links = self.get_list_display_links(request, list_display)
+        try:
+            cl = RowsChangeList(request, self.model, list_display, list_display_links,
+                                self.list_filter, self.date_hierarchy, self.search_fields,
+                                self.list_select_related, self.list_per_page,
+                                self.list_max_show_all, self.list_editable, self)
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest()
+
+        user_key = request.user.pk
+        if live.slots.acquire(user_key, live.max_streams(), self.live_max_streams_per_user):
+            events = live.LiveChangeList(
+                cl, live.parse_resume_token(request.META.get('HTTP_LAST_EVENT_ID')),
+                heartbeat=self.live_heartbeat, max_duration=self.live_max_duration,
+                release=partial(live.slots.release, user_key))
+        else:
+            events = live.busy_stream()
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # keeps nginx from buffering the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def get_raw_queryset(self, request, object_id):
+        """
+        Returns a queryset that matches the document ``object_id`` without
+        loading it, or None if the id isn't valid.
+        """
+        field = self.model._meta.pk
+        try:
+            object_id = field.to_python(unquote(object_id))
+        except (ValidationError, ValueError):
+            return None
+        queryset = self.apply_read_preference(request, self.get_queryset(request), 'raw')
+        return queryset.filter(**{field.name: object_id})
+
+    def raw_view(self, request, object_id, extra_context=None):
+        "Shows the stored document, nested values are loaded when expanded."
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        instrumentation.set_view(self, 'raw')
+        queryset = self.get_raw_queryset(request, object_id)
+        node = None
+        if queryset is not None:
+            node = get_node(queryset, None, 0, self.raw_batch_size)
+        if node is None:
+            raise Http404
+
+        opts = self.model._meta
+        context = {
+            'title': _('Raw %s') % force_unicode(opts.verbose_name),
+            'opts': opts,
+            'app_label': opts.app_label,
+            'object_id': object_id,
+            # the JSON is embedded in a script element
+            'node_json': json.dumps(node, default=json_util.default).replace('<', '\\u003c'),
+            'batch_size': self.raw_batch_size,
+        }
+        context.update(extra_context or {})
+        return TemplateResponse(request, self.raw_template or [
+            "admin/%s/%s/raw.html" % (opts.app_label, opts.model_name),
+            "admin/%s/raw.html" % opts.app_label,
+            "admin/mongo_raw_document.html"
+        ], context, current_app=self.admin_site.name)
+
+    def raw_node_view(self, request, object_id):
+        """
+        Returns the children of the node at the ``path`` parameter as JSON,
+        starting at ``skip``.
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        instrumentation.set_view(self, 'raw')
+        try:
+            skip = max(0, int(request.GET.get('skip', 0)))
+        except ValueError:
+            return HttpResponseBadRequest()
+        queryset = self.get_raw_queryset(request, object_id)
+        if queryset is None:
+            raise Http404
+        try:
+            node = get_node(queryset, request.GET.get('path'), skip, self.raw_batch_size)
+        except InvalidPath:
+            return HttpResponseBadRequest()
+        except OperationFailure:
+            # the path doesn't match the document, e.g. an index into a
+            # subdocument or a key of an array
+            return HttpResponseBadRequest()
+        if node is None:
+            raise Http404
+        return HttpResponse(json.dumps(node, default=json_util.default),
+                            content_type='application/json')
+
+    def changelist_view(self, request, extra_context=None):
+        instrumentation.set_view(self, 'changelist')
+        response = super(DocumentAdmin, self).changelist_view(request, extra_context)
+        cl = getattr(response, 'context_data', None) and response.context_data.get('cl')
+        if getattr(cl, 'stream_results', False):
+            return self.stream_changelist(request, response, cl)
+        return response
+
+    def stream_changelist(self, request, response, cl):
+        """
+        Turns the rendered changelist ``response`` into a streaming response
+        that sends the result rows in batches while they are read from the
+        cursor.
+        """
+        from mongoadmin.templatetags.documenttags import STREAM_MARKER
+
+        content = force_unicode(response.render().content)
+        if STREAM_MARKER not in content:
+            # a custom template that renders the rows itself
+            return response
+        head, tail = content.split(STREAM_MARKER, 1)
+
+        def stream():
+            yield head
+            for rows in cl.stream_rows():
+                yield rows
+            yield tail
+
+        streaming = StreamingHttpResponse(stream(), content_type=response['Content-Type'])
+        for header, value in response.items():
+            streaming[header] = value
+        streaming.cookies = response.cookies
+        return streaming
+
+    def add_view(self, request, form_url='', extra_context=None):
+        instrumentation.set_view(self, 'add')
+        return super(DocumentAdmin, self).add_view(request, form_url, extra_context)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        instrumentation.set_view(self, 'change')
+        return super(DocumentAdmin, self).change_view(request, object_id, form_url,
+                                                      extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        instrumentation.set_view(self, 'delete')
+        return super(DocumentAdmin, self).delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        """
+        The history of an object, read from the MongoLogEntry documents if
+        the action log is stored in MongoDB.
+        """
+        instrumentation.set_view(self, 'history')
+        if not action_log.use_mongo_log():
+            return super(DocumentAdmin, self).history_view(request, object_id, extra_context)
+
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+
+        opts = self.model._meta
+        app_label = opts.app_label
+        context = {
+            'title': _('Change history: %s') % force_unicode(obj),
+            'action_list': action_log.object_history(app_label, opts.model_name, obj.pk),
+            'module_name': capfirst(force_unicode(opts.verbose_name_plural)),
+            'object': obj,
+            'app_label': app_label,
+            'opts': opts,
+            'preserved_filters': self.get_preserved_filters(request),
+        }
+        context.update(extra_context or {})
+        return TemplateResponse(request, self.object_history_template or [
+            "admin/%s/%s/object_history.html" % (app_label, opts.model_name),
+            "admin/%s/object_history.html" % app_label,
+            "admin/object_history.html"
+        ], context, current_app=self.admin_site.name)
+
+    def response_action(self, request, queryset):
+        action = request.POST.get('action', '')
+        with instrumentation.instrument('%s.action %s' % (self.model.__name__, action)):
+            return super(DocumentAdmin, self).response_action(request, queryset)
+
     def save_related(self, request, form, formsets, change):
         """
         Given the ``HttpRequest``, the parent ``ModelForm`` instance, the
@@ -316,8 +982,12 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
         """
         Log that an object has been successfully added.
 
-        The default implementation creates an admin LogEntry object.
+        The default implementation creates an admin LogEntry object or a
+        MongoLogEntry if the action log is stored in MongoDB.
         """
+        if action_log.use_mongo_log():
+            action_log.log_action(request.user, object, action_log.ADDITION)
+            return
         if not is_django_user_model(request.user):
             return
 
@@ -327,8 +997,12 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
         """
         Log that an object has been successfully changed.
 
-        The default implementation creates an admin LogEntry object.
+        The default implementation creates an admin LogEntry object or a
+        MongoLogEntry if the action log is stored in MongoDB.
         """
+        if action_log.use_mongo_log():
+            action_log.log_action(request.user, object, action_log.CHANGE, message)
+            return
         if not is_django_user_model(request.user):
             return
 
@@ -339,8 +1013,13 @@ class DocumentAdmin(MongoFormFieldMixin, ModelAdmin):
         """
         Log that an object has been successfully changed.
 
-        The default implementation creates an admin LogEntry object.
+        The default implementation creates an admin LogEntry object or a
+        MongoLogEntry if the action log is stored in MongoDB.
         """
+        if action_log.use_mongo_log():
+            action_log.log_action(request.user, object, action_log.DELETION,
+                                  object_repr=object_repr)
+            return
         if not is_django_user_model(request.user):
             return
 
@@ -0,0 +1,154 @@
+"""
+Read-only access to stored documents, one level at a time.
+
+Instead of loading a whole document, an aggregation projects the node at a
+path (a JSON list like ``["items", 3, "address"]``) down to a summary of
+its children: their keys, types, sizes and the values of scalars. Arrays
+and the keys of subdocuments are paged with ``$slice`` and long strings
+are cut, so the size of a response doesn't depend on the size of the
+document. Needs MongoDB 3.4.4 or newer for ``$objectToArray``.
+"""
+import json
+
+from bson import json_util
+
+from django.utils import six
+
+# types whose children can be expanded
+CONTAINER_TYPES = ('object', 'array')
+# strings are cut after this many characters
+MAX_STRING_LENGTH = 200
+
+
+class InvalidPath(ValueError):
+    pass
+
+
+def reachable(key):
+    # keys with dots or a leading $ can't be used in field paths
+    return bool(key) and '.' not in key and not key.startswith('$')
+
+
+def parse_path(path):
+    """
+    Returns the segments of ``path``, a JSON list of keys and array indexes.
+    """
+    if not path:
+        return []
+    try:
+        segments = json.loads(path)
+    except ValueError:
+        raise InvalidPath(path)
+    if not isinstance(segments, list):
+        raise InvalidPath(path)
+    for segment in segments:
+        if isinstance(segment, bool):
+            raise InvalidPath(path)
+        if isinstance(segment, six.integer_types):
+            if segment < 0:
+                raise InvalidPath(path)
+        elif not isinstance(segment, six.string_types) or not reachable(segment):
+            raise InvalidPath(path)
+    return segments
+
+
+def _field_path(expression, keys):
+    # the value at the ``keys`` of the value of ``expression``
+    if not keys:
+        return expression
+    if isinstance(expression, six.string_types):
+        return '.'.join([expression] + keys)
+    return {'$let': {'vars': {'node': expression}, 'in': '.'.join(['$$node'] + keys)}}
+
+
+def path_expression(segments):
+    """
+    Returns an aggregation expression for the value at ``segments``.
+    """
+    expression = '$$ROOT'
+    keys = []
+    for segment in segments:
+        if isinstance(segment, six.integer_types):
+            expression = {'$arrayElemAt': [_field_path(expression, keys), segment]}
+            keys = []
+        else:
+            keys.append(segment)
+    return _field_path(expression, keys)
+
+
+def _summary(variable):
+    # the type, size and (for scalars) value of ``variable``
+    value_type = {'$type': variable}
+    return {
+        'type': value_type,
+        'size': {'$cond': [
+            {'$eq': [value_type, 'array']}, {'$size': variable},
+            {'$cond': [
+                {'$eq': [value_type, 'object']}, {'$size': {'$objectToArray': variable}},
+                {'$cond': [{'$eq': [value_type, 'string']}, {'$strLenCP': variable}, None]}]}]},
+        'value': {'$cond': [
+            {'$in': [value_type, list(CONTAINER_TYPES) + ['binData']]}, None,
+            {'$cond': [
+                {'$eq': [value_type, 'string']},
+                {'$substrCP': [variable, 0, MAX_STRING_LENGTH]}, variable]}]},
+    }
+
+
+def node_pipeline(segments, skip, limit):
+    """
+    Returns the pipeline stages that project a document to the node at
+    ``segments`` with the children ``skip`` to ``skip + limit``.
+    """
+    node = _summary('$$node')
+    node['children'] = {'$cond': [
+        {'$eq': [{'$type': '$$node'}, 'array']},
+        {'$map': {'input': {'$slice': ['$$node', skip, limit]},
+                  'as': 'child', 'in': _summary('$$child')}},
+        {'$cond': [
+            {'$eq': [{'$type': '$$node'}, 'object']},
+            {'$map': {'input': {'$slice': [{'$objectToArray': '$$node'}, skip, limit]},
+                      'as': 'child',
+                      'in': dict(_summary('$$child.v'), key='$$child.k')}},
+            []]}]}
+    return [
+        {'$limit': 1},
+        {'$project': {'_id': 0, 'node': {
+            '$let': {'vars': {'node': path_expression(segments)}, 'in': node}}}},
+    ]
+
+
+def _display(child):
+    child['expandable'] = child['type'] in CONTAINER_TYPES and (
+        isinstance(child['key'], six.integer_types) or reachable(child['key']))
+    if child['type'] in CONTAINER_TYPES or child['type'] == 'binData':
+        child.pop('value', None)
+    elif child['type'] == 'string':
+        child['truncated'] = child['size'] > MAX_STRING_LENGTH
+    else:
+        child['value'] = json_util.dumps(child.get('value'))
+    return child
+
+
+def get_node(queryset, path, skip=0, limit=100):
+    """
+    Returns the node at ``path`` of the document ``queryset`` matches as a
+    dict with its ``type``, ``size`` and ``children``, each with ``key``
+    (the index for arrays), ``path``, ``type``, ``size`` and ``value`` (the
+    extended JSON of scalars, the text of strings). Returns None if there is
+    no document or nothing at ``path``.
+    """
+    segments = parse_path(path)
+    result = queryset.aggregate(*node_pipeline(segments, skip, limit))
+    if isinstance(result, dict):
+        # pymongo < 3
+        result = result.get('result', [])
+    result = list(result)
+    if not result or result[0]['node']['type'] == 'missing':
+        return None
+    node = result[0]['node']
+    node['path'] = segments
+    for index, child in enumerate(node['children'], skip):
+        child.setdefault('key', index)
+        child['path'] = segments + [child['key']]
+        _display(child)
+    return node
@@ -0,0 +1,204 @@
+"""
+Changelist rows as JSON, for tables that load more rows while scrolling.
+
+The rows are fetched with keyset pagination: instead of skipping over all
+previous rows, the continuation token holds the values of the ordering
+fields of the last row and the next batch is queried with a range filter on
+them, so every batch costs the same no matter how deep the table is
+scrolled. Tokens are signed, as their values end up in the query.
+"""
+import base64
+
+from django.contrib.admin.util import lookup_field, display_for_field, label_for_field
+try:
+    from django.contrib.admin.util import display_for_value
+except ImportError:
+    display_for_value = None
+from django.contrib.admin.views.main import EMPTY_CHANGELIST_VALUE
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import six
+from django.utils.html import strip_tags
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from bson import json_util
+
+from mongoadmin.indexes import field_path
+from mongoadmin.views import DocumentChangeList
+
+CURSOR_VAR = 'cursor'
+
+_signer = signing.Signer(salt='mongoadmin.rows')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    data = base64.urlsafe_b64encode(json_util.dumps(values).encode('utf-8'))
+    return _signer.sign(data.decode('ascii'))
+
+
+def decode_cursor(token):
+    try:
+        data = _signer.unsign(token)
+        return json_util.loads(base64.urlsafe_b64decode(data.encode('ascii')).decode('utf-8'))
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor(token)
+
+
+def keyset_ordering(model, ordering):
+    """
+    Returns the ordering as list of ``(db path, direction)`` tuples or None
+    if an ordering field isn't a document field.
+    """
+    keys = []
+    for name in ordering:
+        if not isinstance(name, six.string_types):
+            return None
+        direction = -1 if name.startswith('-') else 1
+        path = field_path(model, name.lstrip('-+'))[1]
+        if path is None:
+            return None
+        keys.append((path, direction))
+    return keys
+
+
+def document_value(son, path):
+    for part in path.split('.'):
+        if not isinstance(son, dict):
+            return None
+        son = son.get(part)
+    return son
+
+
+def keyset_filter(keys, values):
+    """
+    Returns a raw query for the documents after the one with ``values`` in
+    the ordering ``keys``.
+
+    Null and missing values sort before everything else, so they follow
+    any value in descending order. Values of other types are still compared
+    with ``$gt``/``$lt``, which only match values of the same type, as
+    comparisons across types (``$expr``) can't use the index.
+    """
+    clauses = []
+    for i, (path, direction) in enumerate(keys):
+        clause = dict((p, v) for (p, d), v in zip(keys[:i], values[:i]))
+        value = values[i]
+        if value is None:
+            if direction < 0:
+                # nothing sorts before null
+                continue
+            clause[path] = {'$ne': None}
+        elif direction > 0:
+            clause[path] = {'$gt': value}
+        else:
+            clause['$or'] = [{path: {'$lt': value}}, {path: None}]
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+def format_value(cl, field_name, obj):
+    """
+    Formats one cell like the changelist does, as plain text.
+    """
+    try:
+        f, attr, value = lookup_field(field_name, obj, cl.model_admin)
+    except (AttributeError, ObjectDoesNotExist):
+        return EMPTY_CHANGELIST_VALUE
+    if f is None:
+        boolean = getattr(attr, 'boolean', False)
+        if boolean:
+            return bool(value) if value is not None else None
+        text = display_for_value(value, boolean) if display_for_value else value
+    else:
+        text = display_for_field(value, f)
+    text = force_unicode(text)
+    if getattr(attr, 'allow_tags', False):
+        text = strip_tags(text)
+    return text
+
+
+class RowsChangeList(DocumentChangeList):
+    """
+    A DocumentChangeList that only applies the filters, search and ordering
+    of the request and doesn't count or fetch anything.
+    """
+    def get_results(self, request):
+        pass
+
+    def get_rows(self, request, cursor=None, limit=100):
+        """
+        Returns the rows after ``cursor`` and the cursor of the next batch or
+        None if there are no more rows.
+        """
+        keys = keyset_ordering(self.model, self.queryset_ordering)
+        queryset = self.read_queryset(self.queryset)
+        only_fields = self.get_only_fields()
+        if only_fields is not None:
+            queryset = queryset.only(*only_fields)
+        offset = 0
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if keys is None:
+                # ordered by something that isn't a field, fall back to skip
+                if not isinstance(values, six.integer_types):
+                    raise InvalidCursor(cursor)
+                offset = values
+                queryset = queryset.skip(offset)
+            else:
+                if not isinstance(values, list) or len(values) != len(keys):
+                    raise InvalidCursor(cursor)
+                queryset = queryset.filter(__raw__=keyset_filter(keys, values))
+
+        objects = list(queryset.limit(limit + 1))
+        next_cursor = None
+        if len(objects) > limit:
+            objects = objects[:limit]
+            if keys is None:
+                next_cursor = encode_cursor(offset + limit)
+            else:
+                son = objects[-1].to_mongo()
+                next_cursor = encode_cursor([document_value(son, path) for path, d in keys])
+
+        rows = []
+        for obj in objects:
+            rows.append({
+                'pk': force_unicode(obj.pk),
+                'url': self.url_for_result(obj),
+                'cells': [format_value(self, name, obj) for name in self.columns],
+            })
+        return rows, next_cursor
+
+    def get_only_fields(self):
+        """
+        Returns the fields the rows need: the columns, the primary key and the
+        ordering fields the cursor is built from. Returns None if a column
+        isn't a document field, as callables and admin methods may read any
+        field.
+        """
+        fields = set([self.model._meta['id_field']])
+        for name in self.columns:
+            if not isinstance(name, six.string_types) or name not in self.model._fields:
+                return None
+            fields.add(name)
+        for name in self.queryset_ordering:
+            if isinstance(name, six.string_types):
+                path = field_path(self.model, name.lstrip('-+'))[0]
+                if path is not None:
+                    fields.add(path)
+        return sorted(fields)
+
+    @property
+    def columns(self):
+        return [name for name in self.list_display if name != 'action_checkbox']
+
+    def get_columns(self):
+        return [{'name': name if isinstance(name, six.string_types) else name.__name__,
+                 'label': force_unicode(label_for_field(name, self.model, self.model_admin))}
+                for name in self.columns]
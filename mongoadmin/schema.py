@@ -0,0 +1,218 @@
+"""
+Infers the fields of DynamicDocument collections from a sample.
+
+The admin only knows the declared fields of a document. For
+DynamicDocuments most of the data can be in undeclared fields, so a random
+sample of the collection (``$sample``, MongoDB >= 3.2) is inspected for the
+top level fields, their types, how often they occur and their most common
+values. The result is cached (``MONGOADMIN_SCHEMA_CACHE``, default
+``'default'``) for ``MONGOADMIN_SCHEMA_TTL`` seconds (default one hour), so
+page loads never touch more than the sample.
+"""
+import datetime
+from collections import defaultdict
+
+from bson import ObjectId
+
+from django.conf import settings
+from django.contrib.admin import SimpleListFilter
+from django.utils import six
+from django.utils.text import Truncator
+try:
+    from django.utils.encoding import force_text as force_unicode
+except ImportError:
+    from django.utils.encoding import force_unicode
+
+from pymongo.errors import OperationFailure
+
+from mongoengine.document import DynamicDocument
+
+CACHE_KEY_PREFIX = 'mongoadmin:schema:'
+# types whose values are offered as filter choices
+FILTER_TYPES = ('string', 'int', 'bool')
+FILTER_PARAMETER_PREFIX = 'dyn__'
+
+
+def type_name(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, six.integer_types):
+        return 'int'
+    if isinstance(value, float):
+        return 'double'
+    if isinstance(value, six.string_types):
+        return 'string'
+    if isinstance(value, datetime.datetime):
+        return 'date'
+    if isinstance(value, dict):
+        return 'object'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    if isinstance(value, ObjectId):
+        return 'objectId'
+    if value is None:
+        return 'null'
+    return type(value).__name__
+
+
+class InferredField(object):
+    def __init__(self, name, count, sample_size, types, values):
+        self.name = name
+        self.count = count
+        self.sample_size = sample_size
+        # {type name: count}
+        self.types = types
+        # the most common scalar values, most common first
+        self.values = values
+
+    @property
+    def frequency(self):
+        return float(self.count) / self.sample_size if self.sample_size else 0.0
+
+    @property
+    def type(self):
+        return max(self.types.items(), key=lambda t: t[1])[0]
+
+    def parse(self, text):
+        """
+        Returns the sampled value whose text is ``text`` or ``text`` itself.
+        """
+        for value in self.values:
+            if force_unicode(value) == text:
+                return value
+        return text
+
+
+class InferredSchema(object):
+    def __init__(self, fields, sample_size):
+        self.fields = fields
+        self.sample_size = sample_size
+
+    def common_fields(self, min_frequency=0.0, limit=None):
+        """
+        Returns the fields that occur in at least ``min_frequency`` of the
+        sampled documents, most frequent first.
+        """
+        fields = [f for f in self.fields if f.frequency >= min_frequency]
+        return fields[:limit] if limit else fields
+
+
+def sample_documents(collection, size):
+    try:
+        result = collection.aggregate([{'$sample': {'size': size}}])
+    except OperationFailure:
+        # MongoDB < 3.2
+        return list(collection.find().limit(size))
+    if isinstance(result, dict):
+        # pymongo < 3
+        return result.get('result', [])
+    return list(result)
+
+
+def infer_schema(model, sample_size=1000, max_values=20):
+    """
+    Samples ``sample_size`` documents of ``model``'s collection and returns
+    an InferredSchema of the fields that aren't declared on ``model``.
+    """
+    declared = set(field.db_field for field in model._fields.values())
+    declared.update(['_id', '_cls', '_types'])
+    documents = sample_documents(model._get_collection(), sample_size)
+
+    counts = defaultdict(int)
+    types = defaultdict(lambda: defaultdict(int))
+    values = defaultdict(lambda: defaultdict(int))
+    for son in documents:
+        for name, value in son.items():
+            if name in declared:
+                continue
+            counts[name] += 1
+            kind = type_name(value)
+            types[name][kind] += 1
+            if kind in FILTER_TYPES:
+                # keyed with the type, as True == 1 and False == 0
+                values[name][(kind, value)] += 1
+
+    fields = []
+    for name, count in sorted(counts.items(), key=lambda c: (-c[1], c[0])):
+        common = sorted(values[name].items(), key=lambda v: -v[1])[:max_values]
+        fields.append(InferredField(name, count, len(documents), dict(types[name]),
+                                    [value for (kind, value), c in common]))
+    return InferredSchema(fields, len(documents))
+
+
+def _get_cache():
+    from django.core.cache import get_cache
+    return get_cache(getattr(settings, 'MONGOADMIN_SCHEMA_CACHE', 'default'))
+
+
+def _cache_key(model):
+    return '%s%s.%s' % (CACHE_KEY_PREFIX, model._get_db().name, model._get_collection_name())
+
+
+def get_schema(model, sample_size=1000):
+    """
+    Returns the cached InferredSchema of ``model``, sampling the collection
+    if it isn't cached.
+    """
+    cache = _get_cache()
+    schema = cache.get(_cache_key(model))
+    if schema is None:
+        schema = infer_schema(model, sample_size)
+        cache.set(_cache_key(model), schema, getattr(settings, 'MONGOADMIN_SCHEMA_TTL', 3600))
+    return schema
+
+
+def clear_schema(model):
+    """
+    Removes the cached schema of ``model``, the next request samples again.
+    """
+    _get_cache().delete(_cache_key(model))
+
+
+def is_dynamic(model):
+    return issubclass(model, DynamicDocument)
+
+
+def display_value(value):
+    if isinstance(value, (dict, list, tuple)):
+        return Truncator(force_unicode(value)).chars(80)
+    return value
+
+
+_columns = {}
+
+
+def dynamic_column(name):
+    """
+    Returns a ``list_display``/``readonly_fields`` callable that shows the
+    dynamic field ``name``. The same callable is returned for a name, as
+    the admin compares the readonly fields of the form and its fieldsets.
+    """
+    if name not in _columns:
+        def column(obj):
+            return display_value(obj._data.get(name))
+        column.short_description = name.replace('_', ' ')
+        column.admin_order_field = name
+        column.__name__ = str('dynamic_%s' % name)
+        _columns[name] = column
+    return _columns[name]
+
+
+def dynamic_list_filter(field):
+    """
+    Returns a list filter for the inferred ``field`` that offers its most
+    common sampled values. Its parameter is prefixed, so fields like ``q``
+    or ``o`` don't collide with the parameters of the changelist.
+    """
+    class DynamicFieldListFilter(SimpleListFilter):
+        title = field.name.replace('_', ' ')
+        parameter_name = '%s%s' % (FILTER_PARAMETER_PREFIX, field.name)
+
+        def lookups(self, request, model_admin):
+            return [(force_unicode(value), force_unicode(value)) for value in field.values]
+
+        def queryset(self, request, queryset):
+            if self.value() is None:
+                return queryset
+            return queryset.filter(__raw__={field.name: field.parse(self.value())})
+    return DynamicFieldListFilter
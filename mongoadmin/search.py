@@ -0,0 +1,150 @@
+"""
+Changelist search for documents, including paths through ReferenceFields.
+
+MongoDB has no joins, so a search field like ``customer__email`` is
+searched in two phases: the referenced collection is searched for
+``email`` and the ids of at most ``limit`` matching customers are applied
+to the changelist query as ``customer__in``. Paths can go through several
+references. The id sets are cached (``MONGOADMIN_SEARCH_CACHE``, default
+``'default'``) for a short time, as a search is repeated for every page
+and count of a changelist.
+"""
+import hashlib
+import operator
+from functools import reduce
+
+from django.conf import settings
+try:
+    from django.utils.encoding import force_bytes
+except ImportError:
+    from django.utils.encoding import smart_str as force_bytes
+
+from mongoengine.fields import ReferenceField, ListField, EmbeddedDocumentField
+from mongoengine.queryset import Q
+
+from mongoadmin import instrumentation
+
+CACHE_KEY_PREFIX = 'mongoadmin:search:'
+
+LOOKUPS = {
+    '^': 'istartswith',
+    '=': 'iexact',
+}
+CASE_SENSITIVE_LOOKUPS = {
+    'istartswith': 'startswith',
+    'iexact': 'exact',
+    'icontains': 'contains',
+}
+
+
+def search_lookup(field_name, case_sensitive=False):
+    """
+    Returns the field path and the mongoengine operator of a search field
+    with Django's prefixes (``^`` starts with, ``=`` exact, ``@`` is
+    searched like a plain field).
+    """
+    lookup = LOOKUPS.get(field_name[0], 'icontains')
+    field_name = field_name.lstrip('^=@')
+    if case_sensitive:
+        lookup = CASE_SENSITIVE_LOOKUPS[lookup]
+    return field_name, lookup
+
+
+def split_reference_path(document, path):
+    """
+    Returns ``(reference path, referenced document, rest)`` for the first
+    ReferenceField (or list of them) in ``path`` that is followed by more
+    parts, or None if the path doesn't traverse a reference.
+    """
+    parts = path.split('__')
+    for i, part in enumerate(parts[:-1]):
+        field = document._fields.get(part)
+        if isinstance(field, ListField):
+            field = field.field
+        if isinstance(field, ReferenceField):
+            return '__'.join(parts[:i + 1]), field.document_type, '__'.join(parts[i + 1:])
+        if isinstance(field, EmbeddedDocumentField):
+            document = field.document_type
+        else:
+            return None
+    return None
+
+
+def _get_cache():
+    from django.core.cache import get_cache
+    return get_cache(getattr(settings, 'MONGOADMIN_SEARCH_CACHE', 'default'))
+
+
+class DocumentSearch(object):
+    """
+    Builds the query for a search term. ``queryset_for`` returns the base
+    queryset for a referenced document class, ``limit`` bounds the ids read
+    per referenced search and ``cache_timeout`` is how long they're cached
+    (0 turns the cache off). The referenced document classes that had more
+    than ``limit`` matches are collected in ``truncated``.
+    """
+    def __init__(self, search_fields, queryset_for, limit=1000, cache_timeout=60,
+                 case_sensitive=False):
+        self.search_fields = search_fields
+        self.queryset_for = queryset_for
+        self.limit = limit
+        self.cache_timeout = cache_timeout
+        self.case_sensitive = case_sensitive
+        self.truncated = []
+
+    def cache_key(self, document, queryset):
+        key = '%s|%s|%r|%r|%s|%s' % (document._get_db().name, document._get_collection_name(),
+                                     queryset._query, getattr(queryset, '_read_preference', None),
+                                     self.case_sensitive, self.limit)
+        return CACHE_KEY_PREFIX + hashlib.md5(force_bytes(key)).hexdigest()
+
+    def referenced_ids(self, document, q):
+        """
+        Returns the ids of up to ``limit`` ``document``s matching ``q``.
+        """
+        queryset = self.queryset_for(document).filter(q)
+        cache = _get_cache() if self.cache_timeout else None
+        ids = None
+        if cache is not None:
+            key = self.cache_key(document, queryset)
+            ids = cache.get(key)
+        if ids is None:
+            # one more id tells if there are more matches than the limit
+            with instrumentation.instrument('search %s' % document.__name__):
+                ids = list(queryset.scalar(document._meta['id_field']).limit(self.limit + 1))
+            if cache is not None:
+                cache.set(key, ids, self.cache_timeout)
+        if len(ids) > self.limit:
+            if document not in self.truncated:
+                self.truncated.append(document)
+            ids = ids[:self.limit]
+        return ids
+
+    def lookup_q(self, document, path, lookup, bit):
+        """
+        Returns the Q object that searches ``path`` of ``document`` for
+        ``bit``, searching referenced collections first.
+        """
+        split = split_reference_path(document, path)
+        if split is None:
+            return Q(**{'%s__%s' % (path, lookup): bit})
+        reference_path, referenced, rest = split
+        ids = self.referenced_ids(referenced, self.lookup_q(referenced, rest, lookup, bit))
+        return Q(**{'%s__in' % reference_path: ids})
+
+    def q(self, document, search_term):
+        """
+        Returns a Q object that requires every word of ``search_term`` to
+        be found in one of the search fields, or None for an empty term.
+        """
+        lookups = [search_lookup(field_name, self.case_sensitive)
+                   for field_name in self.search_fields]
+        if not lookups:
+            return None
+        word_queries = []
+        for bit in search_term.split():
+            or_queries = [self.lookup_q(document, path, lookup, bit) for path, lookup in lookups]
+            word_queries.append(reduce(operator.or_, or_queries))
+        if not word_queries:
+            return None
+        return reduce(operator.and_, word_queries)
@@ -1,6 +1,12 @@
+import threading
+from functools import update_wrapper
+
+from django.conf import settings
 from django.contrib.admin import ModelAdmin
 from django.db.models.base import ModelBase
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.template.response import TemplateResponse
+from django.utils.translation import ugettext as _
 from django.contrib.admin.sites import (AdminSite, NotRegistered,
                                         AlreadyRegistered)
 
@@ -9,10 +15,75 @@ from mongoengine.base import TopLevelDocumentMetaclass
 from mongodbforms import init_document_options
 
 from mongoadmin import DocumentAdmin
+from mongoadmin import log as action_log
 
 LOGIN_FORM_KEY = 'this_is_the_login_form'
 
 
+class PendingAdmin(object):
+    """
+    Placeholder for an admin class that has been registered with a lazy
+    site but has not been instantiated yet.
+    """
+    def __init__(self, admin_class):
+        self.admin_class = admin_class
+
+
+class LazyRegistry(dict):
+    """
+    A model to admin instance mapping that instantiates admin classes on
+    first access. Apart from that it behaves like the plain dict AdminSite
+    uses as registry.
+
+    Pending admins are instantiated under a lock, so threads of a threaded
+    server that hit the same admin at once share one instance. The lock is
+    reentrant because admin classes may look up other admins while they are
+    instantiated.
+    """
+    def __init__(self, admin_site, *args, **kwargs):
+        super(LazyRegistry, self).__init__(*args, **kwargs)
+        self.admin_site = admin_site
+        self._lock = threading.RLock()
+
+    def _resolve(self, model, value):
+        if not isinstance(value, PendingAdmin):
+            return value
+        with self._lock:
+            # another thread may have instantiated it while we waited
+            value = dict.__getitem__(self, model)
+            if isinstance(value, PendingAdmin):
+                value = self.admin_site.instantiate_admin(model, value.admin_class)
+                dict.__setitem__(self, model, value)
+        return value
+
+    def __getitem__(self, model):
+        return self._resolve(model, dict.__getitem__(self, model))
+
+    def get(self, model, default=None):
+        if model in self:
+            return self[model]
+        return default
+
+    def values(self):
+        return [self[model] for model in list(self.keys())]
+
+    def items(self):
+        return [(model, self[model]) for model in list(self.keys())]
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def pending(self):
+        """
+        Returns the models whose admin classes haven't been instantiated yet.
+        """
+        return [model for model, value in dict.items(self)
+                if isinstance(value, PendingAdmin)]
+
+
 class MongoAdminSite(AdminSite):
 
     """
@@ -21,8 +92,91 @@ class MongoAdminSite(AdminSite):
     with the AdminSite using the register() method, and the get_urls() method
     can then be used to access Django view functions that present a full admin
     interface for the collection of registered models.
+
+    If ``lazy`` is true (it defaults to the MONGOADMIN_LAZY_REGISTRATION
+    setting), register() only records the admin class. Document options
+    and admin instances are then built the first time the registry entry is
+    accessed, or all at once by warm_up(). Note that get_urls() needs the
+    URLs of every admin and therefore instantiates all of them, so the
+    instantiation is only deferred until the URLconf is first loaded.
     """
 
+    def __init__(self, name='admin', app_name='admin', lazy=None):
+        super(MongoAdminSite, self).__init__(name=name, app_name=app_name)
+        if lazy is None:
+            lazy = getattr(settings, 'MONGOADMIN_LAZY_REGISTRATION', False)
+        self.lazy = lazy
+        if self.lazy:
+            self._registry = LazyRegistry(self)
+
+    def instantiate_admin(self, model, admin_class):
+        """
+        Returns the admin instance for model.
+        """
+        if isinstance(model, TopLevelDocumentMetaclass):
+            init_document_options(model)
+        return admin_class(model, self)
+
+    def warm_up(self, content_types=False):
+        """
+        Instantiates all admin classes that are still pending on a lazy site
+        and, with ``content_types``, loads all content types into the cache
+        of the content type manager.
+
+        Preforking servers should call this in the master process (e.g. in
+        the wsgi module with gunicorn's --preload), so the work is done once
+        and the result is shared with all workers. Loading the content types
+        connects to the database, which pymongo doesn't support before a
+        fork, so only do that in processes that don't fork.
+        """
+        if isinstance(self._registry, LazyRegistry):
+            for model in self._registry.pending():
+                self._registry[model]
+        if content_types:
+            from mongoadmin.contenttypes.models import ContentType
+            preload = getattr(ContentType.objects, 'preload', None)
+            if preload is not None:
+                preload()
+
+    def admin_view(self, view, cacheable=False):
+        """
+        Like AdminSite.admin_view, but the action log entries of the view are
+        written in one batch when it returns.
+        """
+        def inner(request, *args, **kwargs):
+            with action_log.batched():
+                return view(request, *args, **kwargs)
+        inner = update_wrapper(inner, view)
+        return super(MongoAdminSite, self).admin_view(inner, cacheable)
+
+    def get_urls(self):
+        from django.conf.urls import patterns, url
+
+        urlpatterns = patterns('',
+            url(r'^index-advisor/$', self.admin_view(self.index_advisor_view),
+                name='index_advisor'),
+        )
+        return urlpatterns + super(MongoAdminSite, self).get_urls()
+
+    def index_advisor_view(self, request, extra_context=None):
+        """
+        Shows the changelist queries of all document admins that can't use an
+        index, together with suggested indexes. Only superusers may see it
+        because every query is explained against the database.
+        """
+        if not request.user.is_superuser:
+            raise PermissionDenied
+
+        from mongoadmin.indexes import advise_site
+
+        context = {
+            'title': _('Index advisor'),
+            'advisor_results': advise_site(self),
+        }
+        context.update(extra_context or {})
+        return TemplateResponse(request, 'admin/mongo_index_advisor.html', context,
+                                current_app=self.name)
+
     def register(self, model_or_iterable, admin_class=None, **options):
         """
         Registers the given model(s) with the given admin class.
@@ -43,21 +197,31 @@ class MongoAdminSite(AdminSite):
         if isinstance(model_or_iterable, TopLevelDocumentMetaclass) and not admin_class:
             admin_class = DocumentAdmin
 
-        # Don't import the humongous validation code unless required
-        # if admin_class and settings.DEBUG:
-        #    from mongoadmin.validation import validate
-        # else:
+        # Don't import the humongous validation code unless required.
+        # Use the validate_mongoadmin command (or the system check on
+        # Django >= 1.7) to validate the registered admins.
         validate = lambda model, adminclass: None
 
         if isinstance(model_or_iterable, ModelBase) or \
                 isinstance(model_or_iterable, TopLevelDocumentMetaclass):
             model_or_iterable = [model_or_iterable]
 
+        if self.lazy and not isinstance(self._registry, LazyRegistry):
+            # the registry has been replaced with a plain dict, e.g. by
+            # MONGOADMIN_OVERRIDE_ADMIN
+            self._registry = LazyRegistry(self, self._registry)
+
         for model in model_or_iterable:
-            if isinstance(model, TopLevelDocumentMetaclass):
+            is_document = isinstance(model, TopLevelDocumentMetaclass)
+            if is_document and not self.lazy:
                 init_document_options(model)
 
-            if hasattr(model._meta, 'abstract') and model._meta.abstract:
+            if isinstance(model._meta, dict):
+                # a document whose options will be initialized lazily
+                abstract = model._meta.get('abstract', False)
+            else:
+                abstract = getattr(model._meta, 'abstract', False)
+            if abstract:
                 raise ImproperlyConfigured('The model %s is abstract, so it '
                                            'cannot be registered with admin.' % model.__name__)
 
@@ -66,8 +230,8 @@ class MongoAdminSite(AdminSite):
                     'The model %s is already registered' % model.__name__)
 
             # Ignore the registration if the model has been
-            # swapped out.
-            if model._meta.swapped:
+            # swapped out. Documents can't be swapped.
+            if not is_document and model._meta.swapped:
                 continue
 
             # If we got **options then dynamically construct a subclass of
@@ -83,8 +247,11 @@ class MongoAdminSite(AdminSite):
             # Validate (which might be a no-op)
             validate(admin_class, model)
 
-            # Instantiate the admin class to save in the registry
-            self._registry[model] = admin_class(model, self)
+            if self.lazy:
+                self._registry[model] = PendingAdmin(admin_class)
+            else:
+                # Instantiate the admin class to save in the registry
+                self._registry[model] = self.instantiate_admin(model, admin_class)
 
     def unregister(self, model_or_iterable):
         """
@@ -1,6 +1,7 @@
 import django.contrib.admin.templatetags.log
 from django.contrib.admin.models import LogEntry
 
+from mongoadmin import log as action_log
 from mongoadmin.util import is_django_user_model
 
 class AdminLogNode(django.template.Node):
@@ -11,7 +12,12 @@ class AdminLogNode(django.template.Node):
         return "<GetAdminLog Node>"
 
     def render(self, context):
-        if not is_django_user_model(self.user):
+        if action_log.use_mongo_log():
+            user_id = self.user
+            if user_id is not None and not user_id.isdigit():
+                user_id = context[self.user].pk
+            context[self.varname] = action_log.recent_actions(user_id, self.limit)
+        elif not is_django_user_model(self.user):
             context[self.varname] = None
         elif self.user is None:
             context[self.varname] = LogEntry.objects.all().select_related('content_type', 'user')[:self.limit]
@@ -1,4 +1,5 @@
 from django.template import Library
+from django.contrib.admin.views.main import PAGE_VAR
 from django.contrib.admin.templatetags.admin_list import (result_hidden_fields, ResultList, items_for_result,
                                                           result_headers)
 from django.db.models.fields import FieldDoesNotExist
@@ -7,6 +8,8 @@ from mongodbforms.documentoptions import patch_document
 
 register = Library()
 
+STREAM_MARKER = '<!-- mongoadmin:stream -->'
+
 def serializable_value(self, field_name):
     """
     Returns the value of the field name for this instance. If the field is
@@ -34,9 +37,16 @@ def results(cl):
             patch_document(serializable_value, res)
             yield ResultList(form, items_for_result(cl, res, form))
     else:
-        for res in cl.result_list:
-            patch_document(serializable_value, res)
-            yield ResultList(None, items_for_result(cl, res, None))
+        for row in result_rows(cl, cl.result_list):
+            yield row
+
+def result_rows(cl, documents):
+    """
+    Like results, for any iterable of documents and without forms.
+    """
+    for res in documents:
+        patch_document(serializable_value, res)
+        yield ResultList(None, items_for_result(cl, res, None))
 
 def document_result_list(cl):
     """
@@ -58,4 +68,28 @@ def document_result_list(cl):
             'results': list(results(cl))}
 result_list = register.inclusion_tag("admin/change_list_results.html")(document_result_list)
 
+def document_result_list_stream(cl):
+    """
+    Displays the headers and a marker where DocumentAdmin.changelist_view
+    streams the rows.
+    """
+    headers = list(result_headers(cl))
+    return {'cl': cl,
+            'result_headers': headers,
+            'num_sorted_fields': len([h for h in headers if h.get('sortable') and h.get('sorted')]),
+            'stream_marker': STREAM_MARKER}
+result_list_stream = register.inclusion_tag("admin/mongo_change_list_results_stream.html")(
+    document_result_list_stream)
+
+
 
+def document_pagination(cl):
+    """
+    Displays previous and next links instead of the page numbers if the
+    results couldn't be counted.
+    """
+    has_next = cl.result_count > (cl.page_num + 1) * cl.list_per_page
+    return {'cl': cl,
+            'previous_url': cl.get_query_string({PAGE_VAR: cl.page_num - 1}) if cl.page_num else None,
+            'next_url': cl.get_query_string({PAGE_VAR: cl.page_num + 1}) if has_next else None}
+pagination = register.inclusion_tag("admin/mongo_pagination.html")(document_pagination)
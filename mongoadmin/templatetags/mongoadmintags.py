@@ -31,3 +31,18 @@ def check_grappelli(parser, token):
     return CheckGrappelli(varname)
 
 register.tag(check_grappelli)
+
+@register.inclusion_tag('admin/mongo_query_footer.html')
+def mongo_query_footer():
+    """
+    Shows the MongoDB commands the current request has issued so far, if
+    MONGOADMIN_QUERY_FOOTER is set and QueryInstrumentationMiddleware is used.
+
+    Usage: {% mongo_query_footer %}
+    """
+    from mongoadmin.instrumentation import current_recorder
+
+    recorder = None
+    if getattr(settings, 'MONGOADMIN_QUERY_FOOTER', False):
+        recorder = current_recorder()
+    return {'recorder': recorder}
@@ -0,0 +1,205 @@
+"""
+Helpers to pin the number of MongoDB commands admin views issue in tests,
+like Django's assertNumQueries does for the ORM.
+
+Requires pymongo >= 3.1 and the instrumentation listener to be registered
+before the connection is created (see mongoadmin.instrumentation)::
+
+    from mongoadmin.testing import capture_commands, assert_num_commands
+
+    with capture_commands() as commands:
+        client.get(changelist_url)
+    assert commands.count('find', collection='app_document') == 1
+
+    @assert_num_commands(3)
+    def test_changelist(self):
+        ...
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from mongoadmin import instrumentation
+
+
+class CapturedCommands(object):
+    """
+    The commands issued inside a ``capture_commands`` block.
+    """
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    @property
+    def commands(self):
+        return self.recorder.commands
+
+    def __len__(self):
+        return len(self.commands)
+
+    def count(self, name=None, collection=None):
+        """
+        Returns the number of commands, optionally only those named ``name``
+        (``find``, ``count``, ``delete``, ...) or sent to ``collection``.
+        """
+        return len([c for c in self.commands
+                    if (name is None or c.name == name) and
+                    (collection is None or c.collection == collection)])
+
+    def grouped(self):
+        """
+        Returns a ``{collection: {command name: count}}`` dict.
+        """
+        groups = defaultdict(lambda: defaultdict(int))
+        for command in self.commands:
+            groups[command.collection][command.name] += 1
+        return dict((k, dict(v)) for k, v in groups.items())
+
+    def summary(self):
+        lines = []
+        for collection, names in sorted(self.grouped().items(), key=lambda i: str(i[0])):
+            for name, count in sorted(names.items()):
+                lines.append('%s.%s: %d' % (collection, name, count))
+        return '\n'.join(lines)
+
+
+@contextmanager
+def capture_commands():
+    """
+    Captures the MongoDB commands issued inside the block, including those
+    of requests made with the test client.
+    """
+    if instrumentation.listener is None:
+        raise RuntimeError('Capturing commands requires pymongo >= 3.1.')
+    instrumentation.install()
+    recorder = instrumentation.start_recording()
+    try:
+        yield CapturedCommands(recorder)
+    finally:
+        instrumentation.stop_recording(recorder)
+
+
+class CommandCountError(AssertionError):
+    pass
+
+
+@contextmanager
+def _assert_num_commands(num, name=None, collection=None):
+    """
+    Asserts that exactly ``num`` commands (optionally filtered by command
+    ``name`` and ``collection``) are issued inside the block. Can be used as
+    decorator as well.
+    """
+    with capture_commands() as captured:
+        yield captured
+    executed = captured.count(name, collection)
+    if executed != num:
+        raise CommandCountError('%d commands executed, %d expected\n%s' % (
+            executed, num, captured.summary()))
+
+
+def _decorate(context_manager):
+    # contextmanager objects in Python 2 can't be used as decorators, so
+    # this adds the decorator interface
+    class ContextDecorator(object):
+        def __init__(self, *args, **kwargs):
+            self.args = args
+            self.kwargs = kwargs
+
+        def __enter__(self):
+            self._cm = context_manager(*self.args, **self.kwargs)
+            return self._cm.__enter__()
+
+        def __exit__(self, *exc_info):
+            return self._cm.__exit__(*exc_info)
+
+        def __call__(self, func):
+            @wraps(func)
+            def inner(*args, **kwargs):
+                with context_manager(*self.args, **self.kwargs):
+                    return func(*args, **kwargs)
+            return inner
+    ContextDecorator.__name__ = context_manager.__name__
+    ContextDecorator.__doc__ = context_manager.__doc__
+    return ContextDecorator
+
+assert_num_commands = _decorate(_assert_num_commands)
+
+
+class AdminCommandCountMixin(object):
+    """
+    A mixin for ``django.test.TestCase`` subclasses that pins the number of
+    commands the admin views of one document issue. Subclasses set
+    ``document`` and the expected counts and have to log in a superuser and
+    create ``self.object`` in setUp(). A count of None skips the view. If
+    ``command_collection`` is set only the commands sent to that collection
+    are counted, so sessions or content types stored in MongoDB don't
+    change the counts::
+
+        class ArticleAdminCommands(AdminCommandCountMixin, TestCase):
+            document = Article
+            changelist_commands = 3
+            change_commands = 2
+            ...
+    """
+    document = None
+    admin_site_name = 'admin'
+    object = None
+    command_collection = None
+
+    changelist_commands = None
+    change_commands = None
+    add_commands = None
+    delete_commands = None
+    delete_action_commands = None
+    delete_action_confirm_commands = None
+
+    def admin_url(self, view, *args):
+        from django.core.urlresolvers import reverse
+        opts = self.document._meta
+        return reverse('%s:%s_%s_%s' % (self.admin_site_name, opts.app_label,
+                                        opts.model_name, view), args=args)
+
+    def assertNumCommands(self, num, func, *args, **kwargs):
+        with assert_num_commands(num, collection=self.command_collection):
+            response = func(*args, **kwargs)
+            # template responses run their queries while rendering
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+    def _run(self, num, func, *args, **kwargs):
+        if num is None:
+            if hasattr(self, 'skipTest'):
+                self.skipTest('no command count defined')
+            return
+        response = self.assertNumCommands(num, func, *args, **kwargs)
+        self.assertTrue(response.status_code in (200, 302), response.status_code)
+
+    def test_changelist_commands(self):
+        self._run(self.changelist_commands, self.client.get,
+                  self.admin_url('changelist'))
+
+    def test_change_commands(self):
+        self._run(self.change_commands, self.client.get,
+                  self.admin_url('change', self.object.pk))
+
+    def test_add_commands(self):
+        self._run(self.add_commands, self.client.get, self.admin_url('add'))
+
+    def test_delete_commands(self):
+        self._run(self.delete_commands, self.client.get,
+                  self.admin_url('delete', self.object.pk))
+
+    def test_delete_action_commands(self):
+        from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+        self._run(self.delete_action_commands, self.client.post,
+                  self.admin_url('changelist'),
+                  {'action': 'delete_selected', 'index': 0,
+                   ACTION_CHECKBOX_NAME: [str(self.object.pk)]})
+
+    def test_delete_action_confirm_commands(self):
+        from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+        self._run(self.delete_action_confirm_commands, self.client.post,
+                  self.admin_url('changelist'),
+                  {'action': 'delete_selected', 'index': 0, 'post': 'yes',
+                   ACTION_CHECKBOX_NAME: [str(self.object.pk)]})
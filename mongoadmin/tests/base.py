@@ -0,0 +1,80 @@
+"""
+Helpers for the mongoadmin tests.
+
+Tests that need MongoDB connect to ``MONGOADMIN_TEST_HOST`` (setting or
+environment variable, default ``mongodb://localhost/mongoadmin_test``) and
+are skipped if it can't be reached. Run them with
+``python manage.py test mongoadmin`` from a project with mongoadmin,
+django.contrib.auth and django.contrib.sessions installed.
+"""
+import os
+from unittest import SkipTest
+
+from django.conf import settings
+from django.test import TestCase
+
+import mongoengine
+from mongoengine.connection import disconnect
+
+from mongoadmin import instrumentation
+
+DEFAULT_TEST_HOST = 'mongodb://localhost/mongoadmin_test'
+
+
+def test_host():
+    return getattr(settings, 'MONGOADMIN_TEST_HOST',
+                   os.environ.get('MONGOADMIN_TEST_HOST', DEFAULT_TEST_HOST))
+
+
+def connect(host=None):
+    """
+    Connects the default mongoengine alias to the test database or raises
+    SkipTest if it isn't reachable. The commands of the connection are
+    recorded by mongoadmin.instrumentation.
+    """
+    if instrumentation.monitoring is not None:
+        instrumentation.install()
+    disconnect()
+    try:
+        client = mongoengine.connect(host=host or test_host(), serverSelectionTimeoutMS=2000)
+        client.admin.command('ping')
+    except Exception as e:
+        disconnect()
+        raise SkipTest('MongoDB is not available: %s' % e)
+    return client
+
+
+class MongoTestCase(TestCase):
+    """
+    A TestCase connected to the test database. The collections of
+    ``documents`` are dropped after every test.
+    """
+    urls = 'mongoadmin.tests.urls'
+    documents = ()
+
+    @classmethod
+    def setUpClass(cls):
+        connect()
+        super(MongoTestCase, cls).setUpClass()
+
+    def tearDown(self):
+        for document in self.documents:
+            document.drop_collection()
+        super(MongoTestCase, self).tearDown()
+
+
+class AdminTestCase(MongoTestCase):
+    """
+    A MongoTestCase with a logged in superuser.
+    """
+    def setUp(self):
+        from django.contrib.auth.models import User
+        super(AdminTestCase, self).setUp()
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.assertTrue(self.client.login(username='admin', password='password'))
+
+    def admin_url(self, document, view, *args):
+        from django.core.urlresolvers import reverse
+        opts = document._meta
+        return reverse('mongoadmin_test:%s_%s_%s' % (opts.app_label, opts.model_name, view),
+                       args=args)
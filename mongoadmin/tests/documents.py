@@ -0,0 +1,37 @@
+"""
+Documents used by the tests.
+"""
+from mongoengine import Document, DynamicDocument, fields
+
+
+class Author(Document):
+    name = fields.StringField(max_length=100)
+    email = fields.StringField(max_length=100)
+
+    meta = {'collection': 'mongoadmin_test_author'}
+
+    def __unicode__(self):
+        return self.name
+
+    def __str__(self):
+        return self.name
+
+
+class Book(Document):
+    title = fields.StringField(max_length=100)
+    author = fields.ReferenceField(Author)
+    tags = fields.ListField(fields.StringField(max_length=20))
+
+    meta = {'collection': 'mongoadmin_test_book'}
+
+    def __unicode__(self):
+        return self.title
+
+    def __str__(self):
+        return self.title
+
+
+class Event(DynamicDocument):
+    name = fields.StringField(max_length=100)
+
+    meta = {'collection': 'mongoadmin_test_event'}
@@ -0,0 +1,146 @@
+from unittest import skipIf
+
+from django.test import RequestFactory
+
+from mongoengine import signals
+
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+from mongoadmin.tests.urls import AuthorAdmin, site
+
+try:
+    from mongoadmin import aio
+except (ImportError, SyntaxError):
+    # Python < 3.5
+    aio = None
+
+
+@skipIf(aio is None or aio.AsyncIOMotorClient is None, 'motor is not installed')
+class AsyncQueriesTest(AdminTestCase):
+    """
+    Runs the async queries against the test database.
+    """
+    documents = (Author,)
+
+    def setUp(self):
+        import asyncio
+        super(AsyncQueriesTest, self).setUp()
+        aio._clients.clear()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for i in range(3):
+            Author.objects.create(name='Author %d' % i, email='author%d@example.com' % i)
+
+    def tearDown(self):
+        aio._clients.clear()
+        self.loop.close()
+        super(AsyncQueriesTest, self).tearDown()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def get_model_admin(self, **options):
+        admin_class = type('AsyncAuthorAdmin', (aio.AsyncDocumentAdminMixin, AuthorAdmin), options)
+        return admin_class(Author, site)
+
+    def get_request(self, path='/', data=None):
+        from django.contrib.auth.models import User
+        request = RequestFactory().get(path, data or {})
+        request.user = User.objects.get(username='admin')
+        return request
+
+    def test_client_uses_connection_settings(self):
+        kwargs = aio.connection_kwargs()
+        self.assertEqual(kwargs['serverSelectionTimeoutMS'], 2000)
+        self.assertNotIn('name', kwargs)
+        self.assertEqual(self.run_async(aio.count(Author.objects)), 3)
+
+    def test_changelist_uses_async_page(self):
+        model_admin = self.get_model_admin(list_concurrent_queries=False, list_max_time_ms=1000)
+        cl = self.run_async(model_admin.achangelist(self.get_request()))
+        self.assertIsInstance(cl.result_list, list)
+        self.assertEqual(len(cl.result_list), 3)
+        self.assertEqual(cl.result_count, 3)
+
+    def test_changelist_show_all(self):
+        model_admin = self.get_model_admin(list_per_page=2, list_max_time_ms=1000)
+        cl = self.run_async(model_admin.achangelist(self.get_request(data={'all': ''})))
+        self.assertEqual(len(cl.result_list), 3)
+
+    def test_delete_sends_signals(self):
+        deleted = []
+
+        def receiver(sender, document, **kwargs):
+            deleted.append(document.pk)
+        signals.post_delete.connect(receiver, sender=Author)
+        try:
+            result = self.run_async(aio.delete(Author.objects(name='Author 0')))
+        finally:
+            signals.post_delete.disconnect(receiver, sender=Author)
+        self.assertEqual(result, 1)
+        self.assertEqual(len(deleted), 1)
+        self.assertEqual(Author.objects.count(), 2)
+
+    def test_delete_without_receivers(self):
+        self.assertEqual(self.run_async(aio.delete(Author.objects(name__ne='Author 0'))), 2)
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_changelist_is_built_in_executor(self):
+        import threading
+        threads = []
+
+        def has_change_permission(self, request, obj=None):
+            threads.append(threading.current_thread())
+            return True
+        model_admin = self.get_model_admin(has_change_permission=has_change_permission)
+        self.run_async(model_admin.achangelist(self.get_request()))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_changelist_url_is_routed_to_coroutine(self):
+        model_admin = self.get_model_admin()
+        name = 'mongoadmin_test_author_changelist'
+        pattern = [p for p in model_admin.get_urls() if getattr(p, 'name', None) == name][0]
+        self.assertEqual(pattern.callback.__wrapped__.__wrapped__, model_admin.achangelist_view)
+        model_admin = self.get_model_admin(async_views=False)
+        pattern = [p for p in model_admin.get_urls() if getattr(p, 'name', None) == name][0]
+        self.assertEqual(pattern.callback.__wrapped__, model_admin.changelist_view)
+
+    def test_changelist_view(self):
+        model_admin = self.get_model_admin(list_per_page=2)
+        response = aio.sync_view(model_admin.achangelist_view)(self.get_request())
+        cl = response.context_data['cl']
+        self.assertIsInstance(cl, aio.AsyncDocumentChangeList)
+        self.assertEqual(cl.result_count, 3)
+        self.assertEqual(len(cl.result_list), 2)
+        response.render()
+        self.assertContains(response, 'Author 0')
+
+    def delete_selected(self, **options):
+        logged = []
+
+        def log_deletion(self, request, object, object_repr):
+            logged.append(object_repr)
+        model_admin = self.get_model_admin(log_deletion=log_deletion, **options)
+        result = self.run_async(model_admin.adelete_selected(
+            self.get_request(), Author.objects(name__ne='Author 0')))
+        return model_admin, result, logged
+
+    def test_delete_selected_in_bulk(self):
+        model_admin, result, logged = self.delete_selected()
+        self.assertTrue(model_admin.can_bulk_delete())
+        self.assertEqual(result, 2)
+        self.assertEqual(sorted(logged), ['Author 1', 'Author 2'])
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_delete_selected_calls_delete_model(self):
+        deleted = []
+
+        def delete_model(self, request, obj):
+            deleted.append(obj.name)
+            obj.delete()
+        model_admin, result, logged = self.delete_selected(delete_model=delete_model)
+        self.assertFalse(model_admin.can_bulk_delete())
+        self.assertEqual(result, 2)
+        self.assertEqual(sorted(deleted), ['Author 1', 'Author 2'])
+        self.assertEqual(Author.objects.count(), 1)
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from mongoadmin import benchmark
+from mongoadmin.tests.base import MongoTestCase
+
+
+class PercentileTest(SimpleTestCase):
+    def test_percentile(self):
+        samples = [5, 1, 4, 2, 3]
+        self.assertEqual(benchmark.percentile(samples, 0), 1)
+        self.assertEqual(benchmark.percentile(samples, 50), 3)
+        self.assertEqual(benchmark.percentile(samples, 100), 5)
+        self.assertIsNone(benchmark.percentile([], 50))
+
+
+class MeasureTest(SimpleTestCase):
+    def test_returned_duration_is_used(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            return 0.002
+        result = benchmark.measure(func, 3)
+        self.assertEqual(result['samples'], 3)
+        self.assertEqual(result['min_ms'], 2)
+        self.assertEqual(result['max_ms'], 2)
+        self.assertEqual(result['p50_ms'], 2)
+        if benchmark.tracemalloc is None:
+            self.assertEqual(len(calls), 3)
+            self.assertIsNone(result['peak_memory_bytes'])
+        else:
+            # one more call measures the memory
+            self.assertEqual(len(calls), 4)
+            self.assertIsNotNone(result['peak_memory_bytes'])
+
+
+class DocumentShapeTest(SimpleTestCase):
+    def test_make_documents(self):
+        document, target = benchmark.make_documents(benchmark.Shape(width=4, depth=2))
+        self.assertEqual(len([f for f in document._fields if f.startswith('field_')]), 4)
+        self.assertEqual(document._fields['target'].document_type, target)
+        items = document._fields['items'].field.document_type
+        self.assertIn('children', items._fields)
+        children = items._fields['children'].field.document_type
+        self.assertNotIn('children', children._fields)
+
+
+class RunTest(MongoTestCase):
+    def test_run(self):
+        result = benchmark.run(benchmark.Shape(width=4, depth=1, list_length=2),
+                               count=30, repeat=2, delete_batch=3)
+        self.assertEqual(result['config']['documents'], 30)
+        self.assertEqual(set(result['results']), set([
+            'changelist.get_results', 'document_result_list', 'get_form',
+            'get_formset', 'delete_selected', 'ReferenceRawIdWidget.render']))
+        for stats in result['results'].values():
+            self.assertEqual(stats['samples'], 2)
+        # the generated collections are dropped again
+        document, target = benchmark.make_documents(benchmark.Shape(width=4, depth=1))
+        self.assertEqual(document.objects.count(), 0)
@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+
+from mongoengine import Document, fields
+
+from mongoadmin import DocumentAdmin
+from mongoadmin.checks import config_hash, validate_site
+from mongoadmin.sites import MongoAdminSite
+
+
+class LazyChecked(Document):
+    name = fields.StringField()
+
+
+class LazyCheckedAdmin(DocumentAdmin):
+    list_display = ('name',)
+
+
+class BrokenLazyChecked(Document):
+    name = fields.StringField()
+
+
+class BrokenLazyCheckedAdmin(DocumentAdmin):
+    list_display = ('missing',)
+
+
+class LazySiteCheckTest(SimpleTestCase):
+    def test_pending_admin_is_validated(self):
+        site = MongoAdminSite(lazy=True)
+        site.register(LazyChecked, LazyCheckedAdmin)
+        validations = validate_site(site, use_cache=False, processes=1)
+        self.assertEqual([v.errors for v in validations], [[]])
+        # validating doesn't instantiate the admin
+        self.assertEqual(site._registry.pending(), [LazyChecked])
+
+    def test_pending_admin_errors(self):
+        site = MongoAdminSite(lazy=True)
+        site.register(BrokenLazyChecked, BrokenLazyCheckedAdmin)
+        errors = validate_site(site, use_cache=False, processes=1)[0].errors
+        self.assertEqual(len(errors), 1)
+        self.assertFalse('failed' in errors[0], errors[0])
+
+
+class ConfigHashTest(SimpleTestCase):
+    def test_field_attributes_change_hash(self):
+        field = LazyChecked._fields['name']
+        before = config_hash(LazyCheckedAdmin, LazyChecked)
+        choices = field.choices
+        field.choices = ('a', 'b')
+        try:
+            self.assertNotEqual(config_hash(LazyCheckedAdmin, LazyChecked), before)
+        finally:
+            field.choices = choices
+        self.assertEqual(config_hash(LazyCheckedAdmin, LazyChecked), before)
+
+    def test_admin_options_change_hash(self):
+        changed = type('LazyCheckedAdmin', (LazyCheckedAdmin,), {'list_display': ('id',)})
+        self.assertNotEqual(config_hash(changed, LazyChecked),
+                            config_hash(LazyCheckedAdmin, LazyChecked))
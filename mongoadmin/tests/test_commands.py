@@ -0,0 +1,32 @@
+from mongoadmin.testing import AdminCommandCountMixin
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+
+
+class AuthorAdminCommandsTest(AdminCommandCountMixin, AdminTestCase):
+    """
+    Pins the commands the admin views of a document without references
+    send to its collection.
+    """
+    document = Author
+    documents = (Author,)
+    admin_site_name = 'mongoadmin_test'
+    command_collection = Author._get_collection_name()
+
+    # the count and the page fetch
+    changelist_commands = 2
+    # reading the object
+    change_commands = 1
+    add_commands = 0
+    # reading the object, the confirmation page only lists it
+    delete_commands = 1
+    # the changelist's count and page, then get_deleted_objects iterates the
+    # selection, tests it for emptiness and reads its first document
+    # (the counts are those of mongoengine 0.10)
+    delete_action_commands = 5
+    # the same plus deleting the object
+    delete_action_confirm_commands = 6
+
+    def setUp(self):
+        super(AuthorAdminCommandsTest, self).setUp()
+        self.object = Author.objects.create(name='Ann', email='ann@example.com')
@@ -0,0 +1,88 @@
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+
+from mongoengine import Document, fields
+
+from mongoadmin.contenttypes.utils import DocumentIndex, has_rel_db
+from mongoadmin.tests.base import MongoTestCase
+
+
+def make_document(name, module):
+    return type(name, (Document,), {
+        '__module__': module,
+        'name': fields.StringField(),
+        'meta': {'collection': 'mongoadmin_test_%s' % name.lower()},
+    })
+
+
+class DocumentIndexTest(SimpleTestCase):
+    def test_unique_name(self):
+        document = make_document('IndexedUnique', 'one.models')
+        index = DocumentIndex()
+        # the app label doesn't matter if only one document has the name
+        self.assertIs(index.get('other', 'indexedunique'), document)
+        self.assertIsNone(index.get('one', 'indexedmissing'))
+
+    def test_names_differing_in_case(self):
+        first = make_document('IndexedThing', 'one.models')
+        second = make_document('Indexedthing', 'two.models')
+        index = DocumentIndex()
+        self.assertIs(index.get('one', 'indexedthing'), first)
+        self.assertIs(index.get('two', 'indexedthing'), second)
+        self.assertIsNone(index.get('three', 'indexedthing'))
+
+    def test_new_documents_are_indexed(self):
+        index = DocumentIndex()
+        self.assertIsNone(index.get('one', 'indexedlater'))
+        document = make_document('IndexedLater', 'one.models')
+        self.assertIs(index.get('one', 'indexedlater'), document)
+
+
+@skipIf(has_rel_db(), 'Content types are stored in the relational database.')
+class ContentTypeCacheTest(MongoTestCase):
+    def setUp(self):
+        from mongoadmin.contenttypes.models import ContentType
+        super(ContentTypeCacheTest, self).setUp()
+        self.ContentType = ContentType
+        ContentType.objects.clear_cache()
+        ContentType.drop_collection()
+
+    def tearDown(self):
+        self.ContentType.objects.clear_cache()
+        self.ContentType.drop_collection()
+        super(ContentTypeCacheTest, self).tearDown()
+
+    def test_lookups_are_cached(self):
+        from mongoadmin.testing import capture_commands
+        from mongoadmin.tests.documents import Author
+
+        ct = self.ContentType.objects.get_for_model(Author)
+        with capture_commands() as commands:
+            self.assertEqual(self.ContentType.objects.get_for_model(Author).pk, ct.pk)
+            self.assertEqual(self.ContentType.objects.get_for_id(ct.pk).pk, ct.pk)
+            self.assertEqual(self.ContentType.objects.get_for_id(str(ct.pk)).pk, ct.pk)
+        self.assertEqual(len(commands), 0)
+
+    def test_preload(self):
+        from mongoadmin.testing import capture_commands
+        from mongoadmin.tests.documents import Author, Book
+
+        author = self.ContentType.objects.get_for_model(Author)
+        book = self.ContentType.objects.get_for_model(Book)
+        self.ContentType.objects.clear_cache()
+        with capture_commands() as commands:
+            self.ContentType.objects.preload()
+        self.assertEqual(commands.count('find'), 1)
+        with capture_commands() as commands:
+            self.ContentType.objects.get_for_id(author.pk)
+            self.ContentType.objects.get_for_id(book.pk)
+        self.assertEqual(len(commands), 0)
+
+    def test_saving_clears_cache(self):
+        from mongoadmin.tests.documents import Author
+
+        ct = self.ContentType.objects.get_for_model(Author)
+        ct.name = 'changed'
+        ct.save()
+        self.assertEqual(self.ContentType.objects.get_for_id(ct.pk).name, 'changed')
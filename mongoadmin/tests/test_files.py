@@ -0,0 +1,122 @@
+import datetime
+import io
+
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase
+
+from mongoadmin.files import csrf_precheck, parse_range, serve_file
+
+
+class FakeGridOut(io.BytesIO):
+    def __init__(self, data, filename='file.bin', content_type=None):
+        super(FakeGridOut, self).__init__(data)
+        self._id = 'abc'
+        self.filename = filename
+        self.content_type = content_type
+        self.length = len(data)
+        self.chunk_size = 4
+        self.upload_date = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+
+def content(response):
+    return b''.join(response.streaming_content)
+
+
+class ParseRangeTest(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-3', 10), (0, 3))
+        self.assertEqual(parse_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        # the end is capped at the size
+        self.assertEqual(parse_range('bytes=5-100', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=-100', 10), (0, 9))
+
+    def test_unusable(self):
+        self.assertIsNone(parse_range(None, 10))
+        self.assertIsNone(parse_range('bytes=-', 10))
+        self.assertIsNone(parse_range('bytes=0-1,3-4', 10))
+        self.assertIsNone(parse_range('items=0-1', 10))
+
+    def test_unsatisfiable(self):
+        self.assertIs(parse_range('bytes=10-', 10), False)
+        self.assertIs(parse_range('bytes=5-4', 10), False)
+        self.assertIs(parse_range('bytes=-0', 10), False)
+
+
+class ServeFileTest(SimpleTestCase):
+    data = b'0123456789'
+
+    def serve(self, attachment=True, filename='file.bin', content_type=None, **headers):
+        request = RequestFactory().get('/', **headers)
+        return serve_file(request, FakeGridOut(self.data, filename, content_type), attachment)
+
+    def test_whole_file(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content(response), self.data)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="file.bin"')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_range(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(content(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_stale_if_range_sends_everything(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content(response), self.data)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_not_modified(self):
+        etag = self.serve()['ETag']
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        last_modified = self.serve()['Last-Modified']
+        self.assertEqual(self.serve(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_inline_images_are_sandboxed(self):
+        response = self.serve(attachment=False, filename='a.png')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="a.png"')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+    def test_unsafe_types_are_attachments(self):
+        for filename, content_type in [('a.html', None), ('a.svg', None),
+                                       ('a.png', 'text/html; charset=utf-8')]:
+            response = self.serve(attachment=False, filename=filename,
+                                  content_type=content_type)
+            self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+            self.assertFalse(response.has_header('Content-Security-Policy'))
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+
+class CsrfPrecheckTest(SimpleTestCase):
+    def request(self, cookie='token', **extra):
+        request = RequestFactory().post('/', **extra)
+        if cookie is not None:
+            request.COOKIES[settings.CSRF_COOKIE_NAME] = cookie
+        return request
+
+    def test_cookie_is_required(self):
+        self.assertTrue(csrf_precheck(self.request()))
+        self.assertFalse(csrf_precheck(self.request(cookie=None)))
+
+    def test_header_must_match(self):
+        self.assertTrue(csrf_precheck(self.request(HTTP_X_CSRFTOKEN='token')))
+        self.assertFalse(csrf_precheck(self.request(HTTP_X_CSRFTOKEN='other')))
+
+    def test_https_referer(self):
+        secure = {'wsgi.url_scheme': 'https'}
+        self.assertFalse(csrf_precheck(self.request(**secure)))
+        self.assertFalse(csrf_precheck(self.request(HTTP_REFERER='https://evil.com/', **secure)))
+        self.assertTrue(csrf_precheck(self.request(HTTP_REFERER='https://testserver/admin/',
+                                                   **secure)))
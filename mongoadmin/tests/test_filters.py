@@ -0,0 +1,80 @@
+from django.contrib.admin import FieldListFilter
+from django.test import RequestFactory, SimpleTestCase
+
+from mongoadmin.filters import ReferenceFieldListFilter, reference_list_filter, referenced_ids
+from mongoadmin.testing import capture_commands
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author, Book
+from mongoadmin.tests.urls import BookAdmin, site
+from mongoadmin.views import DocumentChangeList
+
+
+class ReferenceListFilterTest(SimpleTestCase):
+    def test_references_get_the_filter(self):
+        list_filter = ['author', 'title', ('tags', FieldListFilter)]
+        self.assertEqual(reference_list_filter(Book, list_filter), [
+            ('author', ReferenceFieldListFilter), 'title', ('tags', FieldListFilter)])
+
+    def test_registry_is_untouched(self):
+        self.assertFalse(any(test(Book._fields['author'])
+                             for test, list_filter_class in FieldListFilter._field_list_filters
+                             if list_filter_class is ReferenceFieldListFilter))
+
+
+class ReferencedIdsTest(AdminTestCase):
+    documents = (Author, Book)
+
+    def setUp(self):
+        super(ReferencedIdsTest, self).setUp()
+        self.authors = [Author.objects.create(name='author %d' % i) for i in range(3)]
+        for author in self.authors:
+            Book.objects.create(title='book', author=author)
+            Book.objects.create(title='book', author=author)
+        Book.objects.create(title='anonymous')
+
+    def test_all_references(self):
+        ids, complete = referenced_ids(Book.objects, 'author', 10)
+        self.assertEqual(set(ids), set([a.pk for a in self.authors] + [None]))
+        self.assertTrue(complete)
+
+    def test_limits(self):
+        ids, complete = referenced_ids(Book.objects, 'author', 2)
+        self.assertEqual(len(ids), 2)
+        self.assertFalse(complete)
+
+        # only the first documents (in natural order) are grouped
+        ids, complete = referenced_ids(Book.objects, 'author', 10, max_scanned=2)
+        self.assertEqual(ids, [self.authors[0].pk])
+        self.assertFalse(complete)
+        ids, complete = referenced_ids(Book.objects, 'author', 10, max_scanned=100)
+        self.assertTrue(complete)
+
+    def get_changelist(self, data=None):
+        from django.contrib.auth.models import User
+        request = RequestFactory().get('/', data or {})
+        request.user = User.objects.get(username='admin')
+        model_admin = BookAdmin(Book, site)
+        return DocumentChangeList(
+            request, Book, model_admin.list_display, model_admin.list_display_links,
+            model_admin.list_filter, model_admin.date_hierarchy, model_admin.search_fields,
+            model_admin.list_select_related, model_admin.list_per_page,
+            model_admin.list_max_show_all, model_admin.list_editable, model_admin)
+
+    def test_changelist_uses_reference_filter(self):
+        cl = self.get_changelist()
+        spec, = cl.filter_specs
+        self.assertIsInstance(spec, ReferenceFieldListFilter)
+        self.assertEqual(cl.list_filter, BookAdmin.list_filter)
+        with capture_commands() as commands:
+            choices = list(spec.choices(cl))
+        # All, three authors and None
+        self.assertEqual(len(choices), 5)
+        self.assertEqual(commands.count('aggregate'), 1)
+        self.assertFalse(spec.search_choices_url)
+
+    def test_truncated_scan_offers_search(self):
+        cl = self.get_changelist()
+        spec, = cl.filter_specs
+        spec.max_scanned = 2
+        list(spec.choices(cl))
+        self.assertTrue(spec.search_choices_url)
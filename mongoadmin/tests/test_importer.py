@@ -0,0 +1,79 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase
+
+from mongodbforms.documents import documentform_factory
+
+from mongoadmin.importer import DocumentImporter, read_csv, read_jsonl
+from mongoadmin.tests.base import MongoTestCase
+from mongoadmin.tests.documents import Author
+
+
+class ReaderTest(SimpleTestCase):
+    def test_csv(self):
+        f = BytesIO(b'\xef\xbb\xbfname,email\nAnn,ann@example.com\nBob,\n')
+        self.assertEqual([(dict(data), error) for data, error in read_csv(f)], [
+            ({'name': 'Ann', 'email': 'ann@example.com'}, None),
+            ({'name': 'Bob', 'email': ''}, None),
+        ])
+
+    def test_jsonl(self):
+        f = BytesIO(b'{"name": "Ann"}\n\n[1]\n{broken\n{"name": "Bob"}\n')
+        rows = list(read_jsonl(f))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], ({'name': 'Ann'}, None))
+        self.assertIsNone(rows[1][0])
+        self.assertIsNone(rows[2][0])
+        self.assertEqual(rows[3], ({'name': 'Bob'}, None))
+
+    def test_rows_are_read_lazily(self):
+        rows = read_jsonl(iter([b'{"name": "Ann"}\n', b'not read\n']))
+        self.assertEqual(next(rows), ({'name': 'Ann'}, None))
+
+
+class DocumentImporterTest(MongoTestCase):
+    documents = (Author,)
+
+    def get_importer(self, **kwargs):
+        form_class = documentform_factory(Author, fields=['name', 'email'])
+        return DocumentImporter(Author, form_class, **kwargs)
+
+    def test_insert_in_batches(self):
+        importer = self.get_importer(batch_size=2)
+        writes = []
+        write = importer.write
+
+        def counting_write(batch):
+            writes.append(len(batch))
+            write(batch)
+        importer.write = counting_write
+        rows = [({'name': 'Author %d' % i, 'email': ''}, None) for i in range(5)]
+        result = importer.run(rows)
+        self.assertEqual(writes, [2, 2, 1])
+        self.assertEqual((result.rows, result.inserted, result.failed), (5, 5, 0))
+        self.assertEqual(Author.objects.count(), 5)
+
+    def test_invalid_rows_are_reported(self):
+        rows = [
+            ({'name': 'Ann'}, None),
+            ({'name': 'x' * 101}, None),
+            (None, ['Invalid JSON']),
+        ]
+        result = self.get_importer().run(rows)
+        self.assertEqual((result.rows, result.inserted, result.failed), (3, 1, 2))
+        self.assertEqual([row_number for row_number, messages in result.errors], [2, 3])
+
+    def test_upsert_by_id_fields(self):
+        Author.objects.create(name='Ann', email='old@example.com')
+        rows = [({'name': 'Ann', 'email': 'new@example.com'}, None),
+                ({'name': 'Bob', 'email': 'bob@example.com'}, None)]
+        result = self.get_importer(id_fields=['name']).run(rows)
+        self.assertEqual((result.inserted, result.updated), (1, 1))
+        self.assertEqual(Author.objects.get(name='Ann').email, 'new@example.com')
+
+    def test_errors_are_capped(self):
+        rows = [({'name': 'x' * 101}, None)] * 5
+        result = self.get_importer(max_errors=2).run(rows)
+        self.assertEqual(result.failed, 5)
+        self.assertEqual(len(result.errors), 2)
+        self.assertTrue(result.errors_truncated)
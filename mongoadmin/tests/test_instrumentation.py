@@ -0,0 +1,35 @@
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+
+from mongoadmin import instrumentation
+
+
+class CommandEvent(object):
+    connection_id = ('localhost', 27017)
+    request_id = 1
+    command_name = 'find'
+    command = {'find': 'author'}
+    duration_micros = 2000
+    reply = {'cursor': {'firstBatch': [{'name': 'Ann'}, {'name': 'Bob'}], 'id': 0}, 'ok': 1}
+
+
+@skipIf(instrumentation.listener is None, 'pymongo has no command monitoring')
+class ListenerTest(SimpleTestCase):
+    def record(self, measure_bytes):
+        recorder = instrumentation.start_recording(measure_bytes)
+        try:
+            with instrumentation.instrument('Author.changelist'):
+                instrumentation.listener.started(CommandEvent())
+                instrumentation.listener.succeeded(CommandEvent())
+        finally:
+            instrumentation.stop_recording(recorder)
+        return recorder
+
+    def test_reply_size_is_not_measured_by_default(self):
+        total = self.record(False).total
+        self.assertEqual((total.count, total.documents, total.bytes), (1, 2, 0))
+        self.assertEqual(total.duration_ms, 2)
+
+    def test_reply_size(self):
+        self.assertTrue(self.record(True).total.bytes > 0)
@@ -0,0 +1,101 @@
+from unittest import SkipTest
+
+from django.test import RequestFactory, SimpleTestCase
+
+from mongoengine.connection import get_connection
+
+from mongoadmin.live import LiveChangeList, StreamSlots
+from mongoadmin.rows import RowsChangeList
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+from mongoadmin.tests.urls import AuthorAdmin, site
+
+
+class LiveAuthorAdmin(AuthorAdmin):
+    list_live = True
+    # a single node replica set has no secondary, so reading from one fails
+    read_preferences = {'changelist': 'secondary'}
+
+
+class StreamSlotsTest(SimpleTestCase):
+    def test_limits(self):
+        slots = StreamSlots()
+        self.assertTrue(slots.acquire('a', 3, 2))
+        self.assertTrue(slots.acquire('a', 3, 2))
+        # the user limit
+        self.assertFalse(slots.acquire('a', 3, 2))
+        self.assertTrue(slots.acquire('b', 3, 2))
+        # the process limit
+        self.assertFalse(slots.acquire('c', 3, 2))
+        slots.release('a')
+        self.assertTrue(slots.acquire('c', 3, 2))
+        self.assertTrue(slots.acquire('d', None, None))
+
+    def test_close_releases_once(self):
+        released = []
+        live = LiveChangeList(None, release=lambda: released.append(1))
+        live.close()
+        live.close()
+        self.assertEqual(released, [1])
+
+
+class LiveChangeListTest(AdminTestCase):
+    """
+    Needs a replica set, a single node one is enough
+    (``mongod --replSet rs0`` and ``rs.initiate()``).
+    """
+    documents = (Author,)
+
+    def setUp(self):
+        super(LiveChangeListTest, self).setUp()
+        if not get_connection().admin.command('ismaster').get('setName'):
+            raise SkipTest('Change streams need a replica set.')
+        self.model_admin = LiveAuthorAdmin(Author, site)
+
+    def get_changelist(self, data=None):
+        from django.contrib.auth.models import User
+        request = RequestFactory().get('/', data or {})
+        request.user = User.objects.get(username='admin')
+        model_admin = self.model_admin
+        return RowsChangeList(request, Author, model_admin.list_display,
+                              model_admin.list_display_links, model_admin.list_filter,
+                              model_admin.date_hierarchy, model_admin.search_fields,
+                              model_admin.list_select_related, model_admin.list_per_page,
+                              model_admin.list_max_show_all, model_admin.list_editable,
+                              model_admin)
+
+    def get_live(self, data=None):
+        return LiveChangeList(self.get_changelist(data), heartbeat=1, max_duration=10)
+
+    def test_newest_first(self):
+        self.assertTrue(self.get_changelist().newest_first())
+        self.assertFalse(self.get_changelist({'o': '1'}).newest_first())
+        self.assertFalse(self.get_changelist({'p': '1'}).newest_first())
+
+    def test_update_is_read_from_primary(self):
+        author = Author.objects.create(name='Ann', email='a@example.com')
+        live = self.get_live({'q': 'Ann'})
+        change = {'operationType': 'update', 'documentKey': {'_id': author.pk}}
+        name, data = live.change_event(change)
+        self.assertEqual(name, 'update')
+        self.assertIn('Ann', data['html'])
+
+        Author.objects(pk=author.pk).update(set__name='Bob')
+        name, data = live.change_event(change)
+        self.assertEqual(name, 'delete')
+
+    def test_stream(self):
+        events = iter(self.get_live({'q': 'Ann'}))
+        self.assertTrue(next(events).startswith('retry:'))
+        # opens the change stream
+        next(events)
+        Author.objects.create(name='Bob', email='bob@example.com')
+        author = Author.objects.create(name='Ann', email='a@example.com')
+        Author.objects(pk=author.pk).update(set__name='Bob')
+        received = []
+        for message in events:
+            if message.startswith('id:') and 'event:' in message:
+                received.append(message.split('event: ')[1].split('\n')[0])
+            if len(received) == 2:
+                break
+        self.assertEqual(received, ['insert', 'delete'])
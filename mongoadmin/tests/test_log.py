@@ -0,0 +1,68 @@
+from django.test.utils import override_settings
+
+from mongoadmin import log
+from mongoadmin.testing import capture_commands
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+
+
+@override_settings(MONGOADMIN_ACTION_LOG='mongo')
+class MongoLogTest(AdminTestCase):
+    documents = (Author, log.MongoLogEntry)
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        super(MongoLogTest, self).setUp()
+        self.user = User.objects.get(username='admin')
+        self.author = Author.objects.create(name='Ann', email='a@example.com')
+
+    def test_change_is_logged(self):
+        response = self.client.post(self.admin_url(Author, 'change', self.author.pk),
+                                    {'name': 'Bob', 'email': 'a@example.com'})
+        self.assertEqual(response.status_code, 302)
+        entry = log.MongoLogEntry.objects.get()
+        self.assertTrue(entry.is_change())
+        self.assertEqual(entry.object_id, str(self.author.pk))
+        self.assertEqual(entry.object_repr, 'Bob')
+        self.assertEqual(entry.user.get_username(), 'admin')
+
+    def test_history_view(self):
+        log.log_action(self.user, self.author, log.ADDITION)
+        log.log_action(self.user, self.author, log.CHANGE, 'Changed name.')
+        other = Author.objects.create(name='Other')
+        log.log_action(self.user, other, log.CHANGE)
+
+        response = self.client.get(self.admin_url(Author, 'history', self.author.pk))
+        self.assertEqual(response.status_code, 200)
+        actions = response.context['action_list']
+        self.assertEqual([a.action_flag for a in actions], [log.ADDITION, log.CHANGE])
+        self.assertContains(response, 'Changed name.')
+        self.assertContains(response, 'admin')
+
+    def test_history_of_missing_object(self):
+        response = self.client.get(self.admin_url(Author, 'history', 'missing'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_batched(self):
+        with capture_commands() as commands:
+            with log.batched():
+                for i in range(3):
+                    log.log_action(self.user, self.author, log.CHANGE)
+                self.assertEqual(log.MongoLogEntry.objects.count(), 0)
+        self.assertEqual(commands.count('insert', log.MongoLogEntry._get_collection_name()), 1)
+        self.assertEqual(log.MongoLogEntry.objects.count(), 3)
+
+    def test_batched_flushes_on_error(self):
+        try:
+            with log.batched():
+                log.log_action(self.user, self.author, log.DELETION)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(log.MongoLogEntry.objects.count(), 1)
+        self.assertIsNone(log._pending())
+
+    def test_recent_actions(self):
+        log.log_action(self.user, self.author, log.ADDITION)
+        self.assertEqual(len(log.recent_actions(self.user.pk)), 1)
+        self.assertEqual(log.recent_actions('nobody'), [])
@@ -0,0 +1,103 @@
+from unittest import skipIf
+
+from mongoengine import signals
+from mongoengine.django.auth import ContentType, Permission, User
+
+from mongoadmin.auth import backends
+from mongoadmin.auth.backends import MongoPermissionBackend, Group
+from mongoadmin.testing import capture_commands
+from mongoadmin.tests.base import MongoTestCase
+
+has_groups = Group is not None and 'groups' in User._fields
+
+
+class PermissionBackendTest(MongoTestCase):
+    documents = (User, Permission, ContentType) + ((Group,) if Group is not None else ())
+
+    def setUp(self):
+        super(PermissionBackendTest, self).setUp()
+        backends._get_cache().clear()
+        self.backend = MongoPermissionBackend()
+        ct = ContentType(app_label='tests', model='author', name='author').save()
+        self.change = Permission(name='Can change author', content_type=ct,
+                                 codename='change_author').save()
+        self.delete = Permission(name='Can delete author', content_type=ct,
+                                 codename='delete_author').save()
+        self.user = User(username='user', is_active=True,
+                         user_permissions=[self.change]).save()
+
+    def tearDown(self):
+        backends._get_cache().clear()
+        super(PermissionBackendTest, self).tearDown()
+
+    def get_user(self):
+        # a fresh object, as the permissions are also kept on the user
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permissions_are_loaded_once(self):
+        permission_collection = Permission._get_collection_name()
+        user = self.get_user()
+        with capture_commands() as commands:
+            self.assertTrue(self.backend.has_perm(user, 'tests.change_author'))
+            self.assertFalse(self.backend.has_perm(user, 'tests.delete_author'))
+            self.assertTrue(self.backend.has_module_perms(user, 'tests'))
+        self.assertEqual(commands.count('find', permission_collection), 1)
+
+        # later requests read the set from the cache
+        with capture_commands() as commands:
+            self.assertTrue(self.backend.has_perm(self.get_user(), 'tests.change_author'))
+        self.assertEqual(commands.count(collection=permission_collection), 0)
+
+    def test_inactive_user(self):
+        user = self.get_user()
+        user.is_active = False
+        self.assertFalse(self.backend.has_perm(user, 'tests.change_author'))
+        self.assertEqual(self.backend.get_all_permissions(user), set())
+
+    @skipIf(not has_groups, 'mongoengine has no groups')
+    def test_group_permissions_are_loaded_with_user_permissions(self):
+        group = Group(name='editors', permissions=[self.delete]).save()
+        self.user.groups = [group]
+        self.user.save()
+        user = self.get_user()
+        with capture_commands() as commands:
+            self.assertEqual(self.backend.get_group_permissions(user),
+                             set(['tests.delete_author']))
+            self.assertEqual(self.backend.get_all_permissions(user),
+                             set(['tests.change_author', 'tests.delete_author']))
+        self.assertEqual(commands.count('find', Permission._get_collection_name()), 1)
+
+    @skipIf(not signals.signals_available, 'mongoengine signals need blinker')
+    def test_saving_user_invalidates_cache(self):
+        self.assertTrue(self.backend.has_perm(self.get_user(), 'tests.change_author'))
+        self.user.user_permissions = [self.delete]
+        self.user.save()
+        user = self.get_user()
+        self.assertFalse(self.backend.has_perm(user, 'tests.change_author'))
+        self.assertTrue(self.backend.has_perm(user, 'tests.delete_author'))
+
+    @skipIf(not signals.signals_available, 'mongoengine signals need blinker')
+    def test_changing_permission_invalidates_all(self):
+        version = backends.get_version()
+        self.assertTrue(self.backend.has_perm(self.get_user(), 'tests.change_author'))
+        self.change.codename = 'edit_author'
+        self.change.save()
+        self.assertEqual(backends.get_version(), version + 1)
+        self.assertTrue(self.backend.has_perm(self.get_user(), 'tests.edit_author'))
+
+    def test_version(self):
+        cache = backends._get_cache()
+        # saving the permissions in setUp has bumped it
+        cache.clear()
+        self.assertEqual(backends.get_version(), 1)
+        backends.invalidate_all()
+        self.assertEqual(backends.get_version(), 2)
+        # a version that is gone is added again before it is bumped
+        cache.delete(backends.VERSION_KEY)
+        backends.invalidate_all()
+        self.assertEqual(backends.get_version(), 2)
+
+    def test_cache_timeout(self):
+        expected = (backends.CACHE_TIMEOUT if signals.signals_available
+                    else backends.NO_SIGNALS_CACHE_TIMEOUT)
+        self.assertEqual(backends.cache_timeout(), expected)
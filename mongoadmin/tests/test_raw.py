@@ -0,0 +1,68 @@
+import json
+
+from django.test import SimpleTestCase
+
+from mongoadmin.raw import InvalidPath, parse_path, path_expression
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Book
+
+
+class ParsePathTest(SimpleTestCase):
+    def test_empty(self):
+        self.assertEqual(parse_path(None), [])
+        self.assertEqual(parse_path(''), [])
+        self.assertEqual(parse_path('[]'), [])
+
+    def test_keys_and_indexes(self):
+        self.assertEqual(parse_path('["items", 3, "address"]'), ['items', 3, 'address'])
+        self.assertEqual(parse_path('["0"]'), ['0'])
+
+    def test_invalid(self):
+        for path in ('items', '{"a": 1}', '"items"', '[-1]', '[true]', '[1.5]', '[null]',
+                     '[["a"]]', '[""]', '["a.b"]', '["$where"]'):
+            self.assertRaises(InvalidPath, parse_path, path)
+
+
+class PathExpressionTest(SimpleTestCase):
+    def test_root(self):
+        self.assertEqual(path_expression([]), '$$ROOT')
+
+    def test_keys(self):
+        self.assertEqual(path_expression(['a', 'b']), '$$ROOT.a.b')
+        # numeric keys of subdocuments stay field names
+        self.assertEqual(path_expression(['a', '0']), '$$ROOT.a.0')
+
+    def test_indexes(self):
+        self.assertEqual(path_expression(['items', 3]),
+                         {'$arrayElemAt': ['$$ROOT.items', 3]})
+        self.assertEqual(path_expression([0, 1]),
+                         {'$arrayElemAt': [{'$arrayElemAt': ['$$ROOT', 0]}, 1]})
+
+    def test_key_after_index(self):
+        self.assertEqual(path_expression(['items', 3, 'address', 'city']), {'$let': {
+            'vars': {'node': {'$arrayElemAt': ['$$ROOT.items', 3]}},
+            'in': '$$node.address.city',
+        }})
+
+
+class RawNodeViewTest(AdminTestCase):
+    documents = (Book,)
+
+    def setUp(self):
+        super(RawNodeViewTest, self).setUp()
+        self.book = Book.objects.create(title='Book', tags=['a', 'b'])
+
+    def get_node(self, path):
+        return self.client.get(self.admin_url(Book, 'raw_node', self.book.pk),
+                               {'path': json.dumps(path)})
+
+    def test_array(self):
+        response = self.get_node(['tags'])
+        self.assertEqual(response.status_code, 200)
+        node = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([child['value'] for child in node['children']], ['a', 'b'])
+
+    def test_path_not_matching_document(self):
+        # indexes into a string and an ObjectId
+        self.assertEqual(self.get_node(['title', 0]).status_code, 400)
+        self.assertEqual(self.get_node(['_id', 0]).status_code, 400)
@@ -0,0 +1,82 @@
+from django.test import RequestFactory, SimpleTestCase
+
+from mongoadmin.rows import RowsChangeList, decode_cursor, encode_cursor, keyset_filter
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+from mongoadmin.tests.urls import AuthorAdmin, site
+
+
+class KeysetFilterTest(SimpleTestCase):
+    def test_ascending(self):
+        self.assertEqual(keyset_filter([('name', 1), ('_id', 1)], ['b', 5]), {'$or': [
+            {'name': {'$gt': 'b'}},
+            {'name': 'b', '_id': {'$gt': 5}},
+        ]})
+
+    def test_descending_includes_nulls(self):
+        self.assertEqual(keyset_filter([('name', -1), ('_id', -1)], ['b', 5]), {'$or': [
+            {'$or': [{'name': {'$lt': 'b'}}, {'name': None}]},
+            {'name': 'b', '$or': [{'_id': {'$lt': 5}}, {'_id': None}]},
+        ]})
+
+    def test_null_value(self):
+        self.assertEqual(keyset_filter([('name', 1), ('_id', 1)], [None, 5]), {'$or': [
+            {'name': {'$ne': None}},
+            {'name': None, '_id': {'$gt': 5}},
+        ]})
+        # nothing follows null in descending order but the tie-break
+        self.assertEqual(keyset_filter([('name', -1), ('_id', -1)], [None, 5]), {'$or': [
+            {'name': None, '$or': [{'_id': {'$lt': 5}}, {'_id': None}]},
+        ]})
+
+    def test_cursor(self):
+        self.assertEqual(decode_cursor(encode_cursor(['a', None, 3])), ['a', None, 3])
+
+
+class RowsTest(AdminTestCase):
+    documents = (Author,)
+
+    def setUp(self):
+        super(RowsTest, self).setUp()
+        Author.objects.create(name='b', email='b@example.com')
+        Author.objects.create(name='a', email='a@example.com')
+        # a null and a missing name
+        Author._get_collection().insert_one({'name': None, 'email': 'null@example.com'})
+        Author._get_collection().insert_one({'email': 'missing@example.com'})
+
+    def get_changelist(self, data=None):
+        from django.contrib.auth.models import User
+        request = RequestFactory().get('/', data or {})
+        request.user = User.objects.get(username='admin')
+        model_admin = AuthorAdmin(Author, site)
+        return request, RowsChangeList(
+            request, Author, model_admin.list_display, model_admin.list_display_links,
+            model_admin.list_filter, model_admin.date_hierarchy, model_admin.search_fields,
+            model_admin.list_select_related, model_admin.list_per_page,
+            model_admin.list_max_show_all, model_admin.list_editable, model_admin)
+
+    def scroll(self, data):
+        request, cl = self.get_changelist(data)
+        emails = []
+        cursor = None
+        while True:
+            rows, cursor = cl.get_rows(request, cursor, limit=1)
+            emails.extend(row['cells'][1] for row in rows)
+            if cursor is None:
+                return emails
+
+    def test_descending_with_nulls(self):
+        emails = self.scroll({'o': '-1'})
+        self.assertEqual(emails[:2], ['b@example.com', 'a@example.com'])
+        self.assertEqual(sorted(emails[2:]), ['missing@example.com', 'null@example.com'])
+
+    def test_ascending_with_nulls(self):
+        emails = self.scroll({'o': '1'})
+        self.assertEqual(sorted(emails[:2]), ['missing@example.com', 'null@example.com'])
+        self.assertEqual(emails[2:], ['a@example.com', 'b@example.com'])
+
+    def test_only_displayed_fields_are_loaded(self):
+        request, cl = self.get_changelist({'o': '-1'})
+        self.assertEqual(cl.get_only_fields(), ['email', 'id', 'name'])
+        cl.list_display = ('name', str)
+        self.assertIsNone(cl.get_only_fields())
@@ -0,0 +1,53 @@
+from django.test import RequestFactory
+
+from mongoadmin.schema import infer_schema, clear_schema
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Event
+
+
+class DynamicFieldsTest(AdminTestCase):
+    documents = (Event,)
+
+    def setUp(self):
+        super(DynamicFieldsTest, self).setUp()
+        clear_schema(Event)
+        collection = Event._get_collection()
+        collection.insert_many([
+            {'name': 'a', 'o': 'first', 'flag': True},
+            {'name': 'b', 'o': 'second', 'flag': 1},
+            {'name': 'c', 'o': 'second', 'flag': 1},
+        ])
+
+    def tearDown(self):
+        clear_schema(Event)
+        super(DynamicFieldsTest, self).tearDown()
+
+    def test_values_are_counted_by_type(self):
+        schema = infer_schema(Event)
+        flag = [field for field in schema.fields if field.name == 'flag'][0]
+        self.assertEqual(flag.types, {'bool': 1, 'int': 2})
+        self.assertEqual(len(flag.values), 2)
+        self.assertIs(flag.values[1], True)
+
+    def test_filter_parameter_is_prefixed(self):
+        url = self.admin_url(Event, 'changelist')
+        response = self.client.get(url, {'dyn__o': 'second'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        # 'o' is still the ordering of the changelist
+        response = self.client.get(url, {'o': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_filters_are_not_accumulated(self):
+        from django.contrib.auth.models import User
+        response = self.client.get(self.admin_url(Event, 'changelist'))
+        cl = response.context['cl']
+        list_filter = list(cl.list_filter)
+        filter_specs = len(cl.filter_specs)
+        request = RequestFactory().get(self.admin_url(Event, 'changelist'))
+        request.user = User.objects.get(username='admin')
+        # the actions get the queryset again
+        cl.get_queryset(request)
+        self.assertEqual(list(cl.list_filter), list_filter)
+        self.assertEqual(len(cl.filter_specs), filter_specs)
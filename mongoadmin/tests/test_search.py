@@ -0,0 +1,83 @@
+from django.test import SimpleTestCase
+
+from pymongo import ReadPreference
+
+from mongoadmin.search import DocumentSearch, _get_cache, search_lookup, split_reference_path
+from mongoadmin.testing import capture_commands
+from mongoadmin.tests.base import MongoTestCase
+from mongoadmin.tests.documents import Author, Book
+
+
+def queryset_for(document):
+    return document.objects
+
+
+class SearchLookupTest(SimpleTestCase):
+    def test_lookups(self):
+        self.assertEqual(search_lookup('name'), ('name', 'icontains'))
+        self.assertEqual(search_lookup('^name'), ('name', 'istartswith'))
+        self.assertEqual(search_lookup('=name'), ('name', 'iexact'))
+        self.assertEqual(search_lookup('@name'), ('name', 'icontains'))
+        self.assertEqual(search_lookup('^name', case_sensitive=True), ('name', 'startswith'))
+
+    def test_split_reference_path(self):
+        self.assertEqual(split_reference_path(Book, 'author__email'),
+                         ('author', Author, 'email'))
+        self.assertIsNone(split_reference_path(Book, 'title'))
+        self.assertIsNone(split_reference_path(Book, 'author'))
+        self.assertIsNone(split_reference_path(Book, 'tags__name'))
+
+
+class DocumentSearchTest(MongoTestCase):
+    documents = (Author, Book)
+
+    def setUp(self):
+        super(DocumentSearchTest, self).setUp()
+        _get_cache().clear()
+        self.authors = [Author.objects.create(name='author %d' % i, email='%d@example.com' % i)
+                        for i in range(3)]
+        for author in self.authors:
+            Book.objects.create(title='book', author=author)
+
+    def tearDown(self):
+        _get_cache().clear()
+        super(DocumentSearchTest, self).tearDown()
+
+    def search(self, term, **kwargs):
+        search = DocumentSearch(['title', 'author__email'], queryset_for, **kwargs)
+        return search, Book.objects.filter(search.q(Book, term))
+
+    def test_reference_search(self):
+        search, books = self.search('1@example')
+        self.assertEqual([b.author.pk for b in books], [self.authors[1].pk])
+        self.assertEqual(search.truncated, [])
+
+    def test_truncated(self):
+        search, books = self.search('example.com', limit=2)
+        self.assertEqual(search.truncated, [Author])
+        self.assertEqual(books.count(), 2)
+        search, books = self.search('example.com', limit=3)
+        self.assertEqual(search.truncated, [])
+
+    def test_ids_are_cached(self):
+        author_collection = Author._get_collection_name()
+        self.search('example.com')
+        with capture_commands() as commands:
+            self.search('example.com')
+        self.assertEqual(commands.count('find', author_collection), 0)
+        with capture_commands() as commands:
+            self.search('example.com', cache_timeout=0)
+        self.assertEqual(commands.count('find', author_collection), 1)
+
+    def test_cache_key(self):
+        search = DocumentSearch([], queryset_for)
+        key = search.cache_key(Author, Author.objects.filter(name='a'))
+        self.assertEqual(key, search.cache_key(Author, Author.objects.filter(name='a')))
+        self.assertNotEqual(key, search.cache_key(Author, Author.objects.filter(name='b')))
+        self.assertNotEqual(key, search.cache_key(Book, Book.objects.filter(title='a')))
+        self.assertNotEqual(key, DocumentSearch([], queryset_for, limit=5).cache_key(
+            Author, Author.objects.filter(name='a')))
+        self.assertNotEqual(key, DocumentSearch([], queryset_for, case_sensitive=True).cache_key(
+            Author, Author.objects.filter(name='a')))
+        self.assertNotEqual(key, search.cache_key(
+            Author, Author.objects.filter(name='a').read_preference(ReadPreference.SECONDARY)))
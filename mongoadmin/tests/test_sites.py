@@ -0,0 +1,55 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from mongoadmin import DocumentAdmin
+from mongoadmin.sites import LazyRegistry, MongoAdminSite
+from mongoadmin.tests.documents import Author, Book
+
+
+class CountingAdmin(DocumentAdmin):
+    instances = 0
+
+    def __init__(self, model, admin_site):
+        # widen the window in which other threads could instantiate it too
+        time.sleep(0.05)
+        type(self).instances += 1
+        super(CountingAdmin, self).__init__(model, admin_site)
+
+
+class LazySiteTest(SimpleTestCase):
+    def setUp(self):
+        self.admin_class = type('AuthorAdmin', (CountingAdmin,), {'instances': 0})
+        self.site = MongoAdminSite(name='lazy_test', lazy=True)
+        self.site.register(Author, self.admin_class)
+        self.site.register(Book)
+
+    def test_register_defers_instantiation(self):
+        self.assertIsInstance(self.site._registry, LazyRegistry)
+        self.assertEqual(self.admin_class.instances, 0)
+        self.assertEqual(set(self.site._registry.pending()), set([Author, Book]))
+
+        model_admin = self.site._registry[Author]
+        self.assertIsInstance(model_admin, self.admin_class)
+        self.assertIs(self.site._registry.get(Author), model_admin)
+        self.assertEqual(self.admin_class.instances, 1)
+        self.assertEqual(self.site._registry.pending(), [Book])
+
+    def test_warm_up(self):
+        self.site.warm_up()
+        self.assertEqual(self.site._registry.pending(), [])
+        self.assertEqual(self.admin_class.instances, 1)
+
+    def test_concurrent_access_instantiates_once(self):
+        instances = []
+
+        def resolve():
+            instances.append(self.site._registry[Author])
+        threads = [threading.Thread(target=resolve) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.admin_class.instances, 1)
+        self.assertEqual(len(set(id(instance) for instance in instances)), 1)
@@ -0,0 +1,112 @@
+from io import BytesIO
+from unittest import skipIf
+
+from bson import ObjectId
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from mongoengine import Document, fields
+
+from mongoadmin import thumbnails
+from mongoadmin.testing import capture_commands
+from mongoadmin.tests.base import MongoTestCase
+from mongoadmin.thumbnails import (Image, delete_document_thumbnails, delete_thumbnails,
+                                   get_bucket, get_thumbnail, make_thumbnail, parse_grid_id,
+                                   thumbnail, thumbnail_url)
+
+
+class Picture(Document):
+    image = fields.ImageField(collection_name='mongoadmin_test_images')
+
+    meta = {'collection': 'mongoadmin_test_picture'}
+
+
+def image_data(format='PNG', size=(400, 200), mode='RGB'):
+    data = BytesIO()
+    Image.new(mode, size).save(data, format)
+    data.seek(0)
+    return data
+
+
+@skipIf(Image is None, 'PIL is not installed')
+class MakeThumbnailTest(SimpleTestCase):
+    def test_png(self):
+        data, content_type = make_thumbnail(image_data('PNG'), (80, 80))
+        self.assertEqual(content_type, 'image/png')
+        # the aspect ratio is kept
+        self.assertEqual(Image.open(BytesIO(data)).size, (80, 40))
+
+    def test_jpeg(self):
+        data, content_type = make_thumbnail(image_data('JPEG', mode='L'), (80, 80))
+        self.assertEqual(content_type, 'image/jpeg')
+        self.assertEqual(Image.open(BytesIO(data)).mode, 'RGB')
+
+    def test_small_images_are_not_enlarged(self):
+        data, content_type = make_thumbnail(image_data('PNG', size=(20, 10)), (80, 80))
+        self.assertEqual(Image.open(BytesIO(data)).size, (20, 10))
+
+    def test_parse_grid_id(self):
+        grid_id = ObjectId()
+        self.assertEqual(parse_grid_id(str(grid_id)), grid_id)
+        self.assertIsNone(parse_grid_id('nope'))
+
+
+@skipIf(Image is None, 'PIL is not installed')
+@override_settings(MONGOADMIN_THUMBNAIL_BUCKET='mongoadmin_test_thumbs')
+class ThumbnailStorageTest(MongoTestCase):
+    documents = (Picture,)
+
+    def setUp(self):
+        super(ThumbnailStorageTest, self).setUp()
+        self.field = Picture._fields['image']
+        self.picture = Picture()
+        self.picture.image.put(image_data())
+        self.picture.save()
+
+    def tearDown(self):
+        db = Picture._get_db()
+        for name in ('mongoadmin_test_images', 'mongoadmin_test_thumbs'):
+            db.drop_collection(name + '.files')
+            db.drop_collection(name + '.chunks')
+        thumbnails._indexed.clear()
+        super(ThumbnailStorageTest, self).tearDown()
+
+    def thumbs(self):
+        return get_bucket(self.field).find().count()
+
+    def test_thumbnail_is_stored_once(self):
+        grid_out = self.picture.image.get()
+        thumb = get_thumbnail(self.field, grid_out, '80x80')
+        self.assertEqual(thumb.content_type, 'image/png')
+        self.assertEqual(thumb.size, '80x80')
+        with capture_commands() as commands:
+            self.assertEqual(get_thumbnail(self.field, grid_out, '80x80')._id, thumb._id)
+        self.assertEqual(commands.count('insert'), 0)
+        get_thumbnail(self.field, grid_out, '200x200')
+        self.assertEqual(self.thumbs(), 2)
+
+    def test_size_must_be_allowed(self):
+        with self.assertRaises(ValueError):
+            get_thumbnail(self.field, self.picture.image.get(), '81x81')
+        self.assertEqual(self.thumbs(), 0)
+
+    def test_delete_thumbnails(self):
+        grid_out = self.picture.image.get()
+        get_thumbnail(self.field, grid_out, '80x80')
+        other = Picture()
+        other.image.put(image_data())
+        other.save()
+        get_thumbnail(self.field, other.image.get(), '80x80')
+
+        delete_thumbnails(self.field, grid_out._id)
+        self.assertEqual(self.thumbs(), 1)
+        delete_document_thumbnails(other)
+        self.assertEqual(self.thumbs(), 0)
+
+    def test_thumbnail_url(self):
+        self.assertIsNone(thumbnail_url(Picture(), 'image'))
+        # Picture isn't registered with an admin site
+        self.assertIsNone(thumbnail_url(self.picture, 'image', admin_site_name='mongoadmin_test'))
+        column = thumbnail('image')
+        self.assertEqual(column.__name__, 'image_thumbnail')
+        self.assertEqual(column(Picture()), '')
@@ -0,0 +1,189 @@
+import threading
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase
+
+from mongoadmin.tests.base import AdminTestCase
+from mongoadmin.tests.documents import Author
+from mongoadmin.tests.urls import AuthorAdmin
+from mongoadmin.views import DocumentChangeList, ExecutionTimeout, get_query_pool
+
+
+class CountingPaginator(Paginator):
+    counted = None
+
+    def set_count(self, count, estimated):
+        self.counted = (count, estimated)
+        self._count = count
+
+
+class PaginatorCountTest(SimpleTestCase):
+    def setUp(self):
+        # set_paginator_count doesn't depend on the state of the changelist
+        self.cl = DocumentChangeList.__new__(DocumentChangeList)
+
+    def test_count_is_set(self):
+        paginator = Paginator(object(), 10)
+        self.cl.set_paginator_count(paginator, 25, estimated=True)
+        self.assertEqual(paginator.count, 25)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertTrue(paginator.estimated)
+
+    def test_set_count_hook(self):
+        paginator = CountingPaginator(object(), 10)
+        self.cl.set_paginator_count(paginator, 5)
+        self.assertEqual(paginator.counted, (5, False))
+        self.assertEqual(paginator.count, 5)
+
+
+class ChangeListPaginatorTest(AdminTestCase):
+    documents = (Author,)
+
+    def setUp(self):
+        super(ChangeListPaginatorTest, self).setUp()
+        AuthorAdmin.paginator = CountingPaginator
+        for i in range(3):
+            Author.objects.create(name='Author %d' % i)
+
+    def tearDown(self):
+        del AuthorAdmin.paginator
+        super(ChangeListPaginatorTest, self).tearDown()
+
+    def test_admin_paginator_is_used(self):
+        response = self.client.get(self.admin_url(Author, 'changelist'))
+        cl = response.context['cl']
+        self.assertIsInstance(cl.paginator, CountingPaginator)
+        self.assertEqual(cl.paginator.counted, (3, False))
+        self.assertTrue(cl.can_show_all)
+
+
+class QueryOptions(object):
+    def __init__(self, list_concurrent_queries):
+        self.list_concurrent_queries = list_concurrent_queries
+
+
+class RunQueriesTest(SimpleTestCase):
+    def get_changelist(self, concurrent):
+        cl = DocumentChangeList.__new__(DocumentChangeList)
+        cl.model_admin = QueryOptions(concurrent)
+        return cl
+
+    def test_serial(self):
+        threads = []
+
+        def query():
+            threads.append(threading.current_thread())
+            return 1
+
+        def timeout():
+            raise ExecutionTimeout('too slow')
+        results = self.get_changelist(False).run_queries({'a': query, 'b': query, 'c': timeout})
+        self.assertEqual((results['a'], results['b']), (1, 1))
+        self.assertIsInstance(results['c'], ExecutionTimeout)
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+    def test_concurrent(self):
+        started = threading.Event()
+
+        def first():
+            # only returns in time if the other query runs at the same time
+            return started.wait(5)
+
+        def second():
+            started.set()
+            return threading.current_thread()
+        results = self.get_changelist(True).run_queries({'first': first, 'second': second})
+        self.assertTrue(results['first'])
+
+    def test_busy_pool_runs_in_request_thread(self):
+        pool, slots = get_query_pool()
+        acquired = 0
+        while slots.acquire(False):
+            acquired += 1
+        try:
+            query = lambda: threading.current_thread()
+            results = self.get_changelist(True).run_queries({'a': query, 'b': query, 'c': query})
+        finally:
+            for i in range(acquired):
+                slots.release()
+        self.assertEqual(set(results.values()), set([threading.current_thread()]))
+
+    def test_slots_are_released(self):
+        pool, slots = get_query_pool()
+
+        def timeout():
+            raise ExecutionTimeout('too slow')
+        for i in range(10):
+            results = self.get_changelist(True).run_queries({'a': lambda: 1, 'b': timeout})
+            self.assertIsInstance(results['b'], ExecutionTimeout)
+        acquired = 0
+        while slots.acquire(False):
+            acquired += 1
+        for i in range(acquired):
+            slots.release()
+        self.assertEqual(acquired, getattr(settings, 'MONGOADMIN_QUERY_THREADS', 4))
+
+
+class ConcurrentChangeListTest(AdminTestCase):
+    documents = (Author,)
+
+    def setUp(self):
+        super(ConcurrentChangeListTest, self).setUp()
+        AuthorAdmin.list_concurrent_queries = True
+        for i in range(3):
+            Author.objects.create(name='Author %d' % i)
+
+    def tearDown(self):
+        del AuthorAdmin.list_concurrent_queries
+        super(ConcurrentChangeListTest, self).tearDown()
+
+    def test_changelist(self):
+        response = self.client.get(self.admin_url(Author, 'changelist'), {'q': 'Author'})
+        cl = response.context['cl']
+        self.assertEqual(cl.result_count, 3)
+        self.assertEqual(len(cl.result_list), 3)
+
+
+class ShowAllStreamTest(AdminTestCase):
+    documents = (Author,)
+    options = {'list_per_page': 2, 'list_max_show_all': 10, 'list_stream_batch_size': 2}
+
+    def setUp(self):
+        super(ShowAllStreamTest, self).setUp()
+        for name, value in self.options.items():
+            setattr(AuthorAdmin, name, value)
+        for i in range(5):
+            Author.objects.create(name='Author %d' % i)
+
+    def tearDown(self):
+        for name in self.options:
+            delattr(AuthorAdmin, name)
+        super(ShowAllStreamTest, self).tearDown()
+
+    def get_show_all(self):
+        return self.client.get(self.admin_url(Author, 'changelist'), {'all': ''})
+
+    def test_rows_are_streamed(self):
+        response = self.get_show_all()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        for i in range(5):
+            self.assertIn('Author %d' % i, content)
+        self.assertIn('</html>', content)
+
+    def test_single_page_is_not_streamed(self):
+        AuthorAdmin.list_per_page = 10
+        response = self.get_show_all()
+        self.assertFalse(response.streaming)
+        self.assertFalse(response.context['cl'].stream_results)
+
+    def test_streaming_disabled(self):
+        AuthorAdmin.list_stream_show_all = False
+        try:
+            response = self.get_show_all()
+        finally:
+            del AuthorAdmin.list_stream_show_all
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.context['cl'].result_list), 5)
@@ -0,0 +1,30 @@
+from django.conf.urls import patterns, include, url
+
+from mongoadmin import DocumentAdmin
+from mongoadmin.sites import MongoAdminSite
+from mongoadmin.tests.documents import Author, Book, Event
+
+
+class AuthorAdmin(DocumentAdmin):
+    list_display = ('name', 'email')
+    search_fields = ('name', 'email')
+
+
+class BookAdmin(DocumentAdmin):
+    list_display = ('title', 'author')
+    list_filter = ('author',)
+    search_fields = ('title', 'author__email')
+
+
+class EventAdmin(DocumentAdmin):
+    infer_dynamic_fields = True
+
+
+site = MongoAdminSite(name='mongoadmin_test', lazy=False)
+site.register(Author, AuthorAdmin)
+site.register(Book, BookAdmin)
+site.register(Event, EventAdmin)
+
+urlpatterns = patterns('',
+    url(r'^admin/', include(site.urls)),
+)
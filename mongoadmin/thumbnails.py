@@ -0,0 +1,150 @@
+"""
+Thumbnails of the images in ImageFields.
+
+Thumbnails are generated on the first request and stored in a separate
+GridFS bucket (``MONGOADMIN_THUMBNAIL_BUCKET``, default
+``mongoadmin_thumbs``) keyed by the id of the original file and the size.
+As GridFS files never change, their URLs contain the file id and can be
+cached by browsers for a long time. Only the sizes in
+``MONGOADMIN_THUMBNAIL_SIZES`` (default ``('80x80', '200x200')``) are
+generated.
+"""
+import re
+from io import BytesIO
+
+import gridfs
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from django.conf import settings
+from django.contrib.admin.util import quote
+from django.core.urlresolvers import reverse, NoReverseMatch
+from django.utils.html import format_html
+
+from mongoengine.connection import get_db
+from mongoengine.fields import ImageField
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+    LANCZOS = None
+else:
+    # Image.Resampling exists since Pillow 9.1, PIL only has ANTIALIAS
+    LANCZOS = getattr(getattr(Image, 'Resampling', Image), 'LANCZOS', None) or Image.ANTIALIAS
+
+SIZE_RE = re.compile(r'^(\d+)x(\d+)$')
+
+_indexed = set()
+
+
+def allowed_sizes():
+    return getattr(settings, 'MONGOADMIN_THUMBNAIL_SIZES', ('80x80', '200x200'))
+
+
+def get_bucket(field):
+    """
+    Returns the GridFS instance for the thumbnails of ``field`` (in the same
+    database as its files).
+    """
+    db = get_db(field.db_alias)
+    name = getattr(settings, 'MONGOADMIN_THUMBNAIL_BUCKET', 'mongoadmin_thumbs')
+    if (db.name, name) not in _indexed:
+        db[name + '.files'].create_index([('source', 1), ('size', 1)])
+        _indexed.add((db.name, name))
+    return gridfs.GridFS(db, name)
+
+
+def make_thumbnail(grid_out, size):
+    """
+    Returns ``(data, content type)`` of a thumbnail of ``grid_out`` that fits
+    into ``size``, a ``(width, height)`` tuple.
+    """
+    image = Image.open(grid_out)
+    image.thumbnail(size, LANCZOS)
+    data = BytesIO()
+    if image.format in ('PNG', 'GIF') or image.mode in ('RGBA', 'LA', 'P'):
+        image.save(data, 'PNG', optimize=True)
+        return data.getvalue(), 'image/png'
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(data, 'JPEG', quality=85)
+    return data.getvalue(), 'image/jpeg'
+
+
+def get_thumbnail(field, grid_out, size):
+    """
+    Returns the GridOut of the thumbnail of ``grid_out`` in ``size``
+    (``'80x80'``), generating it if it doesn't exist yet.
+    """
+    if Image is None:
+        raise RuntimeError('Thumbnails require PIL or Pillow.')
+    match = SIZE_RE.match(size)
+    if match is None or size not in allowed_sizes():
+        raise ValueError('Thumbnail size %s is not allowed.' % size)
+    bucket = get_bucket(field)
+    thumb = bucket.find_one({'source': grid_out._id, 'size': size})
+    if thumb is None:
+        data, content_type = make_thumbnail(
+            grid_out, (int(match.group(1)), int(match.group(2))))
+        bucket.put(data, source=grid_out._id, size=size, content_type=content_type,
+                   filename='%s_%s' % (grid_out._id, size))
+        thumb = bucket.find_one({'source': grid_out._id, 'size': size})
+    return thumb
+
+
+def delete_thumbnails(field, grid_id):
+    """
+    Deletes all thumbnails of the file ``grid_id``.
+    """
+    bucket = get_bucket(field)
+    for thumb in bucket.find({'source': grid_id}):
+        bucket.delete(thumb._id)
+
+
+def delete_document_thumbnails(obj):
+    """
+    Deletes the thumbnails of the images in the ImageFields of ``obj``.
+    """
+    for name, field in obj._fields.items():
+        if isinstance(field, ImageField):
+            grid_id = getattr(obj._data.get(name), 'grid_id', None)
+            if grid_id is not None:
+                delete_thumbnails(field, grid_id)
+
+
+def thumbnail_url(obj, field_name, size='80x80', admin_site_name='admin'):
+    proxy = getattr(obj, field_name, None)
+    if proxy is None or not getattr(proxy, 'grid_id', None) or obj.pk is None:
+        return None
+    opts = obj._meta
+    try:
+        return reverse('%s:%s_%s_thumbnail' % (admin_site_name, opts.app_label, opts.model_name),
+                       args=(quote(obj.pk), field_name, str(proxy.grid_id), size))
+    except NoReverseMatch:
+        return None
+
+
+def thumbnail(field_name, size='80x80', admin_site_name='admin', short_description=None):
+    """
+    Returns a ``list_display`` column that shows the thumbnail of the image
+    in ``field_name``::
+
+        list_display = ('title', thumbnail('cover'))
+    """
+    def column(obj):
+        url = thumbnail_url(obj, field_name, size, admin_site_name)
+        if url is None:
+            return ''
+        return format_html('<img src="{0}" alt="" />', url)
+    column.allow_tags = True
+    column.short_description = short_description or field_name.replace('_', ' ')
+    column.__name__ = str('%s_thumbnail' % field_name)
+    return column
+
+
+def parse_grid_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
@@ -14,12 +14,18 @@ except ImportError:
 from django.forms.forms import pretty_name
 from django.db.models.fields import FieldDoesNotExist
 from django.utils import formats
+from django.utils import six
 
 from mongoengine import fields
 
 from mongodbforms.util import init_document_options
 import collections
 
+try:
+    from pymongo import read_preferences
+except ImportError:
+    read_preferences = None
+
 class RelationWrapper(object):
     """
     Wraps a document referenced from a ReferenceField with an Interface similiar to
@@ -43,6 +49,37 @@ def is_django_user_model(user):
         return False
     return True
 
+READ_PREFERENCE_MODES = {
+    'primary': 'Primary',
+    'primaryPreferred': 'PrimaryPreferred',
+    'secondary': 'Secondary',
+    'secondaryPreferred': 'SecondaryPreferred',
+    'nearest': 'Nearest',
+}
+
+def make_read_preference(mode, max_staleness=None):
+    """
+    Returns a pymongo read preference for a mode name like
+    'secondaryPreferred'. Read preference objects are returned unchanged.
+    max_staleness (in seconds) requires pymongo >= 3.4 and is ignored for
+    the primary.
+    """
+    if mode is None or not isinstance(mode, six.string_types):
+        return mode
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError("Unknown read preference '%s'." % mode)
+    klass = getattr(read_preferences, READ_PREFERENCE_MODES[mode], None)
+    if klass is None:
+        # pymongo 2 only has the ReadPreference constants
+        from pymongo import ReadPreference
+        constant = ''.join('_' + c if c.isupper() else c.upper() for c in mode)
+        return getattr(ReadPreference, constant)
+    if mode == 'primary':
+        return klass()
+    if max_staleness is not None:
+        return klass(max_staleness=max_staleness)
+    return klass()
+        
 def label_for_field(name, model, model_admin=None, return_attr=False):
     attr = None
     model._meta = init_document_options(model)
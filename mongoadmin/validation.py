@@ -6,6 +6,7 @@ from django.contrib.admin.validation import (check_type, check_isseq, check_isdi
                                              get_field, BaseValidator)
 
 from mongoengine import ListField, ReferenceField, DateTimeField
+from mongoengine.base import BaseDocument
 
 from mongodbforms import BaseDocumentForm, BaseDocumentFormSet
 
@@ -15,7 +16,7 @@ classmethod in the end if it is provided in cls. The signature of the
 custom validation classmethod should be: def validate(cls, model).
 """
 
-__all__ = ['MongoBaseValidator', 'MongoInlineValidator']
+__all__ = ['MongoBaseValidator', 'DocumentAdminValidator', 'MongoInlineValidator']
 
 
 class MongoBaseValidator(BaseValidator):
@@ -298,6 +299,29 @@ class ModelAdminValidator(BaseValidator):
                         % cls.__name__)
 
 
+class DocumentAdminValidator(MongoBaseValidator, ModelAdminValidator):
+    def validate_inlines(self, cls, model):
+        " Validate inline model admin classes. "
+        from django.contrib.admin.options import BaseModelAdmin
+        if hasattr(cls, 'inlines'):
+            check_isseq(cls, 'inlines', cls.inlines)
+            for idx, inline in enumerate(cls.inlines):
+                if not issubclass(inline, BaseModelAdmin):
+                    raise ImproperlyConfigured("'%s.inlines[%d]' does not inherit "
+                            "from BaseModelAdmin." % (cls.__name__, idx))
+                if not inline.model:
+                    raise ImproperlyConfigured("'model' is a required attribute "
+                            "of '%s.inlines[%d]'." % (cls.__name__, idx))
+                if not issubclass(inline.model, (models.Model, BaseDocument)):
+                    raise ImproperlyConfigured("'%s.inlines[%d].model' is neither "
+                            "a model nor a document." % (cls.__name__, idx))
+                if issubclass(inline.model, BaseDocument):
+                    MongoInlineValidator().validate(inline, inline.model)
+                else:
+                    inline.validate(inline.model)
+                self.check_inline(inline, model)
+
+
 class MongoInlineValidator(MongoBaseValidator):
     def validate_fk_name(self, cls, model):
         " Validate that fk_name refers to a ForeignKey. "
@@ -1,11 +1,68 @@
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
 from django.core.exceptions import SuspiciousOperation, ImproperlyConfigured
 from django.contrib.admin.views.main import ChangeList, ORDER_VAR
 from django.contrib.admin.options import IncorrectLookupParameters
 from django.core.paginator import InvalidPage
+from django.contrib import messages
+from django.template.loader import render_to_string
+from django.utils.translation import ugettext as _
+
+from mongoadmin import instrumentation
+from mongoadmin.filters import reference_list_filter
+
+try:
+    from pymongo.errors import ExecutionTimeout
+except ImportError:
+    # pymongo < 2.7 can't set time limits
+    class ExecutionTimeout(Exception):
+        pass
+
+
+_query_pool = None
+_query_slots = None
+_query_pool_lock = threading.Lock()
+
+
+def get_query_pool():
+    """
+    Returns the thread pool for concurrent changelist queries and a
+    semaphore with a slot for each of its threads. It has
+    MONGOADMIN_QUERY_THREADS (default 4) threads, which share the connection
+    pool of the mongo client.
+    """
+    global _query_pool, _query_slots
+    if _query_pool is None:
+        with _query_pool_lock:
+            if _query_pool is None:
+                threads = getattr(settings, 'MONGOADMIN_QUERY_THREADS', 4)
+                _query_slots = threading.BoundedSemaphore(threads)
+                _query_pool = ThreadPool(threads)
+    return _query_pool, _query_slots
 
 
 class DocumentChangeList(ChangeList):
+    def get_filters(self, request):
+        # Django 1.6 has no ModelAdmin.get_list_filter, so the filters for
+        # the inferred fields of DynamicDocuments and the filter class of
+        # ReferenceFields are added here, only for this call as get_queryset
+        # runs more than once for actions.
+        dynamic_filters = self.model_admin.get_dynamic_list_filter(request) or []
+        list_filter = self.list_filter
+        self.list_filter = reference_list_filter(self.model, list(list_filter) + dynamic_filters)
+        try:
+            return super(DocumentChangeList, self).get_filters(request)
+        finally:
+            self.list_filter = list_filter
+
     def get_queryset(self, request):
+        # The counts and the page are read-only, so they may be read from a
+        # secondary. The queryset itself is also handed to the actions, so
+        # it stays on the primary (see read_queryset).
+        self.read_preference = self.model_admin.get_read_preference(request, 'changelist')
+
         # First, we collect all the declared list filters.
         (self.filter_specs, self.has_filters, remaining_lookup_params,
          filters_use_distinct) = self.get_filters(request)
@@ -39,6 +96,7 @@ class DocumentChangeList(ChangeList):
         # Set ordering.
         ordering = self.get_ordering(request, qs)
         qs = qs.order_by(*ordering)
+        self.queryset_ordering = ordering
 
         # Apply search results
         qs, search_use_distinct = self.model_admin.get_search_results(
@@ -94,31 +152,208 @@ class DocumentChangeList(ChangeList):
 
         return ordering
 
+    def newest_first(self):
+        """
+        Returns whether this is the first page of the changelist ordered by
+        descending primary key, where new documents appear at the top.
+        """
+        if self.page_num != 0 or not self.queryset_ordering:
+            return False
+        pk_name = self.lookup_opts.pk.name
+        return self.queryset_ordering[0] in ('-pk', '-_id', '-' + pk_name)
+
+    def read_queryset(self, queryset):
+        """
+        Returns ``queryset`` with the read preference of the changelist, for
+        queries that only display documents.
+        """
+        if self.read_preference is not None:
+            queryset = queryset.read_preference(self.read_preference)
+        return queryset
+
+    def get_time_budgets(self):
+        """
+        Returns the ``(count, page fetch)`` time budgets in milliseconds. While
+        searching, the search budget of the admin is used for both.
+        """
+        model_admin = self.model_admin
+        if self.query and model_admin.search_max_time_ms:
+            return model_admin.search_max_time_ms, model_admin.search_max_time_ms
+        return model_admin.count_max_time_ms, model_admin.list_max_time_ms
+
+    def with_time_budget(self, queryset, max_time_ms):
+        if max_time_ms:
+            return queryset.max_time_ms(max_time_ms)
+        return queryset
+
+    def run_queries(self, queries):
+        """
+        Runs the callables in the ``queries`` dict and returns a dict with
+        their results. A query exceeding its time budget returns the
+        ExecutionTimeout instead of raising it. If the admin enables
+        ``list_concurrent_queries`` the queries run concurrently: one in the
+        thread of the request and the others on the query thread pool. A
+        query only goes to the pool if one of its threads is free, otherwise
+        it runs in the thread of the request too, so requests don't queue
+        behind each other when the pool is busy.
+        """
+        def run(query):
+            try:
+                return query()
+            except ExecutionTimeout as e:
+                return e
+
+        if not self.model_admin.list_concurrent_queries or len(queries) < 2:
+            return dict((name, run(query)) for name, query in queries.items())
+
+        def run_in_slot(query):
+            try:
+                return run(query)
+            finally:
+                slots.release()
+
+        pool, slots = get_query_pool()
+        names = list(queries)
+        pending = {}
+        serial = [names[0]]
+        for name in names[1:]:
+            if slots.acquire(False):
+                pending[name] = pool.apply_async(instrumentation.bind(run_in_slot),
+                                                 (queries[name],))
+            else:
+                serial.append(name)
+        results = dict((name, run(queries[name])) for name in serial)
+        results.update((name, result.get()) for name, result in pending.items())
+        return results
+
+    def prefetch_page(self):
+        """
+        Returns whether the page is fetched together with the counts
+        instead of after them.
+        """
+        return self.model_admin.list_concurrent_queries and not self.show_all
+
+    def load_results(self, result_list):
+        """
+        Evaluates the query of ``result_list`` now, so a timeout doesn't
+        happen while the template is rendered.
+        """
+        try:
+            return list(result_list)
+        except ExecutionTimeout:
+            self.results_unavailable = True
+            return []
+
+    def set_paginator_count(self, paginator, count, estimated=False):
+        """
+        Hands the count of the results, which has already been determined, to
+        the paginator of ``ModelAdmin.get_paginator``, so it doesn't count
+        them again. ``estimated`` marks a count that is only a lower bound
+        because counting took too long.
+
+        Paginators with a ``set_count(count, estimated)`` method are handed
+        the count through it, others get Django's cached count set.
+        """
+        if hasattr(paginator, 'set_count'):
+            paginator.set_count(count, estimated)
+        else:
+            paginator._count = count
+            paginator.estimated = estimated
+
     def get_results(self, request):
-        paginator = self.model_admin.get_paginator(
-            request, self.queryset, self.list_per_page)
-        # Get the number of objects, with admin filters applied.
-        result_count = paginator.count
+        count_budget, fetch_budget = self.get_time_budgets()
+        queryset = self.with_time_budget(self.read_queryset(self.queryset), fetch_budget)
+        offset = self.page_num * self.list_per_page
+        self.count_unavailable = False
+        self.results_unavailable = False
+        result_list = None
 
+        # The page is fetched with one more object than shown, so we know if
+        # there is a next page even if counting fails.
+        fetch_page = lambda: list(queryset.skip(offset).limit(self.list_per_page + 1))
+        queries = {
+            # Get the number of objects, with admin filters applied.
+            'count': lambda: self.with_time_budget(
+                self.read_queryset(self.queryset), count_budget).count(),
+        }
         # Get the total number of objects, with no admin filters applied.
         # Perform a slight optimization:
         # full_result_count is equal to paginator.count if no filters
         # were applied
         if self.get_filters_params():
-            full_result_count = self.root_queryset.count()
-        else:
+            queries['full_count'] = lambda: self.with_time_budget(
+                self.read_queryset(self.root_queryset), count_budget).count()
+        if self.prefetch_page():
+            queries['page'] = fetch_page
+        results = self.run_queries(queries)
+        page = results.get('page')
+
+        result_count = results['count']
+        if isinstance(result_count, ExecutionTimeout):
+            # Counting took too long. Estimate the count from the page.
+            self.count_unavailable = True
+            if page is None:
+                page = self.run_queries({'page': fetch_page})['page']
+            if isinstance(page, ExecutionTimeout):
+                self.results_unavailable = True
+                page = []
+            result_count = offset + len(page)
+            result_list = page[:self.list_per_page]
+        paginator = self.model_admin.get_paginator(request, queryset, self.list_per_page)
+        self.set_paginator_count(paginator, result_count, self.count_unavailable)
+
+        full_result_count = results.get('full_count', result_count)
+        if self.count_unavailable or isinstance(full_result_count, ExecutionTimeout):
+            # the templates hide the total if both counts are equal
             full_result_count = result_count
-        can_show_all = result_count <= self.list_max_show_all
+        # an estimated count can't tell whether all results fit on a page
+        can_show_all = (not self.count_unavailable and
+                        result_count <= self.list_max_show_all)
         multi_page = result_count > self.list_per_page
 
+        # Show all pages is rendered row by row instead of all at once, so
+        # the documents don't have to fit into memory together.
+        self.stream_results = bool(self.show_all and can_show_all and multi_page and
+                                   not self.list_editable and
+                                   self.model_admin.list_stream_show_all)
+
         # Get the list of objects to display on this page.
-        if (self.show_all and can_show_all) or not multi_page:
-            result_list = self.queryset.clone()
-        else:
-            try:
-                result_list = paginator.page(self.page_num + 1).object_list
-            except InvalidPage:
-                raise IncorrectLookupParameters
+        if result_list is None:
+            if isinstance(page, ExecutionTimeout):
+                self.results_unavailable = True
+                result_list = []
+            elif (self.show_all and can_show_all) or not multi_page:
+                if page is not None and offset == 0:
+                    result_list = page
+                elif self.stream_results:
+                    result_list = queryset.clone().no_cache().batch_size(
+                        self.model_admin.list_stream_batch_size)
+                else:
+                    result_list = queryset.clone()
+            else:
+                try:
+                    paginator.validate_number(self.page_num + 1)
+                except InvalidPage:
+                    raise IncorrectLookupParameters
+                if page is not None:
+                    result_list = page[:self.list_per_page]
+                else:
+                    result_list = paginator.page(self.page_num + 1).object_list
+            if fetch_budget and not isinstance(result_list, list) and not self.stream_results:
+                result_list = self.load_results(result_list)
+
+        if self.results_unavailable:
+            if self.query:
+                msg = _("The search took too long. Please use a more specific "
+                        "search term or narrow the results with filters.")
+            else:
+                msg = _("Loading the results took too long. Please narrow "
+                        "them with filters.")
+            self.model_admin.message_user(request, msg, messages.WARNING)
+        elif self.count_unavailable:
+            self.model_admin.message_user(request, _(
+                "Counting the results took too long, the count is unavailable."),
+                messages.WARNING)
 
         self.result_count = result_count
         self.full_result_count = full_result_count
@@ -126,3 +361,40 @@ class DocumentChangeList(ChangeList):
         self.can_show_all = can_show_all
         self.multi_page = multi_page
         self.paginator = paginator
+
+    def stream_rows(self):
+        """
+        Yields the rendered table rows of the results in batches of
+        ``list_stream_batch_size`` rows.
+        """
+        from mongoadmin.templatetags.documenttags import result_rows
+
+        batch_size = self.model_admin.list_stream_batch_size
+        offset = 0
+        batch = []
+        iterator = iter(self.result_list)
+        while True:
+            try:
+                obj = next(iterator)
+            except StopIteration:
+                break
+            except ExecutionTimeout:
+                yield render_to_string('admin/mongo_change_list_rows.html', {
+                    'error': _("Loading the results took too long. Please narrow "
+                               "them with filters."),
+                    'colspan': len(self.list_display),
+                })
+                return
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                yield self._render_rows(result_rows(self, batch), offset)
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield self._render_rows(result_rows(self, batch), offset)
+
+    def _render_rows(self, rows, offset):
+        return render_to_string('admin/mongo_change_list_rows.html', {
+            'results': list(rows),
+            'offset': offset,
+        })
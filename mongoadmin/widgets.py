@@ -1,14 +1,23 @@
-from django.contrib.admin.widgets import ForeignKeyRawIdWidget, ManyToManyRawIdWidget
-from django.utils.html import escape
+from django.contrib.admin.util import quote
+from django.contrib.admin.widgets import (ForeignKeyRawIdWidget, ManyToManyRawIdWidget,
+                                         AdminFileWidget)
+from django.core.urlresolvers import reverse, NoReverseMatch
+from django.utils.html import escape, format_html
 from django.utils.text import Truncator
 
 from bson.dbref import DBRef
 
+from mongoadmin.instrumentation import instrument
+
 class ReferenceRawIdWidget(ForeignKeyRawIdWidget):
     """
     A Widget for displaying ReferenceFields in the "raw_id" interface rather than
     in a <select> box.
     """
+    def __init__(self, rel, admin_site, attrs=None, using=None, read_preference=None):
+        super(ReferenceRawIdWidget, self).__init__(rel, admin_site, attrs=attrs, using=using)
+        self.read_preference = read_preference
+
     def render(self, name, value, attrs=None):
         if attrs is None:
             attrs = {}
@@ -31,7 +40,11 @@ class ReferenceRawIdWidget(ForeignKeyRawIdWidget):
         if isinstance(value, DBRef):
             value = value.id
         try:
-            obj = self.rel.to.objects().get(**{'pk': value})
+            qs = self.rel.to.objects()
+            if self.read_preference is not None:
+                qs = qs.read_preference(self.read_preference)
+            with instrument('%s.widget label' % self.rel.to.__name__):
+                obj = qs.get(**{'pk': value})
             return '&nbsp;<strong>%s</strong>' % escape(Truncator(obj).words(14, truncate='...'))
         except (ValueError, self.rel.to.DoesNotExist):
             return ''
@@ -44,4 +57,70 @@ class MultiReferenceRawIdWidget(ManyToManyRawIdWidget):
             attrs['style'] = 'width:40em;'
         return super(MultiReferenceRawIdWidget, self).render(name=name, value=value, attrs=attrs)
         
-        
\ No newline at end of file
+        
+
+
+class LinkedFile(object):
+    """
+    Gives a GridFSProxy the url attribute the file widgets expect.
+    """
+    def __init__(self, proxy, url):
+        self.proxy = proxy
+        self.url = url
+
+    def __bool__(self):
+        return True
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return getattr(self.proxy, 'filename', None) or self.proxy.key
+    __unicode__ = __str__
+
+
+class GridFSFileWidget(AdminFileWidget):
+    """
+    A file widget that links the current file to the admin's download view.
+    """
+    def __init__(self, admin_site, attrs=None):
+        super(GridFSFileWidget, self).__init__(attrs=attrs)
+        self.admin_site = admin_site
+
+    def file_url(self, proxy):
+        instance = proxy.instance
+        if instance is None or instance.pk is None or not proxy.grid_id:
+            return None
+        opts = instance._meta
+        try:
+            return reverse('%s:%s_%s_file' % (self.admin_site.name, opts.app_label,
+                                              opts.model_name),
+                           args=(quote(instance.pk), proxy.key))
+        except NoReverseMatch:
+            return None
+
+    def render(self, name, value, attrs=None):
+        if value is not None and hasattr(value, 'grid_id'):
+            url = self.file_url(value)
+            value = LinkedFile(value, url) if url else None
+        return super(GridFSFileWidget, self).render(name, value, attrs)
+
+
+class GridFSImageWidget(GridFSFileWidget):
+    """
+    Shows a thumbnail of the current image in front of the file widget.
+    """
+    def __init__(self, admin_site, attrs=None, size='80x80'):
+        super(GridFSImageWidget, self).__init__(admin_site, attrs=attrs)
+        self.size = size
+
+    def render(self, name, value, attrs=None):
+        from mongoadmin.thumbnails import thumbnail_url
+
+        output = super(GridFSImageWidget, self).render(name, value, attrs)
+        instance = getattr(value, 'instance', None)
+        if instance is not None and getattr(value, 'grid_id', None):
+            url = thumbnail_url(instance, value.key, self.size, self.admin_site.name)
+            if url is not None:
+                output = format_html('<p class="file-thumbnail"><img src="{0}" alt="" /></p>{1}',
+                                     url, output)
+        return output
+
@@ -21,6 +21,8 @@ setup(name='mongoadmin',
         'mongoadmin.templatetags', 
         'mongoadmin.contenttypes', 
         'mongoadmin.auth',
+        'mongoadmin.management',
+        'mongoadmin.management.commands',
     ],
     classifiers=[
         'Development Status :: 3 - Alpha',